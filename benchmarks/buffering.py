@@ -0,0 +1,37 @@
+# Copyright (c) Alianza, Inc. All rights reserved.
+"""Benchmark rendering a large section into a buffer against joining strings.
+
+Only the Slack and Teams renderers buffer their output, so only they are timed.
+
+Usage: python benchmarks/buffering.py [--items N] [--repeat N]
+"""
+
+import argparse
+
+from mistletoe.block_token import Document
+from sections import BUFFERED_TARGETS, large_section, render_time
+
+import announcer
+
+
+def main() -> None:
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--items", type=int, default=2000, help="List items")
+    parser.add_argument("--repeat", type=int, default=10, help="Runs of each")
+    args = parser.parse_args()
+
+    document = Document(large_section(args.items))
+
+    print(f"{'target':<6} {'strings ms':>11} {'buffer ms':>10} {'speed-up':>9}")
+    for target in BUFFERED_TARGETS:
+        renderer_class = announcer.renderer_class(target, trace=False)
+        strings = render_time(document, renderer_class, args.repeat, buffered=False)
+        buffer = render_time(document, renderer_class, args.repeat, buffered=True)
+        print(
+            f"{target!s:<6} {strings:>11.2f} {buffer:>10.2f} {strings / buffer:>8.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+# Copyright (c) Alianza, Inc. All rights reserved.
+"""Start-up benchmark for common announcer invocations.
+
+Each invocation is run in a fresh interpreter under `python -X importtime`,
+and the total import time is reported along with which of the slow
+dependencies were imported. With --check, the benchmark fails if an
+invocation imports a dependency it shouldn't need.
+
+Usage: python benchmarks/importtime.py [--runs N] [--check]
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+from dataclasses import dataclass, field
+
+TEST_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "tests")
+CHANGELOG = os.path.join(TEST_DIR, "testannounce1.md")
+
+# Dependencies that are slow to import.
+SLOW_MODULES = ["requests", "mistletoe"]
+
+
+@dataclass
+class Invocation:
+    """Code to run, and the slow modules it must not import."""
+
+    name: str
+    code: str
+    forbidden: list[str] = field(default_factory=list)
+
+
+def main_code(*argv: str) -> str:
+    """Return code that runs the CLI with the given arguments."""
+    return (
+        "import sys\n"
+        f"sys.argv = ['announce', *{list(argv)!r}]\n"
+        "import announcer\n"
+        "try:\n"
+        "    announcer.main()\n"
+        "except SystemExit:\n"
+        "    pass\n"
+    )
+
+
+def render_code(target: str) -> str:
+    """Return code that renders a changelog for a target, without posting."""
+    return (
+        "import announcer\n"
+        f"target = announcer.TargetTypes({target!r})\n"
+        f"changelog = announcer.Changelog({CHANGELOG!r}, "
+        "announcer.renderer_class(target))\n"
+        "changelog.get_version_details('1.0.0')\n"
+    )
+
+
+INVOCATIONS = [
+    Invocation("import announcer", "import announcer", SLOW_MODULES),
+    Invocation("announce --help", main_code("--help"), SLOW_MODULES),
+    Invocation("announce batch --help", main_code("batch", "--help"), SLOW_MODULES),
+    Invocation("render for Slack", render_code("slack"), ["requests"]),
+    Invocation("render for Teams", render_code("teams"), ["requests"]),
+]
+
+
+def import_times(code: str) -> tuple[float, set[str]]:
+    """Run code under -X importtime, returning the total ms and modules imported."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    total_us = 0
+    modules = set()
+    for line in result.stderr.splitlines():
+        (_prefix, _, timings) = line.partition("import time:")
+        if timings.count("|") != 2:
+            continue
+        (_self_us, cumulative_us, name) = timings.split("|")
+        if not cumulative_us.strip().isdigit():
+            # The header line.
+            continue
+        modules.add(name.strip())
+        # Nested imports are indented, and already counted by their parent.
+        if not name.startswith("  "):
+            total_us += int(cumulative_us)
+    return (total_us / 1000, modules)
+
+
+def main() -> None:
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--runs", type=int, default=5, help="Runs per invocation")
+    parser.add_argument(
+        "--check",
+        action="store_true",
+        help="Fail if an invocation imports a module it shouldn't",
+    )
+    args = parser.parse_args()
+
+    failures: list[str] = []
+    print(f"{'invocation':<24} {'median ms':>10}  slow modules imported")
+    for invocation in INVOCATIONS:
+        runs = [import_times(invocation.code) for _ in range(args.runs)]
+        median = statistics.median(total for (total, _modules) in runs)
+        imported = [module for module in SLOW_MODULES if module in runs[0][1]]
+        print(f"{invocation.name:<24} {median:>10.1f}  {', '.join(imported) or '-'}")
+        failures.extend(
+            f"{invocation.name} imported {module}"
+            for module in imported
+            if module in invocation.forbidden
+        )
+
+    if args.check and failures:
+        sys.exit("\n".join(failures))
+
+
+if __name__ == "__main__":
+    main()
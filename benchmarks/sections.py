@@ -0,0 +1,58 @@
+# Copyright (c) Alianza, Inc. All rights reserved.
+"""A large changelog section, and timing how long it takes to render.
+
+Shared by the rendering benchmarks, so that they all render the same input.
+"""
+
+import statistics
+import time
+
+from mistletoe.block_token import Document
+
+import announcer
+
+# The targets whose renderers write formatting, quotes and lists into one
+# buffer. Block Kit only buffers the text of mrkdwn sections, and Adaptive
+# Cards don't buffer at all, so setting buffered makes no difference to them.
+BUFFERED_TARGETS = (announcer.TargetTypes.SLACK, announcer.TargetTypes.TEAMS)
+
+
+def large_section(items: int) -> str:
+    """Return a changelog with one version, with deeply nested content."""
+    lines = ["## [1.0.0] - 2025-01-01", "### Changed"]
+    for item in range(items):
+        lines.extend(
+            [
+                (
+                    f"- Change **{item} with *nested ~~formatting~~*, `code` and "
+                    f"[a link](https://example.com/{item})**"
+                ),
+                f"    - Detail of change {item}",
+                f"        1. > Quoted *detail* of change {item}",
+            ]
+        )
+    lines.extend(
+        ["", "[1.0.0]: https://github.com/example/project/compare/0.9.0...1.0.0"]
+    )
+    return "\n".join(lines) + "\n"
+
+
+def render_time(
+    document: Document,
+    renderer_class: "type[announcer.ValidRenderers]",
+    repeat: int,
+    buffered: bool | None = None,
+) -> float:
+    """Return the median time in ms to render a document.
+
+    If buffered is set, the renderer's buffering is turned on or off to match.
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        with renderer_class("1.0.0") as renderer:
+            if buffered is not None:
+                renderer.buffered = buffered
+            renderer.render(document)
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times)
@@ -0,0 +1,256 @@
+# Copyright (c) Alianza, Inc. All rights reserved.
+"""Benchmark each stage of announcing a version from a synthetic changelog.
+
+Changelogs of different sizes and shapes are generated, then for each
+renderer the time and peak memory of each stage is reported: scanning the
+file for the version, parsing it with mistletoe, rendering it, building the
+messages for the target as an announcement would, and encoding them as JSON.
+
+Usage: python benchmarks/stages.py [--sizes N ...] [--shapes SHAPE ...]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import time
+import tracemalloc
+from collections.abc import Callable
+from dataclasses import asdict, dataclass
+from typing import TypeVar
+
+from mistletoe.block_token import Document
+
+import announcer
+from announcer.delivery import MessageData, encode_messages
+from announcer.sectionscanner import extract_version_lines
+
+DEFAULT_SIZES = [100, 1000, 10000, 100000]
+
+T = TypeVar("T")
+
+
+def version_number(n: int) -> str:
+    """Return the nth version number."""
+    return f"{n // 10000}.{n // 100 % 100}.{n % 100}"
+
+
+def typical_section(n: int) -> list[str]:
+    """Return a section like those of most changelogs."""
+    return [
+        "### Added",
+        f"- Add feature {n}, which does something *useful*",
+        f"- Add option `--option-{n}`",
+        "",
+        "### Fixed",
+        f"- Fix bug {n}",
+    ]
+
+
+def nested_section(n: int) -> list[str]:
+    """Return a section of deeply nested lists."""
+    lines = ["### Changed"]
+    for item in range(3):
+        for depth in range(8):
+            marker = f"{item + 1}." if depth % 2 else "-"
+            lines.append(f"{'    ' * depth}{marker} Change {n}.{item}.{depth}")
+    return lines
+
+
+def code_section(n: int) -> list[str]:
+    """Return a section with a long code block."""
+    return [
+        "### Changed",
+        f"- Change the configuration format for version {n}:",
+        "",
+        "```yaml",
+        *(f"setting_{line}: value_{line}  # for {n}" for line in range(100)),
+        "```",
+    ]
+
+
+def links_section(n: int) -> list[str]:
+    """Return a section with many links."""
+    return [
+        "### Fixed",
+        *(
+            f"- Fix [issue {issue}](https://example.com/issues/{issue}) and "
+            f"[pull {issue}][pull-{n}-{issue}]"
+            for issue in range(20)
+        ),
+    ]
+
+
+SHAPES: dict[str, Callable[[int], list[str]]] = {
+    "typical": typical_section,
+    "nested": nested_section,
+    "code": code_section,
+    "links": links_section,
+}
+
+
+def synthetic_changelog(versions: int, section: Callable[[int], list[str]]) -> str:
+    """Return a changelog with the given number of versions, newest first."""
+    repo = "https://github.com/example/project"
+    lines = ["# Changelog", "", "## [Unreleased]", ""]
+    definitions = [f"[Unreleased]: {repo}/compare/{version_number(versions)}...HEAD"]
+    for n in range(versions, 0, -1):
+        version = version_number(n)
+        lines.extend([f"## [{version}] - 2025-01-01", *section(n), ""])
+        definitions.append(
+            f"[{version}]: {repo}/compare/{version_number(n - 1)}...{version}"
+        )
+        if section is links_section:
+            definitions.extend(
+                f"[pull-{n}-{issue}]: {repo}/pull/{issue}" for issue in range(20)
+            )
+    return "\n".join([*lines, *definitions, ""])
+
+
+@dataclass
+class Result:
+    """The cost of one stage of announcing a version."""
+
+    shape: str
+    versions: int
+    target: str
+    stage: str
+    milliseconds: float
+    peak_kib: float
+
+
+def measure(function: Callable[[], T], repeat: int) -> tuple[T, float, float]:
+    """Run a function, returning its result, median time (ms) and peak KiB."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        times.append((time.perf_counter() - start) * 1000)
+
+    # Measure memory separately, as tracing slows everything down.
+    tracemalloc.start()
+    try:
+        function()
+        (_current, peak) = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return (result, statistics.median(times), peak / 1024)
+
+
+def benchmark(
+    shape: str, versions: int, targets: list[announcer.TargetTypes], repeat: int
+) -> list[Result]:
+    """Benchmark each stage of announcing a version from one changelog.
+
+    The output of each stage is the input to the next. Scanning and parsing
+    don't depend on the target, so they are only measured once.
+    """
+    results = []
+
+    def run_stage(target: str, stage: str, function: Callable[[], T]) -> T:
+        (output, milliseconds, peak_kib) = measure(function, repeat)
+        results.append(Result(shape, versions, target, stage, milliseconds, peak_kib))
+        return output
+
+    # Announce the newest version, as a release pipeline would.
+    version = version_number(versions)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        filename = os.path.join(tmp, "CHANGELOG.md")
+        with open(filename, "w") as f:
+            f.write(synthetic_changelog(versions, SHAPES[shape]))
+
+        def scan() -> list[str]:
+            with open(filename) as f:
+                lines = extract_version_lines(f, version)
+            if lines is None:
+                raise ValueError(f"Version {version} not found by the pre-scan")
+            return lines
+
+        lines = run_stage("-", "scan", scan)
+
+    document = run_stage("-", "parse", lambda: Document(lines))
+
+    def render_for(target: announcer.TargetTypes) -> None:
+        renderer_class = announcer.renderer_class(target)
+
+        def render() -> announcer.VersionDetails:
+            with renderer_class(version) as renderer:
+                return (renderer.render(document), renderer.diff_url, renderer.sections)
+
+        (rendered, diff_url, sections) = run_stage(str(target), "render", render)
+
+        # Build the messages with the builder for the target, as announcing does.
+        destination = announcer.Destination(
+            target, "https://example.com/webhook", compatibility_teams_sections=True
+        )
+
+        def payload() -> list[tuple[str, MessageData]]:
+            return announcer.build_messages(
+                [destination],
+                version,
+                "project",
+                {target: (rendered, diff_url, sections)},
+            )
+
+        messages = run_stage(str(target), "payload", payload)
+        run_stage(str(target), "encode", lambda: encode_messages(messages))
+
+    for target in targets:
+        render_for(target)
+
+    return results
+
+
+def main() -> None:
+    """Run the benchmarks."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument(
+        "--sizes",
+        nargs="+",
+        type=int,
+        default=DEFAULT_SIZES,
+        help="Numbers of versions in the changelogs",
+    )
+    parser.add_argument(
+        "--shapes",
+        nargs="+",
+        choices=SHAPES,
+        default=list(SHAPES),
+        help="Shapes of changelog sections",
+    )
+    parser.add_argument(
+        "--targets",
+        nargs="+",
+        type=announcer.TargetTypes,
+        default=list(announcer.TargetTypes),
+        help="Targets to render for",
+    )
+    parser.add_argument("--repeat", type=int, default=3, help="Runs of each stage")
+    parser.add_argument("--json", help="Also write the results to this JSON file")
+    args = parser.parse_args()
+
+    results = []
+    print(
+        f"{'shape':<8} {'versions':>8} {'target':<12} {'stage':<8} "
+        f"{'median ms':>10} {'peak KiB':>10}"
+    )
+    for shape in args.shapes:
+        for versions in args.sizes:
+            for result in benchmark(shape, versions, args.targets, args.repeat):
+                print(
+                    f"{result.shape:<8} {result.versions:>8} {result.target:<12} "
+                    f"{result.stage:<8} {result.milliseconds:>10.2f} "
+                    f"{result.peak_kib:>10.1f}"
+                )
+                results.append(result)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump([asdict(result) for result in results], f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+# Copyright (c) Alianza, Inc. All rights reserved.
+"""Benchmark rendering a large section with and without the tracing renderers.
+
+The tracing renderers log every token, as the renderers did before tracing
+was split out of them. This shows what that costs when debug logging is off,
+i.e. for every announcement made without --verbose.
+
+Tracing renderers don't buffer their output, so the speed-up is measured
+against the plain renderers with buffering off too, to show the cost of
+tracing alone. The Slack and Teams renderers are also timed as they are
+used, with buffering on.
+
+Usage: python benchmarks/tracing.py [--items N] [--repeat N]
+"""
+
+import argparse
+import logging
+
+from mistletoe.block_token import Document
+from sections import BUFFERED_TARGETS, large_section, render_time
+
+import announcer
+
+
+def main() -> None:
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--items", type=int, default=2000, help="List items")
+    parser.add_argument("--repeat", type=int, default=10, help="Runs of each")
+    args = parser.parse_args()
+
+    # As without --verbose.
+    logging.basicConfig(level=logging.INFO)
+    document = Document(large_section(args.items))
+
+    print(
+        f"{'target':<12} {'buffered ms':>12} {'plain ms':>10} {'tracing ms':>11} "
+        f"{'speed-up':>9}"
+    )
+    for target in announcer.TargetTypes:
+        plain_class = announcer.renderer_class(target, trace=False)
+        buffered = (
+            f"{render_time(document, plain_class, args.repeat, buffered=True):.2f}"
+            if target in BUFFERED_TARGETS
+            else "-"
+        )
+        plain = render_time(document, plain_class, args.repeat, buffered=False)
+        tracing = render_time(
+            document, announcer.renderer_class(target, trace=True), args.repeat
+        )
+        print(
+            f"{target!s:<12} {buffered:>12} {plain:>10.2f} {tracing:>11.2f} "
+            f"{tracing / plain:>8.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
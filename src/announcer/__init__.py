@@ -2,44 +2,130 @@
 """A tool for announcing keepachangelog format logs to Slack and Microsoft Teams channels"""
 
 import argparse
+import importlib
 import json
 import logging
-import re
+import os
+import posixpath
 import sys
+from collections.abc import Iterable, Iterator, Mapping
+from dataclasses import dataclass, fields, replace
 from enum import Enum
-from typing import Any
-
-import requests
-from mistletoe.block_token import Document
-
-from .changelogrenderer import ChangeLogRenderer
-from .teamschangelogrenderer import TeamsChangeLogRenderer
+from typing import TYPE_CHECKING, Any
+
+from . import metrics
+from .delivery import (
+    DEFAULT_CONCURRENCY,
+    DEFAULT_RETRY_POLICY,
+    DEFAULT_TIMEOUT,
+    DeliveryError,
+    DeliveryOptions,
+    MessageData,
+    deliver,
+    post_message,  # noqa: F401 - kept importable from the package
+)
+from .forges import (
+    DEFAULT_CHANGELOG_PATH,
+    derive_forge_urls,
+    range_diff_url,
+    repository_path,
+)
+from .retry import DEFAULT_RATE_LIMIT, HostRateLimiter
+from .splitting import (
+    MIN_MAX_BYTES,
+    SLACK_MAX_BLOCKS,
+    SLACK_MAX_MESSAGE_BYTES,
+    SLACK_MAX_TEXT_BYTES,
+    TEAMS_MAX_CARD_BYTES,
+    json_size,
+    json_text_size,
+    split_blocks,
+    split_element,
+    split_html,
+    split_rich_text,
+)
+
+# mistletoe is slow to import, so the modules that use it (and requests) are
+# only imported by the code paths that need them. This keeps the CLI quick to
+# start, especially for --help and subcommands that don't render anything.
+if TYPE_CHECKING:
+    from mistletoe.block_token import Document
+
+    from .adaptivecardrenderer import AdaptiveCardRenderer
+    from .blockkitrenderer import BlockKitRenderer
+    from .changelogrenderer import ChangeLogRenderer
+    from .common import VersionSection
+    from .payloads import Payload
+    from .rendercache import RenderCache
+    from .teamschangelogrenderer import TeamsChangeLogRenderer
+
+    ValidRenderers = (
+        ChangeLogRenderer
+        | TeamsChangeLogRenderer
+        | AdaptiveCardRenderer
+        | BlockKitRenderer
+    )
 
 log = logging.getLogger(__name__)
 
-ValidRenderers = ChangeLogRenderer | TeamsChangeLogRenderer
+# Attributes of this package that are imported when first used.
+LAZY_ATTRIBUTES = {
+    "AdaptiveCardRenderer": ".adaptivecardrenderer",
+    "BlockKitRenderer": ".blockkitrenderer",
+    "ChangeLogRenderer": ".changelogrenderer",
+    "TeamsChangeLogRenderer": ".teamschangelogrenderer",
+}
+
+
+def __getattr__(name: str) -> object:
+    """Import the renderers when they are first used."""
+    if name in LAZY_ATTRIBUTES:
+        module = importlib.import_module(LAZY_ATTRIBUTES[name], __name__)
+        return getattr(module, name)
+    if name == "ValidRenderers":
+        return (
+            renderer_class(TargetTypes.SLACK, False)
+            | renderer_class(TargetTypes.TEAMS, False)
+            | renderer_class(TargetTypes.WORKFLOWS, False)
+            | renderer_class(TargetTypes.SLACK_BLOCKS, False)
+        )
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
-DIFF_URL_RE = re.compile("^(.*)/compare/[^/]+[.][.][.]([^/]+)$")
-TREE_URL_RE = re.compile("^(.*)/tree/([^/]+)$")
+# The rendered text, diff URL and sections for a version. The sections are the
+# rendered top-level blocks, used for Teams compatibility sections and to split
+# Slack messages.
+VersionDetails = tuple[str, str | None, list[dict[str, str]]]
 
 
 def derive_urls(
     diff_url: str | None,
 ) -> tuple[str | None, str | None]:
-    """Derive base and reference URLs from a GitHub compare or tree URL."""
-    base_url = None
-    reference = None
-    if diff_url:
-        diff_m = DIFF_URL_RE.match(diff_url)
-        tree_m = TREE_URL_RE.match(diff_url)
-        if diff_m:
-            base_url = diff_m.group(1)
-            reference = diff_m.group(2)
-        elif tree_m:
-            base_url = tree_m.group(1)
-            reference = tree_m.group(2)
-    return (base_url, reference)
+    """Derive base and reference URLs from a forge's compare or tree URL."""
+    urls = derive_forge_urls(diff_url) if diff_url else None
+    if urls is None:
+        return (None, None)
+    return (urls.base_url, urls.reference)
+
+
+def changelog_link(
+    diff_url: str | None, changelog_path: str = DEFAULT_CHANGELOG_PATH
+) -> tuple[str | None, str | None, str]:
+    """Return the repository URL, changelog URL and changelog name for a diff URL.
+
+    The URLs are None if the diff URL isn't for a known forge.
+    """
+    name = posixpath.basename(changelog_path)
+    urls = derive_forge_urls(diff_url) if diff_url else None
+    if urls is None:
+        return (None, None, name)
+    log.debug(
+        "Forge: %s; Base URL: %s; Reference %s",
+        urls.forge.name,
+        urls.base_url,
+        urls.reference,
+    )
+    return (urls.base_url, urls.changelog_url(changelog_path), name)
 
 
 class TargetTypes(Enum):
@@ -47,36 +133,709 @@ class TargetTypes(Enum):
 
     SLACK = "slack"
     TEAMS = "teams"
+    # Teams workflows, which post Adaptive Cards.
+    WORKFLOWS = "workflows"
+    # Slack, with messages made of Block Kit blocks.
+    SLACK_BLOCKS = "slack-blocks"
 
     def __str__(self) -> str:
         """Return the enum value for argparse and logging display."""
         return self.value
 
 
+@dataclass
+class Destination:
+    """A webhook to announce to, and the options for its target."""
+
+    target: TargetTypes
+    webhook: str
+    username: str | None = None
+    iconurl: str | None = None
+    iconemoji: str | None = None
+    compatibility_teams_sections: bool = False
+    # The most bytes of text to send in each Slack message; longer text is
+    # split over follow-up messages.
+    max_text_bytes: int = SLACK_MAX_TEXT_BYTES
+    # The most bytes of JSON to send in each Slack Block Kit message; longer
+    # announcements are split over several messages.
+    max_message_bytes: int = SLACK_MAX_MESSAGE_BYTES
+    # The most bytes of JSON to send in each Teams or workflows card; longer
+    # announcements are split over several cards.
+    max_card_bytes: int = TEAMS_MAX_CARD_BYTES
+
+
+def renderer_class(
+    target: TargetTypes, trace: bool | None = None
+) -> "type[ValidRenderers]":
+    """Return the renderer for a type of target.
+
+    If trace is set, the renderer logs every token it renders. By default it
+    is set when debug logging is enabled, i.e. with --verbose.
+    """
+    if trace is None:
+        trace = log.isEnabledFor(logging.DEBUG)
+
+    if target is TargetTypes.SLACK:
+        from .changelogrenderer import ChangeLogRenderer, TracingChangeLogRenderer
+
+        return TracingChangeLogRenderer if trace else ChangeLogRenderer
+    elif target is TargetTypes.TEAMS:
+        from .teamschangelogrenderer import (
+            TeamsChangeLogRenderer,
+            TracingTeamsChangeLogRenderer,
+        )
+
+        return TracingTeamsChangeLogRenderer if trace else TeamsChangeLogRenderer
+    elif target is TargetTypes.WORKFLOWS:
+        from .adaptivecardrenderer import (
+            AdaptiveCardRenderer,
+            TracingAdaptiveCardRenderer,
+        )
+
+        return TracingAdaptiveCardRenderer if trace else AdaptiveCardRenderer
+    elif target is TargetTypes.SLACK_BLOCKS:
+        from .blockkitrenderer import BlockKitRenderer, TracingBlockKitRenderer
+
+        return TracingBlockKitRenderer if trace else BlockKitRenderer
+    else:
+        raise ValueError(f"Unknown target! {target}")
+
+
+def parse_destination(value: str) -> tuple[TargetTypes, str]:
+    """Parse a TARGET=WEBHOOK destination argument."""
+    (target, sep, webhook) = value.partition("=")
+    try:
+        if not sep or not webhook:
+            raise ValueError(value)
+        return (TargetTypes(target), webhook)
+    except ValueError:
+        raise argparse.ArgumentTypeError(
+            f"invalid destination {value!r}: expected TARGET=WEBHOOK, where "
+            f"TARGET is one of {', '.join(str(t) for t in TargetTypes)}"
+        ) from None
+
+
+def parse_max_text_bytes(value: str) -> int:
+    """Parse a --max-text-bytes argument."""
+    try:
+        max_bytes = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid int value: {value!r}") from None
+    if max_bytes < MIN_MAX_BYTES:
+        raise argparse.ArgumentTypeError(
+            f"must be at least {MIN_MAX_BYTES} bytes: {max_bytes}"
+        )
+    return max_bytes
+
+
+def parse_range(value: str) -> tuple[str, str]:
+    """Parse a SINCE..UNTIL version range argument."""
+    (since, sep, until) = value.partition("..")
+    if not sep or not since or not until:
+        raise argparse.ArgumentTypeError(
+            f"invalid range {value!r}: expected SINCE..UNTIL (e.g. 2.4.0..2.4.5)"
+        )
+    return (since, until)
+
+
+def destination_from_dict(
+    entry: object, defaults: dict[str, Any], source: str
+) -> Destination:
+    """Make a destination from an object in a JSON file.
+
+    The object has the same fields as Destination. Fields that are not given
+    are taken from the defaults.
+    """
+    if not isinstance(entry, dict):
+        raise TypeError(f"Invalid destination in {source}: {entry!r}")
+    unknown = set(entry) - {f.name for f in fields(Destination)}
+    if unknown:
+        raise ValueError(
+            f"Unknown destination fields in {source}: {', '.join(sorted(unknown))}"
+        )
+    options = {**defaults, **entry}
+    options["target"] = TargetTypes(options["target"])
+    max_text_bytes = options.get("max_text_bytes", SLACK_MAX_TEXT_BYTES)
+    if not isinstance(max_text_bytes, int) or max_text_bytes < MIN_MAX_BYTES:
+        raise ValueError(
+            f"Invalid destination in {source}: max_text_bytes must be at least "
+            f"{MIN_MAX_BYTES}"
+        )
+    return Destination(**options)
+
+
+def load_destinations(filename: str, defaults: dict[str, Any]) -> list[Destination]:
+    """Load a list of destinations from a JSON file.
+
+    The file holds a list of objects with the same fields as Destination.
+    Fields that are not given are taken from the defaults.
+    """
+    with open(filename, "r") as f:
+        entries = json.load(f)
+
+    if not isinstance(entries, list):
+        raise TypeError(f"{filename} must contain a list of destinations")
+
+    return [destination_from_dict(entry, defaults, filename) for entry in entries]
+
+
+def destinations_from_args(args: argparse.Namespace) -> list[Destination]:
+    """Return every destination given in the arguments.
+
+    The Slack and Teams options in the arguments apply to every destination,
+    unless a destinations file overrides them.
+    """
+    defaults: dict[str, Any] = {
+        "username": args.username,
+        "iconurl": args.iconurl,
+        "iconemoji": args.iconemoji,
+        "compatibility_teams_sections": args.compatibility_teams_sections,
+        "max_text_bytes": getattr(args, "max_text_bytes", SLACK_MAX_TEXT_BYTES),
+        "max_message_bytes": getattr(
+            args, "max_message_bytes", SLACK_MAX_MESSAGE_BYTES
+        ),
+        "max_card_bytes": getattr(args, "max_card_bytes", TEAMS_MAX_CARD_BYTES),
+    }
+
+    destinations = []
+    if args.webhook:
+        destinations.append(Destination(args.target, args.webhook, **defaults))
+    for target, webhook in getattr(args, "destinations", None) or []:
+        destinations.append(Destination(target, webhook, **defaults))
+    destinations_file = getattr(args, "destinations_file", None)
+    if destinations_file:
+        destinations.extend(load_destinations(destinations_file, defaults))
+    return destinations
+
+
+def delivery_options_from_args(args: argparse.Namespace) -> DeliveryOptions:
+    """Return the delivery options given in the arguments."""
+    defaults = DeliveryOptions()
+    retry_policy = defaults.retry_policy
+    if getattr(args, "retries", None) is not None:
+        retry_policy = replace(retry_policy, max_attempts=args.retries + 1)
+    if getattr(args, "max_retry_time", None) is not None:
+        retry_policy = replace(retry_policy, max_total_delay=args.max_retry_time)
+
+    return DeliveryOptions(
+        concurrency=getattr(args, "concurrency", defaults.concurrency),
+        timeout=getattr(args, "timeout", defaults.timeout),
+        deadline=getattr(args, "deadline", defaults.deadline),
+        retry_policy=retry_policy,
+        rate_limit=getattr(args, "rate_limit", defaults.rate_limit),
+    )
+
+
 def announce(args: argparse.Namespace) -> None:
-    """Determine which announcer method to use, then use it"""
-    if args.target is TargetTypes.SLACK:
-        log.info("Targeting Slack")
-        announce_slack(
-            args.webhook,
-            args.changelogversion,
+    """Announce to every destination given in the arguments"""
+    if getattr(args, "from_payload", None) is not None:
+        post_payloads(args.from_payload, delivery_options_from_args(args))
+        return
+
+    output: str | None = getattr(args, "dry_run", None)
+    since: str | None = getattr(args, "since", None)
+    until: str | None = None
+    if getattr(args, "version_range", None) is not None:
+        (since, until) = args.version_range
+    if since is not None:
+        announce_range(
+            destinations_from_args(args),
+            since,
+            until,
             args.changelogfile,
             args.projectname,
-            args.username,
-            args.iconurl,
-            args.iconemoji,
+            delivery_options_from_args(args),
+            output,
         )
-    elif args.target is TargetTypes.TEAMS:
-        log.info("Targeting Teams")
-        announce_teams(
-            args.webhook,
-            args.changelogversion,
-            args.changelogfile,
-            args.projectname,
-            args.compatibility_teams_sections,
+        return
+
+    announce_destinations(
+        destinations_from_args(args),
+        args.changelogversion,
+        args.changelogfile,
+        args.projectname,
+        delivery_options_from_args(args),
+        render_cache_from_args(args),
+        output,
+    )
+
+
+def render_cache_from_args(args: argparse.Namespace) -> "RenderCache | None":
+    """Return the render cache given in the arguments, if there is one."""
+    cache_dir = getattr(args, "cache_dir", None)
+    if not cache_dir:
+        return None
+    from .rendercache import DEFAULT_CACHE_MAX_BYTES, RenderCache
+
+    return RenderCache(
+        cache_dir, getattr(args, "cache_max_bytes", DEFAULT_CACHE_MAX_BYTES)
+    )
+
+
+def announce_destinations(
+    destinations: list[Destination],
+    changelogversion: str,
+    changelogfile: str,
+    projectname: str,
+    options: DeliveryOptions | None = None,
+    cache: "RenderCache | None" = None,
+    output: str | None = None,
+) -> None:
+    """Announce changelog changes to many destinations.
+
+    The changelog is parsed once, and rendered once for each type of target,
+    unless the render is in the cache. The messages are sent concurrently; see
+    deliver for the meaning of the delivery options. Raises DeliveryError if
+    any message is not delivered, once all of them have been tried.
+
+    If an output is given, the messages are written to it as payloads instead
+    of being sent; see payloads.write_payloads.
+    """
+    details = render_version_details(
+        changelogfile, changelogversion, {d.target for d in destinations}, cache
+    )
+
+    # Build all the messages before sending any of them.
+    messages = build_messages(
+        destinations,
+        changelogversion,
+        projectname,
+        details,
+        repository_path(changelogfile),
+    )
+    if output is not None:
+        write_payloads(
+            message_payloads(destinations, messages, changelogversion, projectname),
+            output,
+        )
+        return
+    deliver_messages(
+        messages,
+        [f"destination {n} ({d.target})" for n, d in enumerate(destinations, 1)],
+        options,
+    )
+
+
+def announce_range(
+    destinations: list[Destination],
+    since: str,
+    until: str | None,
+    changelogfile: str,
+    projectname: str,
+    options: DeliveryOptions | None = None,
+    output: str | None = None,
+) -> None:
+    """Announce the versions after since, up to and including until, at once.
+
+    The versions are merged into one announcement; see render_range_details.
+    Raises DeliveryError if any message is not delivered, once all of them
+    have been tried. If an output is given, the messages are written to it as
+    payloads instead of being sent.
+    """
+    (label, details) = render_range_details(
+        changelogfile, since, until, {d.target for d in destinations}
+    )
+    messages = build_messages(
+        destinations, label, projectname, details, repository_path(changelogfile)
+    )
+    if output is not None:
+        write_payloads(
+            message_payloads(destinations, messages, label, projectname), output
+        )
+        return
+    deliver_messages(
+        messages,
+        [f"destination {n} ({d.target})" for n, d in enumerate(destinations, 1)],
+        options,
+    )
+
+
+def render_range_details(
+    changelogfile: str,
+    since: str,
+    until: str | None,
+    targets: Iterable[TargetTypes],
+) -> tuple[str, dict[TargetTypes, VersionDetails]]:
+    """Merge a range of versions, and render them for each type of target.
+
+    The changelog is parsed once. The range is the versions after since, up
+    to and including until, or the newest release if until is None, in the
+    order they are in the changelog. Returns the label of the range (e.g.
+    "2.4.1 to 2.4.5") with the rendered details, whose diff URL spans the
+    range.
+    """
+    from .ranges import merge_sections, range_label, select_versions
+
+    log.info("Querying changelog %s", changelogfile)
+    versions = Changelog(
+        changelogfile, renderer_class(TargetTypes.SLACK)
+    ).get_versions()
+    selected = select_versions(list(versions), since, until)
+    label = range_label(selected)
+    log.info("Merging versions %s", ", ".join(selected))
+    document = merge_sections(
+        [versions[version] for version in selected],
+        label,
+        range_diff_url(versions[selected[-1]].diff_url, versions[selected[0]].diff_url),
+    )
+    return (
+        label,
+        render_version_details(changelogfile, label, targets, None, document),
+    )
+
+
+def render_version_details(
+    changelogfile: str,
+    changelogversion: str,
+    targets: Iterable[TargetTypes],
+    cache: "RenderCache | None" = None,
+    document: "Document | None" = None,
+    lines: list[str] | None = None,
+) -> dict[TargetTypes, VersionDetails]:
+    """Parse a changelog once, and render a version for each type of target.
+
+    Renders in the cache are used if there is one, and the changelog is only
+    parsed if something isn't in it. A document that has already been parsed
+    by Changelog.get_document may be given instead, to render from it, along
+    with the lines it was parsed from, if any, so that the cache can be used.
+    """
+    # Get the changelog
+    log.info("Querying changelog %s", changelogfile)
+    reader = Changelog(changelogfile, renderer_class(TargetTypes.SLACK))
+    if document is None:
+        lines = reader.get_lines(changelogversion)
+
+    # Get the version information for each renderer in use.
+    log.info("Getting version %s info from changelog", changelogversion)
+    rendered: dict[type[ValidRenderers], VersionDetails] = {}
+    details = {}
+    for target in targets:
+        renderer = renderer_class(target)
+        if renderer not in rendered:
+            changelog = Changelog(changelogfile, renderer, cache)
+            cached = changelog.get_cached_details(changelogversion, lines)
+            if cached is not None:
+                rendered[renderer] = cached
+            else:
+                if document is None:
+                    document = reader.parse_lines(changelogversion, lines)
+                    if document is None:
+                        lines = None
+                        document = reader.parse_file(changelogversion)
+                rendered[renderer] = changelog.get_version_details(
+                    changelogversion, document, lines
+                )
+        details[target] = rendered[renderer]
+    return details
+
+
+def build_messages(
+    destinations: list[Destination],
+    changelogversion: str,
+    projectname: str,
+    details: dict[TargetTypes, VersionDetails],
+    changelog_path: str = DEFAULT_CHANGELOG_PATH,
+) -> list[tuple[str, MessageData]]:
+    """Build the message for each destination from the rendered version.
+
+    The messages for each destination are lists of the messages to send in
+    order, as announcements that are too long for one message are split over
+    several. Links to the changelog are to changelog_path in its repository.
+    Destinations that differ only in their webhook share the same message
+    data, so that it is only encoded once.
+    """
+    messages: list[tuple[str, MessageData]] = []
+    built: dict[tuple[object, ...], MessageData] = {}
+    for destination in destinations:
+        options = tuple(
+            getattr(destination, f.name)
+            for f in fields(Destination)
+            if f.name != "webhook"
+        )
+        if options in built:
+            messages.append((destination.webhook, built[options]))
+            continue
+
+        (changelog_info, diff_url, sections) = details[destination.target]
+        message_data: MessageData
+        if destination.target is TargetTypes.SLACK:
+            message_data = slack_messages(
+                changelogversion,
+                projectname,
+                [section["text"] for section in sections] or [changelog_info],
+                diff_url,
+                destination.username,
+                destination.iconurl,
+                destination.iconemoji,
+                destination.max_text_bytes,
+                changelog_path,
+            )
+        elif destination.target is TargetTypes.TEAMS:
+            message_data = teams_messages(
+                changelogversion,
+                projectname,
+                changelog_info,
+                diff_url,
+                sections,
+                destination.compatibility_teams_sections,
+                destination.max_card_bytes,
+                changelog_path,
+            )
+        elif destination.target is TargetTypes.SLACK_BLOCKS:
+            message_data = slack_block_messages(
+                changelogversion,
+                projectname,
+                sections,
+                diff_url,
+                destination.username,
+                destination.iconurl,
+                destination.iconemoji,
+                changelog_path,
+                destination.max_message_bytes,
+            )
+        elif destination.target is TargetTypes.WORKFLOWS:
+            message_data = workflow_messages(
+                changelogversion,
+                projectname,
+                sections,
+                diff_url,
+                destination.max_card_bytes,
+                changelog_path,
+            )
+        else:
+            raise ValueError(f"Unknown target! {destination.target}")
+        built[options] = message_data
+        messages.append((destination.webhook, message_data))
+    return messages
+
+
+def deliver_messages(
+    messages: list[tuple[str, MessageData]],
+    descriptions: list[str],
+    options: DeliveryOptions | None = None,
+    rate_limiter: HostRateLimiter | None = None,
+) -> None:
+    """Send messages to webhooks, logging the outcome for each.
+
+    Requests are rate limited by the given limiter, or by a new one for
+    these messages. Raises DeliveryError if any message is not delivered,
+    once all of them have been tried.
+    """
+    if options is None:
+        options = DeliveryOptions()
+
+    log.info("Announcing information to %d destinations", len(messages))
+    with metrics.timed("deliver", messages=len(messages)) as record:
+        results = deliver(
+            messages,
+            options.concurrency,
+            options.timeout,
+            options.deadline,
+            retry_policy=options.retry_policy,
+            rate_limiter=rate_limiter or HostRateLimiter(options.rate_limit),
         )
+        if record is not None:
+            record["failed"] = sum(not result.ok for result in results)
+
+    for description, result in zip(descriptions, results, strict=True):
+        if result.ok:
+            log.info("Announced to %s in %.2fs", description, result.elapsed)
+        else:
+            log.error("Failed to announce to %s: %s", description, result.error)
+
+    if not all(result.ok for result in results):
+        raise DeliveryError(results)
+
+
+def message_payloads(
+    destinations: list[Destination],
+    messages: list[tuple[str, MessageData]],
+    changelogversion: str,
+    projectname: str,
+) -> list["Payload"]:
+    """Return the messages built for destinations by build_messages as payloads."""
+    from .payloads import Payload
+
+    return [
+        Payload(
+            projectname,
+            changelogversion,
+            str(destination.target),
+            webhook,
+            message_data if isinstance(message_data, list) else [message_data],
+        )
+        for destination, (webhook, message_data) in zip(
+            destinations, messages, strict=True
+        )
+    ]
+
+
+def write_payloads(payloads: list["Payload"], output: str) -> None:
+    """Write payloads to a file, directory or stdout, without sending them."""
+    from . import payloads as payloads_module
+
+    log.info("Writing %d payloads instead of announcing", len(payloads))
+    payloads_module.write_payloads(payloads, output)
+
+
+def post_payloads(path: str, options: DeliveryOptions | None = None) -> None:
+    """Send the payloads written by a dry run.
+
+    Nothing is parsed or rendered: the messages are sent exactly as written,
+    to the webhooks they were written for. Raises DeliveryError if any message
+    is not delivered, once all of them have been tried.
+    """
+    from .payloads import read_payloads
+
+    with metrics.timed("read") as record:
+        payloads = read_payloads(path)
+        if record is not None:
+            record["payloads"] = len(payloads)
+    log.info("Read %d payloads from %s", len(payloads), path)
+    deliver_messages(
+        [(payload.webhook, payload.messages) for payload in payloads],
+        [
+            f"{payload.projectname} {payload.version} destination {n} "
+            f"({payload.target})"
+            for n, payload in enumerate(payloads, 1)
+        ],
+        options,
+    )
+
+
+@dataclass
+class BatchEntry:
+    """A version of a project to announce as part of a batch."""
+
+    projectname: str
+    changelogfile: str
+    changelogversion: str
+    destinations: list[Destination]
+
+
+def load_manifest(filename: str) -> list[BatchEntry]:
+    """Load the entries of a batch manifest from a JSON file.
+
+    The file holds a list of objects with the same fields as BatchEntry,
+    where the destinations are in the same form as in a destinations file.
+    Changelog paths are relative to the manifest.
+    """
+    with open(filename, "r") as f:
+        entries = json.load(f)
+
+    if not isinstance(entries, list):
+        raise TypeError(f"{filename} must contain a list of announcements")
+
+    manifest_dir = os.path.dirname(os.path.abspath(filename))
+    return [batch_entry_from_dict(entry, manifest_dir, filename) for entry in entries]
+
+
+def batch_entry_from_dict(entry: object, base_dir: str, source: str) -> BatchEntry:
+    """Make a batch entry from an object in JSON.
+
+    The changelog path is relative to base_dir.
+    """
+    if not isinstance(entry, dict):
+        raise TypeError(f"Invalid announcement in {source}: {entry!r}")
+    unknown = set(entry) - {f.name for f in fields(BatchEntry)}
+    if unknown:
+        raise ValueError(
+            f"Unknown announcement fields in {source}: {', '.join(sorted(unknown))}"
+        )
+    return BatchEntry(
+        projectname=entry["projectname"],
+        changelogfile=os.path.join(base_dir, entry["changelogfile"]),
+        changelogversion=entry["changelogversion"],
+        destinations=[
+            destination_from_dict(destination, {}, source)
+            for destination in entry["destinations"]
+        ],
+    )
+
+
+def announce_batch(
+    batch: list[BatchEntry],
+    options: DeliveryOptions | None = None,
+    jobs: int = 1,
+    cache: "RenderCache | None" = None,
+    output: str | None = None,
+) -> None:
+    """Announce many versions, possibly of many projects, in one go.
+
+    Each changelog version is parsed once and rendered once for each type of
+    target, unless the render is in the cache, using a pool of jobs processes
+    if more than one is given. All the messages are then sent together.
+    Raises DeliveryError if any message is not delivered, once all of them
+    have been tried. If an output is given, the messages are written to it as
+    payloads instead of being sent.
+    """
+    # Work out what needs rendering for each changelog version.
+    renders: dict[tuple[str, str], set[TargetTypes]] = {}
+    for entry in batch:
+        key = (entry.changelogfile, entry.changelogversion)
+        renders.setdefault(key, set()).update(d.target for d in entry.destinations)
+
+    keys = list(renders)
+    if jobs > 1 and len(keys) > 1:
+        from concurrent.futures import ProcessPoolExecutor
+        from functools import partial
+
+        log.info("Rendering %d changelog versions in %d processes", len(keys), jobs)
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            # Collect any metrics recorded in each process.
+            results = list(
+                pool.map(
+                    partial(
+                        metrics.call_recording,
+                        metrics.enabled(),
+                        render_version_details,
+                    ),
+                    [key[0] for key in keys],
+                    [key[1] for key in keys],
+                    [renders[key] for key in keys],
+                    [cache] * len(keys),
+                )
+            )
+        rendered = []
+        for version_details, records in results:
+            rendered.append(version_details)
+            metrics.add_records(records)
     else:
-        raise ValueError(f"Unknown target! {args.target}")
+        rendered = [
+            render_version_details(key[0], key[1], renders[key], cache) for key in keys
+        ]
+    details = dict(zip(keys, rendered, strict=True))
+
+    # Build all the messages before sending any of them.
+    messages = []
+    descriptions: list[str] = []
+    payloads: list[Payload] = []
+    for entry in batch:
+        entry_messages = build_messages(
+            entry.destinations,
+            entry.changelogversion,
+            entry.projectname,
+            details[(entry.changelogfile, entry.changelogversion)],
+            repository_path(entry.changelogfile),
+        )
+        messages.extend(entry_messages)
+        descriptions.extend(
+            f"{entry.projectname} {entry.changelogversion} destination {n} ({d.target})"
+            for n, d in enumerate(entry.destinations, 1)
+        )
+        if output is not None:
+            payloads.extend(
+                message_payloads(
+                    entry.destinations,
+                    entry_messages,
+                    entry.changelogversion,
+                    entry.projectname,
+                )
+            )
+    if output is not None:
+        write_payloads(payloads, output)
+        return
+    deliver_messages(messages, descriptions, options)
 
 
 def announce_slack(
@@ -87,25 +846,83 @@ def announce_slack(
     username: str | None = None,
     icon_url: str | None = None,
     icon_emoji: str | None = None,
+    max_text_bytes: int = SLACK_MAX_TEXT_BYTES,
 ) -> None:
-    """Announce changelog changes to Slack"""
-    # Get the changelog
-    log.info("Querying changelog %s", changelogfile)
-    changelog = Changelog(changelogfile, ChangeLogRenderer)
-
-    # Get the version information
-    log.info("Getting version %s info from changelog", changelogversion)
-    (changelog_info, diff_url, _sections) = changelog.get_version_details(
-        changelogversion
+    """Announce changelog changes to Slack.
+
+    This is announce_destinations for one Slack webhook, so the messages are
+    sent with retries and rate limiting, and DeliveryError is raised if any
+    are not delivered.
+    """
+    announce_destinations(
+        [
+            Destination(
+                TargetTypes.SLACK,
+                webhook,
+                username=username,
+                iconurl=icon_url,
+                iconemoji=icon_emoji,
+                max_text_bytes=max_text_bytes,
+            )
+        ],
+        changelogversion,
+        changelogfile,
+        projectname,
     )
 
-    # Announce the information to Slack.
-    log.info("Announcing information to Slack")
-    log.debug("Webhook %s", webhook)
 
+def slack_messages(
+    changelogversion: str,
+    projectname: str,
+    blocks: list[str],
+    diff_url: str | None,
+    username: str | None = None,
+    icon_url: str | None = None,
+    icon_emoji: str | None = None,
+    max_text_bytes: int = SLACK_MAX_TEXT_BYTES,
+    changelog_path: str = DEFAULT_CHANGELOG_PATH,
+) -> list[dict[str, Any]]:
+    """Build the Slack messages for the rendered blocks of a changelog version.
+
+    The blocks are split between messages so that each has at most
+    max_text_bytes of text. The first message is the one built by
+    slack_message, and any others continue its text.
+    """
+    chunks = split_blocks(blocks, max_text_bytes) or [""]
+    messages = [
+        slack_message(
+            changelogversion,
+            projectname,
+            chunks[0],
+            diff_url,
+            username,
+            icon_url,
+            icon_emoji,
+            changelog_path,
+        )
+    ]
+    for chunk in chunks[1:]:
+        message_data: dict[str, Any] = {
+            "attachments": [{"color": "good", "text": chunk}]
+        }
+        message_data.update(slack_sender(username, icon_url, icon_emoji))
+        messages.append(message_data)
+    return messages
+
+
+def slack_message(
+    changelogversion: str,
+    projectname: str,
+    changelog_info: str,
+    diff_url: str | None,
+    username: str | None = None,
+    icon_url: str | None = None,
+    icon_emoji: str | None = None,
+    changelog_path: str = DEFAULT_CHANGELOG_PATH,
+) -> dict[str, Any]:
+    """Build the Slack message for a rendered changelog version"""
     # Try and derive the base URL from the diff URL if it exists.
-    (base_url, reference) = derive_urls(diff_url)
-    log.debug("Base URL: %s; Reference %s", base_url, reference)
+    (base_url, changelog_url, changelog_name) = changelog_link(diff_url, changelog_path)
 
     # Make a message attachment.
     pretext = [f"*{projectname} {changelogversion}*"]
@@ -125,12 +942,11 @@ def announce_slack(
         fallback.append(f"View changes at {diff_url}")
         actions.append({"type": "button", "text": "View Changes", "url": diff_url})
 
-    if base_url:
-        # Add a button to view the CHANGELOG.md.
-        changelog_url = f"{base_url}/blob/{reference}/CHANGELOG.md"
-        fallback.append(f"View CHANGELOG.md at {changelog_url}")
+    if changelog_url:
+        # Add a button to view the changelog.
+        fallback.append(f"View {changelog_name} at {changelog_url}")
         actions.append(
-            {"type": "button", "text": "View CHANGELOG.md", "url": changelog_url}
+            {"type": "button", "text": f"View {changelog_name}", "url": changelog_url}
         )
 
     if actions:
@@ -140,26 +956,126 @@ def announce_slack(
 
     # Construct the data to send to the endpoint.
     message_data: dict[str, Any] = {"attachments": attachments}
+    message_data.update(slack_sender(username, icon_url, icon_emoji))
+    return message_data
+
+
+def slack_block_messages(
+    changelogversion: str,
+    projectname: str,
+    sections: list[dict[str, str]],
+    diff_url: str | None,
+    username: str | None = None,
+    icon_url: str | None = None,
+    icon_emoji: str | None = None,
+    changelog_path: str = DEFAULT_CHANGELOG_PATH,
+    max_message_bytes: int = SLACK_MAX_MESSAGE_BYTES,
+) -> list[dict[str, Any]]:
+    """Build the Slack Block Kit messages for a rendered changelog version.
+
+    Each section is the JSON of a block, as rendered by BlockKitRenderer.
+    They are split, in order, between as few messages as keep within Slack's
+    limit on the number of blocks in a message, and keep the encoded JSON of
+    each within max_message_bytes. A rich text block too big for a message of
+    its own is split (see split_rich_text), filling what is left of the
+    message it starts in. The first message has a header and the buttons, and
+    any others continue its blocks.
+    """
+    (_base_url, changelog_url, changelog_name) = changelog_link(
+        diff_url, changelog_path
+    )
+
+    title = f"{projectname} {changelogversion}"
+    buttons = []
+
+    if diff_url:
+        # Add a button to view the changes at the diff URL
+        buttons.append(
+            {
+                "type": "button",
+                "text": {"type": "plain_text", "text": "View Changes"},
+                "url": diff_url,
+            }
+        )
+
+    if changelog_url:
+        # Add a button to view the changelog.
+        buttons.append(
+            {
+                "type": "button",
+                "text": {"type": "plain_text", "text": f"View {changelog_name}"},
+                "url": changelog_url,
+            }
+        )
+
+    first_blocks: list[dict[str, Any]] = [
+        {"type": "header", "text": {"type": "plain_text", "text": title[:150]}}
+    ]
+    last_blocks = [{"type": "actions", "elements": buttons}] if buttons else []
+    max_blocks = SLACK_MAX_BLOCKS - len(first_blocks) - len(last_blocks)
+
+    sender = slack_sender(username, icon_url, icon_emoji)
+    separator = len(", ")
+    budget = max_message_bytes - json_size(
+        {"text": title, "blocks": first_blocks + last_blocks, **sender}
+    )
+
+    groups: list[list[dict[str, Any]]] = [[]]
+    size = 0
+    for section in sections:
+        block = json.loads(section["text"])
+        pieces = [block]
+        if len(section["text"]) + separator > budget:
+            pieces = split_rich_text(
+                block, budget - size - separator, budget - separator
+            )
+        for piece in pieces:
+            piece_size = json_size(piece) + separator
+            if groups[-1] and (
+                len(groups[-1]) == max_blocks or size + piece_size > budget
+            ):
+                groups.append([])
+                size = 0
+            if piece_size > budget:
+                log.warning(
+                    "A block of %s %s is too big for one Slack message",
+                    projectname,
+                    changelogversion,
+                )
+            groups[-1].append(piece)
+            size += piece_size
+
+    # The text is shown in notifications.
+    return [
+        {
+            "text": title,
+            "blocks": first_blocks + blocks + last_blocks if number == 0 else blocks,
+            **sender,
+        }
+        for number, blocks in enumerate(groups)
+    ]
+
+
+def slack_sender(
+    username: str | None, icon_url: str | None, icon_emoji: str | None
+) -> dict[str, str]:
+    """Return the fields of a Slack message that set who it is from."""
+    sender = {}
 
     if username:
-        message_data["username"] = username
+        sender["username"] = username
 
     if icon_url:
-        message_data["icon_url"] = icon_url
+        sender["icon_url"] = icon_url
     elif icon_emoji:
         # Wrap the emoji name in colons to use that emoji
-        message_data["icon_emoji"] = f":{icon_emoji}:"
+        sender["icon_emoji"] = f":{icon_emoji}:"
 
-    log.debug("Sending info %s", message_data)
+    return sender
 
-    # Send the data using requests to the webhook.
-    r = requests.post(
-        webhook,
-        json.dumps(message_data),
-        headers={"Content-Type": "application/json"},
-        timeout=10,
-    )
-    r.raise_for_status()
+
+# Added to the title of Teams cards that continue an announcement.
+TEAMS_CONTINUED = " (continued)"
 
 
 def announce_teams(
@@ -168,25 +1084,127 @@ def announce_teams(
     changelogfile: str,
     projectname: str,
     compatibility_teams_sections: bool,
+    max_card_bytes: int = TEAMS_MAX_CARD_BYTES,
 ) -> None:
-    """Announce changelog changes to Teams"""
-    # Get the changelog
-    log.info("Querying changelog %s", changelogfile)
-    changelog = Changelog(changelogfile, TeamsChangeLogRenderer)
-
-    # Get the version information
-    log.info("Getting version %s info from changelog", changelogversion)
-    (changelog_info, diff_url, compatibility_sections) = changelog.get_version_details(
-        changelogversion
+    """Announce changelog changes to Teams.
+
+    This is announce_destinations for one Teams webhook, so the cards are
+    sent with retries and rate limiting, and DeliveryError is raised if any
+    are not delivered.
+    """
+    announce_destinations(
+        [
+            Destination(
+                TargetTypes.TEAMS,
+                webhook,
+                compatibility_teams_sections=compatibility_teams_sections,
+                max_card_bytes=max_card_bytes,
+            )
+        ],
+        changelogversion,
+        changelogfile,
+        projectname,
     )
 
-    # Announce the information to Teams.
-    log.info("Announcing information to Teams")
-    log.debug("Webhook %s", webhook)
 
-    # Try and derive the base URL from the diff URL if it exists.
-    (base_url, reference) = derive_urls(diff_url)
-    log.debug("Base URL: %s; Reference %s", base_url, reference)
+def teams_messages(
+    changelogversion: str,
+    projectname: str,
+    changelog_info: str,
+    diff_url: str | None,
+    compatibility_sections: list[dict[str, str]],
+    compatibility_teams_sections: bool,
+    max_card_bytes: int = TEAMS_MAX_CARD_BYTES,
+    changelog_path: str = DEFAULT_CHANGELOG_PATH,
+) -> list[dict[str, Any]]:
+    """Build the Teams cards for a rendered changelog version.
+
+    The sections are packed, in order, into as few cards as keep the encoded
+    JSON of each within max_card_bytes. A section too big for a card of its
+    own is split (see split_html), filling what is left of the card it starts
+    in. The first card is the one built by teams_message, and any others
+    continue its sections without buttons.
+    """
+    if not compatibility_sections:
+        return [
+            teams_message(
+                changelogversion,
+                projectname,
+                changelog_info,
+                diff_url,
+                compatibility_sections,
+                compatibility_teams_sections,
+                changelog_path,
+            )
+        ]
+
+    if compatibility_teams_sections:
+        # Each section is an item in the card's list of sections.
+        section_overhead = json_size({"text": ""}) + len(", ")
+    else:
+        # The text of the sections is joined into the card's only section.
+        section_overhead = 0
+
+    # Leave room for the rest of the card, including a continued title.
+    overhead = json_size(
+        teams_message(
+            changelogversion, projectname, "", diff_url, [], False, changelog_path
+        )
+    ) + 2 * len(TEAMS_CONTINUED)
+    budget = max_card_bytes - overhead
+
+    cards: list[list[dict[str, str]]] = [[]]
+    size = 0
+    for section in compatibility_sections:
+        pieces = [section["text"]]
+        if json_text_size(section["text"]) + section_overhead > budget:
+            pieces = split_html(
+                section["text"],
+                budget - size - section_overhead,
+                budget - section_overhead,
+            )
+        for piece in pieces:
+            piece_size = json_text_size(piece) + section_overhead
+            if cards[-1] and size + piece_size > budget:
+                cards.append([])
+                size = 0
+            if piece_size > budget:
+                log.warning(
+                    "A section of %s %s is too big for one Teams card",
+                    projectname,
+                    changelogversion,
+                )
+            cards[-1].append({**section, "text": piece})
+            size += piece_size
+
+    return [
+        teams_message(
+            changelogversion if number == 0 else changelogversion + TEAMS_CONTINUED,
+            projectname,
+            "".join(section["text"] for section in sections),
+            diff_url if number == 0 else None,
+            sections,
+            compatibility_teams_sections,
+            changelog_path,
+        )
+        for number, sections in enumerate(cards)
+    ]
+
+
+def teams_message(
+    changelogversion: str,
+    projectname: str,
+    changelog_info: str,
+    diff_url: str | None,
+    compatibility_sections: list[dict[str, str]],
+    compatibility_teams_sections: bool,
+    changelog_path: str = DEFAULT_CHANGELOG_PATH,
+) -> dict[str, Any]:
+    """Build the Teams message for a rendered changelog version"""
+    # Try and derive the changelog URL from the diff URL if it exists.
+    (_base_url, changelog_url, changelog_name) = changelog_link(
+        diff_url, changelog_path
+    )
 
     actions = []
 
@@ -205,13 +1223,12 @@ def announce_teams(
             }
         )
 
-    if base_url:
-        # Add a button to view the CHANGELOG.md.
-        changelog_url = f"{base_url}/blob/{reference}/CHANGELOG.md"
+    if changelog_url:
+        # Add a button to view the changelog.
         actions.append(
             {
                 "@type": "OpenUri",
-                "name": "View CHANGELOG.md",
+                "name": f"View {changelog_name}",
                 "targets": [
                     {
                         "os": "default",
@@ -229,7 +1246,7 @@ def announce_teams(
         # Use the generated HTML as the only section
         sections = [{"text": changelog_info}]
 
-    message_data = {
+    message_data: dict[str, Any] = {
         "@type": "MessageCard",
         "@context": "https://schema.org/extensions",
         "summary": f"{projectname} {changelogversion}",
@@ -240,51 +1257,632 @@ def announce_teams(
     if actions:
         message_data["potentialAction"] = actions
 
-    log.debug("Sending info %s", message_data)
+    return message_data
+
 
-    # Send the data using requests to the webhook.
-    r = requests.post(
-        webhook,
-        json.dumps(message_data),
-        headers={"Content-Type": "application/json"},
-        timeout=10,
+def workflow_message(
+    changelogversion: str,
+    projectname: str,
+    body: list[dict[str, Any]],
+    diff_url: str | None,
+    changelog_path: str = DEFAULT_CHANGELOG_PATH,
+) -> dict[str, Any]:
+    """Build the Teams workflow message for Adaptive Card elements"""
+    # Try and derive the changelog URL from the diff URL if it exists.
+    (_base_url, changelog_url, changelog_name) = changelog_link(
+        diff_url, changelog_path
     )
-    r.raise_for_status()
+
+    actions = []
+
+    if diff_url:
+        # Add a button to view the changes at the diff URL
+        actions.append(
+            {"type": "Action.OpenUrl", "title": "View changes", "url": diff_url}
+        )
+
+    if changelog_url:
+        # Add a button to view the changelog.
+        actions.append(
+            {
+                "type": "Action.OpenUrl",
+                "title": f"View {changelog_name}",
+                "url": changelog_url,
+            }
+        )
+
+    card: dict[str, Any] = {
+        "$schema": "http://adaptivecards.io/schemas/adaptive-card.json",
+        "type": "AdaptiveCard",
+        "version": "1.4",
+        "msteams": {"width": "Full"},
+        "body": [
+            {
+                "type": "TextBlock",
+                "text": f"{projectname} {changelogversion}",
+                "weight": "Bolder",
+                "size": "Large",
+                "wrap": True,
+            },
+            *body,
+        ],
+    }
+
+    if actions:
+        card["actions"] = actions
+
+    return {
+        "type": "message",
+        "attachments": [
+            {"contentType": "application/vnd.microsoft.card.adaptive", "content": card}
+        ],
+    }
+
+
+def workflow_messages(
+    changelogversion: str,
+    projectname: str,
+    sections: list[dict[str, str]],
+    diff_url: str | None,
+    max_card_bytes: int = TEAMS_MAX_CARD_BYTES,
+    changelog_path: str = DEFAULT_CHANGELOG_PATH,
+) -> list[dict[str, Any]]:
+    """Build the Teams workflow messages for a rendered changelog version.
+
+    Each section is the JSON of an Adaptive Card element, as rendered by
+    AdaptiveCardRenderer. They are packed, in order, into as few cards as
+    keep the encoded JSON of each within max_card_bytes. An element too big
+    for a card of its own is split (see split_element), filling what is left
+    of the card it starts in. The first card has the buttons, and any others
+    continue its elements.
+    """
+    # Each element is an item in the card's body.
+    separator = len(", ")
+
+    # Leave room for the rest of the card, including a continued title.
+    overhead = json_size(
+        workflow_message(changelogversion, projectname, [], diff_url, changelog_path)
+    ) + len(TEAMS_CONTINUED)
+    budget = max_card_bytes - overhead
+
+    cards: list[list[dict[str, Any]]] = [[]]
+    size = 0
+    for section in sections:
+        element = json.loads(section["text"])
+        pieces = [element]
+        if len(section["text"]) + separator > budget:
+            pieces = split_element(
+                element, budget - size - separator, budget - separator
+            )
+        for piece in pieces:
+            piece_size = json_size(piece) + separator
+            if cards[-1] and size + piece_size > budget:
+                cards.append([])
+                size = 0
+            if piece_size > budget:
+                log.warning(
+                    "An element of %s %s is too big for one card",
+                    projectname,
+                    changelogversion,
+                )
+            cards[-1].append(piece)
+            size += piece_size
+
+    return [
+        workflow_message(
+            changelogversion if number == 0 else changelogversion + TEAMS_CONTINUED,
+            projectname,
+            body,
+            diff_url if number == 0 else None,
+            changelog_path,
+        )
+        for number, body in enumerate(cards)
+    ]
 
 
 class Changelog:
     """Helper for loading and rendering changelog sections."""
 
-    def __init__(self, filename: str, renderer_class: type[ValidRenderers]) -> None:
-        """Create a changelog reader bound to a renderer implementation."""
+    def __init__(
+        self,
+        filename: str,
+        renderer_class: "type[ValidRenderers]",
+        cache: "RenderCache | None" = None,
+    ) -> None:
+        """Create a changelog reader bound to a renderer implementation.
+
+        Rendered versions are read from and added to the cache, if one is
+        given.
+        """
         self.filename = filename
         self.renderer_class = renderer_class
-
-    def get_version_details(
-        self, version: str
-    ) -> tuple[str, str | None, list[dict[str, str]]]:
-        """Render and return details for a specific changelog version."""
-        with open(self.filename, "r") as f:
+        self.cache = cache
+
+    def get_document(self, version: str) -> "Document":
+        """Parse the parts of the changelog needed to render a specific version."""
+        document = self.parse_lines(version, self.get_lines(version))
+        if document is None:
+            document = self.parse_file(version)
+        return document
+
+    def get_lines(self, version: str) -> list[str] | None:
+        """Return the lines of the changelog that could hold a version's section.
+
+        None is returned if the pre-scan found no candidate sections.
+        """
+        from .changelogindex import current_index
+        from .sectionscanner import extract_version_lines
+
+        # Use the changelog's index if it has one, so that the file doesn't
+        # need to be scanned.
+        with metrics.timed("index", file=self.filename):
+            index = current_index(self.filename)
+
+        # Only parse the sections that could be for this version. This is
+        # where the file is read.
+        with metrics.timed(
+            "scan", version=version, indexed=index is not None
+        ) as record:
+            if index is not None:
+                lines = index.extract_version_lines(version)
+            else:
+                with open(self.filename, "r") as f:
+                    lines = extract_version_lines(f, version)
+            if record is not None:
+                record["lines"] = len(lines) if lines is not None else None
+        return lines
+
+    def parse_lines(self, version: str, lines: list[str] | None) -> "Document | None":
+        """Parse lines found by get_lines, if they hold the version's section."""
+        from mistletoe.block_token import Document
+
+        from .common import has_version
+
+        if lines is None:
+            return None
+        with metrics.timed("parse", lines=len(lines)):
+            document = Document(lines)
+        return document if has_version(document, version) else None
+
+    def parse_file(self, version: str) -> "Document":
+        """Parse the whole changelog."""
+        from mistletoe.block_token import Document
+
+        # The pre-scan didn't find the version, so fall back to parsing the
+        # whole file.
+        log.debug("Version %s not found by pre-scan; parsing whole file", version)
+        with open(self.filename, "r") as f, metrics.timed("parse", whole_file=True):
+            return Document(f)
+
+    def get_versions(self) -> "ChangelogVersions":
+        """Parse the whole changelog once, and find the section for every version.
+
+        Versions are only rendered when their details are asked for.
+        """
+        from mistletoe.block_token import Document
+
+        from .common import split_versions
+
+        with open(self.filename, "r") as f, metrics.timed("parse", whole_file=True):
             document = Document(f)
+        with metrics.timed("split") as record:
+            sections = split_versions(document)
+            if record is not None:
+                record["versions"] = len(sections)
+        return ChangelogVersions(self, sections)
+
+    def get_cached_details(
+        self, version: str, lines: list[str] | None
+    ) -> VersionDetails | None:
+        """Return the cached render of a version from lines found by get_lines."""
+        if self.cache is None or lines is None:
+            return None
+        from .rendercache import cache_key
+
+        with metrics.timed("cache", renderer=self.renderer_class.__name__) as record:
+            details = self.cache.get(cache_key(lines, self.renderer_class, version))
+            if record is not None:
+                record["hit"] = details is not None
+        return details
 
-            with self.renderer_class(version) as renderer:
-                rendered = renderer.render(document)
-                diff_url = renderer.diff_url
-                sections = renderer.sections
+    def get_version_details(
+        self,
+        version: str,
+        document: "Document | None" = None,
+        lines: list[str] | None = None,
+    ) -> VersionDetails:
+        """Render and return details for a specific changelog version.
+
+        A document that has already been parsed by get_document may be given
+        to avoid parsing the changelog again, along with the lines it was
+        parsed from, if any, so that the render can be cached.
+        """
+        if document is None:
+            lines = self.get_lines(version)
+            cached = self.get_cached_details(version, lines)
+            if cached is not None:
+                return cached
+            document = self.parse_lines(version, lines)
+            if document is None:
+                # Renders of the whole file aren't cached, as they depend on
+                # more than the lines.
+                lines = None
+                document = self.parse_file(version)
+
+        with (
+            metrics.timed("render", renderer=self.renderer_class.__name__) as record,
+            self.renderer_class(version) as renderer,
+        ):
+            if record is not None:
+                # Tokens are either rendered, written when buffered, or made
+                # into Adaptive Card elements or Block Kit blocks.
+                metrics.count_calls(
+                    renderer, ["render", "write", "element", "blocks"], record, "tokens"
+                )
+            rendered = renderer.render(document)
+            diff_url = renderer.diff_url
+            sections = renderer.sections
+            if record is not None:
+                record["characters"] = len(rendered)
 
         log.debug("Diff URL: %s", diff_url)
+        if self.cache is not None and lines is not None:
+            from .rendercache import cache_key
+
+            self.cache.put(
+                cache_key(lines, self.renderer_class, version),
+                (rendered, diff_url, sections),
+            )
         return rendered, diff_url, sections
 
 
+class ChangelogVersions(Mapping[str, "VersionSection"]):
+    """The sections for every version in a changelog, from one parse.
+
+    Maps each version to its section, in the order they are in the changelog.
+    Each version is rendered the first time its details are asked for.
+    """
+
+    def __init__(
+        self, changelog: Changelog, sections: dict[str, "VersionSection"]
+    ) -> None:
+        """Create the versions of a changelog from its sections."""
+        self.changelog = changelog
+        self.sections = sections
+        self.rendered: dict[tuple[type[ValidRenderers], str], VersionDetails] = {}
+
+    def __getitem__(self, version: str) -> "VersionSection":
+        """Return the section for a version."""
+        return self.sections[version]
+
+    def __iter__(self) -> Iterator[str]:
+        """Iterate over the versions."""
+        return iter(self.sections)
+
+    def __len__(self) -> int:
+        """Return the number of versions."""
+        return len(self.sections)
+
+    def get_version_details(
+        self, version: str, renderer: "type[ValidRenderers] | None" = None
+    ) -> VersionDetails:
+        """Render and return details for a version, rendering it only once.
+
+        The changelog's renderer is used unless another is given. Raises
+        KeyError if there is no section for the version.
+        """
+        from .common import section_document
+
+        if renderer is None:
+            renderer = self.changelog.renderer_class
+        key = (renderer, version)
+        if key not in self.rendered:
+            changelog = Changelog(self.changelog.filename, renderer)
+            self.rendered[key] = changelog.get_version_details(
+                version, section_document(self.sections[version])
+            )
+        return self.rendered[key]
+
+
+def add_volume_arguments(parser: argparse.ArgumentParser) -> None:
+    """Add the arguments controlling how much is logged."""
+    volume = parser.add_mutually_exclusive_group()
+    volume.add_argument(
+        "-v",
+        "--verbose",
+        action="store_true",
+        help="Enable verbose logging",
+    )
+    volume.add_argument(
+        "-q",
+        "--quiet",
+        action="store_true",
+        help="Enable quiet output",
+    )
+
+
+def setup_logging(args: argparse.Namespace) -> None:
+    """Set up logging dependent on the options given."""
+    if args.verbose:
+        level = logging.DEBUG
+    elif args.quiet:
+        level = logging.WARNING
+    else:
+        level = logging.INFO
+
+    # Set up basic logging, keeping stdout for payloads if they're written there.
+    logging.basicConfig(
+        format="%(asctime)s %(levelname)-5.5s %(message)s",
+        stream=sys.stderr if getattr(args, "dry_run", None) == "-" else sys.stdout,
+        level=level,
+    )
+
+
+def add_metrics_arguments(parser: argparse.ArgumentParser) -> None:
+    """Add the arguments controlling whether metrics are recorded."""
+    parser.add_argument(
+        "--metrics-file",
+        help="Write the time taken by each stage of the announcement (reading, "
+        "parsing, rendering, encoding and each request to a webhook) to this "
+        "file, as one JSON object per line",
+    )
+
+
+def add_cache_arguments(parser: argparse.ArgumentParser) -> None:
+    """Add the arguments controlling the cache of rendered versions."""
+    from .rendercache import DEFAULT_CACHE_MAX_BYTES
+
+    parser.add_argument(
+        "--cache-dir",
+        help="A directory to cache rendered changelog versions in. Announcing "
+        "a version again, e.g. when retrying, reads the render from the cache "
+        "instead of parsing and rendering the changelog (default no cache)",
+    )
+    parser.add_argument(
+        "--cache-max-bytes",
+        type=int,
+        default=DEFAULT_CACHE_MAX_BYTES,
+        help="The most bytes to keep in the cache. The least recently used "
+        f"renders are removed beyond this (default {DEFAULT_CACHE_MAX_BYTES})",
+    )
+
+
+def add_dry_run_arguments(parser: argparse.ArgumentParser) -> None:
+    """Add the argument for writing payloads instead of sending them."""
+    parser.add_argument(
+        "--dry-run",
+        nargs="?",
+        const="-",
+        metavar="OUTPUT",
+        help="Write the messages that would be sent to each destination, one "
+        "JSON object per line, instead of sending them. OUTPUT is a file, a "
+        "directory to write a file per project version to, or - for stdout "
+        "(the default)",
+    )
+
+
+def add_delivery_arguments(parser: argparse.ArgumentParser) -> None:
+    """Add the arguments controlling how messages are sent."""
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=DEFAULT_CONCURRENCY,
+        help="The maximum number of destinations to send to at once "
+        f"(default {DEFAULT_CONCURRENCY})",
+    )
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        default=DEFAULT_TIMEOUT,
+        help="The timeout in seconds for each request to a webhook "
+        f"(default {DEFAULT_TIMEOUT:g})",
+    )
+    parser.add_argument(
+        "--deadline",
+        type=float,
+        help="The time in seconds to allow for sending to every destination. "
+        "Destinations not sent to by then are reported as failures",
+    )
+    parser.add_argument(
+        "--retries",
+        type=int,
+        default=DEFAULT_RETRY_POLICY.max_attempts - 1,
+        help="The number of times to retry sending to a webhook after rate "
+        "limiting, a server error or a connection failure "
+        f"(default {DEFAULT_RETRY_POLICY.max_attempts - 1})",
+    )
+    parser.add_argument(
+        "--max-retry-time",
+        type=float,
+        default=DEFAULT_RETRY_POLICY.max_total_delay,
+        help="The most time in seconds to spend waiting to retry sending to a "
+        f"webhook (default {DEFAULT_RETRY_POLICY.max_total_delay:g})",
+    )
+    parser.add_argument(
+        "--rate-limit",
+        type=float,
+        default=DEFAULT_RATE_LIMIT,
+        help="The average number of requests per second to send to each "
+        f"webhook host, or 0 for no limit (default {DEFAULT_RATE_LIMIT:g})",
+    )
+
+
+def main_index(argv: list[str]) -> None:
+    """Handle the index subcommand."""
+    parser = argparse.ArgumentParser(
+        prog="announce index",
+        description="Build or refresh the index of sections in changelogs. "
+        "Announcing from an indexed changelog reads the section for the "
+        "version straight from the file, and the index is rebuilt whenever "
+        "the changelog changes.",
+    )
+    parser.add_argument(
+        "changelogfiles",
+        nargs="+",
+        metavar="CHANGELOGFILE",
+        help="The file containing changelog details (e.g. CHANGELOG.md)",
+    )
+    add_volume_arguments(parser)
+
+    args = parser.parse_args(argv)
+    setup_logging(args)
+
+    from .changelogindex import refresh_index
+
+    for changelogfile in args.changelogfiles:
+        index = refresh_index(changelogfile)
+        log.info("Indexed %d versions in %s", len(index.versions), changelogfile)
+
+
+def main_batch(argv: list[str]) -> None:
+    """Handle the batch subcommand."""
+    parser = argparse.ArgumentParser(
+        prog="announce batch",
+        description="Announce many changelog versions, possibly of many "
+        "projects, in one run",
+    )
+    parser.add_argument(
+        "manifest",
+        help="A JSON file listing the announcements to make. Each entry is an "
+        "object with a projectname, changelogfile, changelogversion and a list "
+        "of destinations in the same form as for --destinations-file",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        help="The number of processes to parse and render changelogs with (default 1)",
+    )
+    add_delivery_arguments(parser)
+    add_dry_run_arguments(parser)
+    add_cache_arguments(parser)
+    add_metrics_arguments(parser)
+    add_volume_arguments(parser)
+
+    args = parser.parse_args(argv)
+    setup_logging(args)
+
+    try:
+        with metrics.recording_to(args.metrics_file):
+            announce_batch(
+                load_manifest(args.manifest),
+                delivery_options_from_args(args),
+                args.jobs,
+                render_cache_from_args(args),
+                args.dry_run,
+            )
+    except Exception:
+        log.exception("Announcement failed")
+        raise
+
+
+def main_serve(argv: list[str]) -> None:
+    """Handle the serve subcommand."""
+    from .service import (
+        DEFAULT_DOCUMENT_CACHE_SIZE,
+        DEFAULT_QUEUE_SIZE,
+        DEFAULT_WORKERS,
+    )
+
+    parser = argparse.ArgumentParser(
+        prog="announce serve",
+        description="Run a service that makes announcements posted to it over "
+        "HTTP. POST an announcement, in the same form as an entry of a batch "
+        "manifest, to /announcements, and GET /announcements/ID for its status",
+    )
+    listen = parser.add_mutually_exclusive_group()
+    listen.add_argument(
+        "--port",
+        type=int,
+        default=8080,
+        help="The port to listen on (default 8080)",
+    )
+    listen.add_argument(
+        "--socket",
+        dest="socket_path",
+        help="A Unix socket to listen on instead of a port",
+    )
+    parser.add_argument(
+        "--host",
+        default="127.0.0.1",
+        help="The address to listen on (default 127.0.0.1). The service has no "
+        "authentication, and anyone who can reach it can make it read any file "
+        "it can and post it to any webhook, so only listen on other addresses "
+        "behind something that restricts who can connect",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=DEFAULT_WORKERS,
+        help=f"The number of announcements to make at once (default {DEFAULT_WORKERS})",
+    )
+    parser.add_argument(
+        "--queue-size",
+        type=int,
+        default=DEFAULT_QUEUE_SIZE,
+        help="The most announcements to queue before rejecting more "
+        f"(default {DEFAULT_QUEUE_SIZE})",
+    )
+    parser.add_argument(
+        "--document-cache-size",
+        type=int,
+        default=DEFAULT_DOCUMENT_CACHE_SIZE,
+        help="The number of parsed changelog versions to keep "
+        f"(default {DEFAULT_DOCUMENT_CACHE_SIZE})",
+    )
+    add_delivery_arguments(parser)
+    add_cache_arguments(parser)
+    add_volume_arguments(parser)
+
+    args = parser.parse_args(argv)
+    setup_logging(args)
+
+    import signal
+
+    from .service import AnnouncementService, DocumentCache, is_socket, serve
+
+    if (
+        args.socket_path is not None
+        and os.path.lexists(args.socket_path)
+        and not is_socket(args.socket_path)
+    ):
+        parser.error(f"--socket {args.socket_path} exists and is not a socket")
+
+    # Stop cleanly when terminated, as when interrupted.
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    serve(
+        AnnouncementService(
+            delivery_options_from_args(args),
+            args.workers,
+            args.queue_size,
+            DocumentCache(args.document_cache_size),
+            render_cache_from_args(args),
+        ),
+        args.host,
+        args.port,
+        args.socket_path,
+    )
+
+
 def main() -> None:
     """Main handling function."""
+    if sys.argv[1:2] == ["index"]:
+        main_index(sys.argv[2:])
+        return
+    if sys.argv[1:2] == ["batch"]:
+        main_batch(sys.argv[2:])
+        return
+    if sys.argv[1:2] == ["serve"]:
+        main_serve(sys.argv[2:])
+        return
+
     # Run main script.
     parser = argparse.ArgumentParser(
         description="Announce CHANGELOG changes on Slack and Microsoft Teams"
     )
 
     # The new hook argument should just be called webhook.
-    hook_group = parser.add_mutually_exclusive_group(required=True)
+    hook_group = parser.add_mutually_exclusive_group()
     hook_group.add_argument(
         "--webhook", dest="webhook", help="The incoming webhook URL"
     )
@@ -301,21 +1899,60 @@ def main() -> None:
     )
 
     parser.add_argument(
+        "--destination",
+        dest="destinations",
+        action="append",
+        type=parse_destination,
+        metavar="TARGET=WEBHOOK",
+        help="A target type and incoming webhook URL to announce to "
+        "(e.g. teams=https://...). May be given multiple times",
+    )
+    parser.add_argument(
+        "--destinations-file",
+        dest="destinations_file",
+        help="A JSON file listing destinations to announce to. Each entry is an "
+        "object with a target, a webhook and optionally any of username, "
+        "iconurl, iconemoji, compatibility_teams_sections, max_text_bytes, "
+        "max_message_bytes and max_card_bytes",
+    )
+
+    add_delivery_arguments(parser)
+    add_dry_run_arguments(parser)
+
+    versions = parser.add_mutually_exclusive_group(required=True)
+    versions.add_argument(
         "--changelogversion",
         dest="changelogversion",
-        required=True,
         help="The changelog version to announce (e.g. 1.0.0)",
     )
+    versions.add_argument(
+        "--since",
+        metavar="VERSION",
+        help="Announce every version released after this one in one message, "
+        "grouping their changes by heading (e.g. 2.4.0)",
+    )
+    versions.add_argument(
+        "--range",
+        dest="version_range",
+        metavar="SINCE..UNTIL",
+        type=parse_range,
+        help="Announce the versions after SINCE, up to and including UNTIL, in "
+        "one message, grouping their changes by heading (e.g. 2.4.0..2.4.5)",
+    )
+    versions.add_argument(
+        "--from-payload",
+        metavar="PAYLOAD",
+        help="Send the messages written by --dry-run, from a file, a directory "
+        "of them or - for stdin, without reading the changelog",
+    )
     parser.add_argument(
         "--changelogfile",
         dest="changelogfile",
-        required=True,
         help="The file containing changelog details (e.g. CHANGELOG.md)",
     )
     parser.add_argument(
         "--projectname",
         dest="projectname",
-        required=True,
         help="The name of the project to announce (e.g. announcer)",
     )
     parser.add_argument(
@@ -330,6 +1967,33 @@ def main() -> None:
         help="Compatibility option - sends Teams messages in multiple sections",
     )
 
+    parser.add_argument(
+        "--max-text-bytes",
+        type=parse_max_text_bytes,
+        default=SLACK_MAX_TEXT_BYTES,
+        help="The most bytes of text to send in one message. Longer "
+        "announcements are split between headings or list entries over several "
+        f"messages (default {SLACK_MAX_TEXT_BYTES}). Valid for: Slack",
+    )
+
+    parser.add_argument(
+        "--max-message-bytes",
+        type=int,
+        default=SLACK_MAX_MESSAGE_BYTES,
+        help="The most bytes of JSON to send in one message. Longer "
+        "announcements are split between blocks or list entries over several "
+        f"messages (default {SLACK_MAX_MESSAGE_BYTES}). Valid for: Slack blocks",
+    )
+
+    parser.add_argument(
+        "--max-card-bytes",
+        type=int,
+        default=TEAMS_MAX_CARD_BYTES,
+        help="The most bytes of JSON to send in one card. Longer announcements "
+        "are split between sections over several cards (default "
+        f"{TEAMS_MAX_CARD_BYTES}). Valid for: Teams, Workflows",
+    )
+
     icons = parser.add_mutually_exclusive_group()
     icons.add_argument(
         "--iconurl",
@@ -343,39 +2007,35 @@ def main() -> None:
         "(e.g. party_parrot). Valid for: Slack",
     )
 
-    volume = parser.add_mutually_exclusive_group()
-    volume.add_argument(
-        "-v",
-        "--verbose",
-        action="store_true",
-        help="Enable verbose logging",
-    )
-    volume.add_argument(
-        "-q",
-        "--quiet",
-        action="store_true",
-        help="Enable quiet output",
-    )
+    add_cache_arguments(parser)
+    add_metrics_arguments(parser)
+    add_volume_arguments(parser)
 
     args = parser.parse_args()
-
-    # Set up logging dependent on the options given
-    if args.verbose:
-        level = logging.DEBUG
-    elif args.quiet:
-        level = logging.WARNING
+    if args.from_payload is not None:
+        if args.dry_run is not None:
+            parser.error("argument --dry-run: not allowed with argument --from-payload")
     else:
-        level = logging.INFO
-
-    # Set up basic logging
-    logging.basicConfig(
-        format="%(asctime)s %(levelname)-5.5s %(message)s",
-        stream=sys.stdout,
-        level=level,
-    )
+        missing = [
+            option
+            for (option, value) in (
+                ("--changelogfile", args.changelogfile),
+                ("--projectname", args.projectname),
+            )
+            if value is None
+        ]
+        if missing:
+            parser.error(f"the following arguments are required: {', '.join(missing)}")
+        if not (args.webhook or args.destinations or args.destinations_file):
+            parser.error(
+                "one of the arguments --webhook --slackhook --destination "
+                "--destinations-file is required"
+            )
+    setup_logging(args)
 
     try:
-        announce(args)
+        with metrics.recording_to(args.metrics_file):
+            announce(args)
     except Exception:
         log.exception("Announcement failed")
         raise
@@ -0,0 +1,242 @@
+# Copyright (c) Alianza, Inc. All rights reserved.
+"""AdaptiveCardRenderer for mistletoe, for Teams workflows.
+
+Changelogs are rendered straight to Adaptive Card elements rather than to
+HTML. Inline formatting uses the subset of markdown that TextBlocks support.
+"""
+
+import json
+import logging
+from collections.abc import Callable
+from typing import Any, ClassVar
+
+from mistletoe import block_token, span_token, token
+from mistletoe.base_renderer import BaseRenderer
+
+from announcer.common import (
+    PlainTextExtractor,
+    TracingRenderer,
+    iter_list,
+    render_block_document,
+)
+
+log = logging.getLogger(__name__)
+
+# An Adaptive Card element, e.g. a TextBlock or Container.
+Element = dict[str, Any]
+
+
+class AdaptiveCardRenderer(BaseRenderer):
+    """Class to render a changelog to the body of an Adaptive Card.
+
+    Each top-level block in the version's section is made into one element,
+    and its JSON is one of the renderer's sections. The document renders to
+    the JSON of the list of elements.
+    """
+
+    # TextBlocks don't show leading spaces, so nested list entries are
+    # indented with non-breaking spaces.
+    INDENT = "\u00a0" * 4
+    HEADING_SIZES: ClassVar[dict[int, str]] = {1: "ExtraLarge", 2: "Large", 3: "Medium"}
+
+    def __init__(self, version: str, *extras: object) -> None:
+        """Create an AdaptiveCardRenderer."""
+        super().__init__(*extras)
+        self.version = version
+        self.diff_url: str | None = None
+        self.sections: list[dict[str, str]] = []
+        self.plaintext = PlainTextExtractor()
+        self.element_map: dict[str, Callable[..., Element]] = {
+            "Heading": self.heading_element,
+            "SetextHeading": self.heading_element,
+            "Quote": self.quote_element,
+            "CodeFence": self.code_element,
+            "BlockCode": self.code_element,
+            "ThematicBreak": self.thematic_break_element,
+        }
+
+    def __exit__(self, *args: object) -> None:
+        """Override the exit method to reset the diff_url."""
+        super().__exit__(*args)
+        self.diff_url = None
+        self.plaintext = PlainTextExtractor()
+
+    def render_document(self, token: block_token.Document) -> str:
+        """Render the section for the given version to a list of elements."""
+        # Only remember the text of tokens for the length of one render.
+        self.plaintext = PlainTextExtractor()
+        rendered = render_block_document(
+            self.version, token, self.render_element, self.plaintext
+        )
+        self.sections = [{"text": element} for element in rendered.rendered]
+        self.diff_url = rendered.diff_url
+        return f"[{', '.join(rendered.rendered)}]"
+
+    def render_element(self, token: token.Token) -> str:
+        """Render a block to the JSON of its element."""
+        return json.dumps(self.element(token))
+
+    def element(self, token: token.Token) -> Element:
+        """Make a block into an element."""
+        make_element = self.element_map.get(token.__class__.__name__)
+        if make_element is None:
+            # Anything else is shown as text.
+            return self.text_block(self.render(token))
+        return make_element(token)
+
+    @staticmethod
+    def text_block(text: str, **properties: object) -> Element:
+        """Make a TextBlock, wrapping its text."""
+        return {"type": "TextBlock", "text": text, "wrap": True, **properties}
+
+    def heading_element(self, token: block_token.Heading) -> Element:
+        """Make a heading into bold text, sized by its level."""
+        return self.text_block(
+            self.plaintext(token),
+            weight="Bolder",
+            size=self.HEADING_SIZES.get(token.level, "Default"),
+        )
+
+    def quote_element(self, token: block_token.Quote) -> Element:
+        """Make a quote into an emphasised container of its blocks."""
+        return {
+            "type": "Container",
+            "style": "emphasis",
+            "items": [self.element(child) for child in token.children or []],
+        }
+
+    def code_element(self, token: block_token.BlockCode) -> Element:
+        """Make a block of code into monospaced text."""
+        return self.text_block(
+            self.render_block_code(token).rstrip("\n"), fontType="Monospace"
+        )
+
+    def thematic_break_element(self, token: block_token.ThematicBreak) -> Element:
+        """Make a thematic break into a separator."""
+        _ = token
+        return self.text_block(" ", separator=True)
+
+    @staticmethod
+    def list_bullet(depth: int, number: int | None) -> str:
+        """Return the bullet that starts a list entry."""
+        if number is not None:
+            return f"{number}. "
+        # Use TRIANGULAR BULLET for subbullets and BULLET otherwise.
+        return "\u2023 " if depth > 0 else "\u2022 "
+
+    def render_strong(self, token: span_token.Strong) -> str:
+        """Render strong text as **text**."""
+        return f"**{self.render_inner(token)}**"
+
+    def render_emphasis(self, token: span_token.Emphasis) -> str:
+        """Render emphasis text as _text_."""
+        return f"_{self.render_inner(token)}_"
+
+    def render_inline_code(self, token: span_token.InlineCode) -> str:
+        """Render inline code as its text, as TextBlocks can't format code."""
+        return self.plaintext(token)
+
+    def render_strikethrough(self, token: span_token.Strikethrough) -> str:
+        """Render strikethrough text as its text, as TextBlocks can't strike it."""
+        return self.render_inner(token)
+
+    def render_image(self, token: span_token.Image) -> str:
+        """Render an image as a link to it."""
+        return f"[{self.plaintext(token) or token.src}]({token.src})"
+
+    def render_link(self, token: span_token.Link) -> str:
+        """Render a link as [inner](target)."""
+        return f"[{self.plaintext(token)}]({token.target})"
+
+    def render_auto_link(self, token: span_token.AutoLink) -> str:
+        """Render an auto link as [inner](target)."""
+        target = f"mailto:{token.target}" if token.mailto else token.target
+        return f"[{self.plaintext(token)}]({target})"
+
+    def render_html_span(self, token: span_token.HtmlSpan) -> str:
+        """Don't render HTML spans, just render the inner text."""
+        return token.content
+
+    def render_line_break(self, token: span_token.LineBreak) -> str:
+        """Render a line break as a newline character."""
+        _ = token
+        return "\n"
+
+    def render_heading(self, token: block_token.Heading) -> str:
+        """Render a heading as its text."""
+        return self.plaintext(token)
+
+    def render_quote(self, token: block_token.Quote) -> str:
+        """Render a quote as its text."""
+        return "\n".join(self.render(child) for child in token.children or [])
+
+    def render_paragraph(self, token: block_token.Paragraph) -> str:
+        """Render a paragraph."""
+        return self.render_inner(token)
+
+    def render_block_code(self, token: block_token.BlockCode) -> str:
+        """Render a block of code as its text."""
+        if not token.children:
+            return ""
+        return str(getattr(next(iter(token.children)), "content", ""))
+
+    def render_list(self, token: block_token.List) -> str:
+        """Render a list as a line for each entry.
+
+        TextBlocks show each line on its own, so one TextBlock holds a list.
+        Lists too long for one card are split between their entries when the
+        cards are built.
+        """
+        return "\n".join(
+            f"{self.INDENT * depth}{self.list_bullet(depth, number)}"
+            f"{self.render(child)}"
+            for (depth, number, child) in iter_list(token)
+        )
+
+    def render_list_item(self, token: block_token.ListItem) -> str:
+        """Uncalled method.
+
+        Lists are rendered from their entries by iter_list. If this is
+        called, something has gone wrong with the rendering of lists.
+        """
+        _ = token
+        return "list_item_uncalled"
+
+    def render_table(self, token: block_token.Table) -> str:
+        """Render a table as a line for each row."""
+        rows = [token.header] if getattr(token, "header", None) else []
+        rows.extend(token.children or [])
+        return "\n".join(self.render(row) for row in rows)
+
+    def render_table_row(
+        self, token: block_token.TableRow, is_header: bool = False
+    ) -> str:
+        """Render a table row as its cells separated by bars."""
+        _ = is_header
+        return " | ".join(self.render(cell) for cell in token.children or [])
+
+    def render_table_cell(
+        self, token: block_token.TableCell, in_header: bool = False
+    ) -> str:
+        """Render a table cell."""
+        _ = in_header
+        return self.render_inner(token)
+
+    def render_thematic_break(self, token: block_token.ThematicBreak) -> str:
+        """Render a thematic break as ---."""
+        _ = token
+        return "---"
+
+    def render_html_block(self, token: block_token.HtmlBlock) -> str:
+        """Don't render HTML blocks, just render the inner text."""
+        return token.content
+
+
+class TracingAdaptiveCardRenderer(TracingRenderer, AdaptiveCardRenderer):
+    """An AdaptiveCardRenderer that logs every token and element it renders."""
+
+    def element(self, token: token.Token) -> Element:
+        """Make a block into an element, logging it."""
+        element = super().element(token)
+        log.debug("Element for %r: %r", token, element)
+        return element
@@ -0,0 +1,229 @@
+# Copyright (c) Alianza, Inc. All rights reserved.
+"""BlockKitRenderer for mistletoe, for Slack messages made of blocks.
+
+Lists and code are rendered to Block Kit's rich text, so that they are shown
+natively, and everything else to mrkdwn sections as ChangeLogRenderer
+renders it. Slack's limit on the length of text in a block is kept to as the
+blocks are made, by splitting text over several blocks.
+"""
+
+import json
+import logging
+from collections.abc import Callable, Iterator
+from typing import Any, ClassVar, cast
+
+from mistletoe import block_token, span_token, token
+
+from announcer.changelogrenderer import ChangeLogRenderer
+from announcer.common import (
+    PlainTextExtractor,
+    TracingRenderer,
+    iter_list,
+    render_block_document,
+)
+from announcer.splitting import SLACK_MAX_BLOCK_TEXT, split_blocks
+
+log = logging.getLogger(__name__)
+
+# A Block Kit block, or an element of one.
+Block = dict[str, Any]
+
+# The longest text Slack allows in a header block.
+HEADER_MAX_TEXT = 150
+
+
+def header_block(text: str) -> Block:
+    """Make a header block, shortening the text if it is too long."""
+    if len(text) > HEADER_MAX_TEXT:
+        text = text[: HEADER_MAX_TEXT - 1] + "\u2026"
+    return {"type": "header", "text": {"type": "plain_text", "text": text}}
+
+
+class BlockKitRenderer(ChangeLogRenderer):
+    """Class to render a changelog to Slack Block Kit blocks.
+
+    Each top-level block in the version's section is made into one or more
+    blocks, and the JSON of each is one of the renderer's sections. The
+    document renders to the JSON of the list of blocks.
+    """
+
+    # The style of rich text for each type of formatting.
+    STYLES: ClassVar[dict[str, str]] = {
+        "Strong": "bold",
+        "Emphasis": "italic",
+        "Strikethrough": "strike",
+        "InlineCode": "code",
+    }
+
+    def __init__(self, version: str, *extras: object) -> None:
+        """Create a BlockKitRenderer."""
+        super().__init__(version, *extras)
+        self.block_map: dict[str, Callable[..., list[Block]]] = {
+            "Heading": self.heading_blocks,
+            "SetextHeading": self.heading_blocks,
+            "CodeFence": self.code_blocks,
+            "BlockCode": self.code_blocks,
+            "List": self.list_blocks,
+            "ThematicBreak": self.thematic_break_blocks,
+        }
+
+    def render_document(self, token: block_token.Document) -> str:
+        """Render the section for the given version to a list of blocks."""
+        # Only remember the text of tokens for the length of one render.
+        self.plaintext = PlainTextExtractor()
+        self.sections = []
+        rendered = render_block_document(
+            self.version, token, self.render_blocks, self.plaintext
+        )
+        self.diff_url = rendered.diff_url
+        return f"[{', '.join(section for section in rendered.rendered if section)}]"
+
+    def render_blocks(self, token: token.Token) -> str:
+        """Render a top-level block to the JSON of its blocks.
+
+        The JSON of each block is added to the sections.
+        """
+        sections = [json.dumps(block) for block in self.blocks(token)]
+        self.sections.extend({"text": section} for section in sections)
+        return ", ".join(sections)
+
+    def blocks(self, token: token.Token) -> list[Block]:
+        """Make a top-level block into Block Kit blocks."""
+        make_blocks = self.block_map.get(token.__class__.__name__)
+        if make_blocks is None:
+            # Anything else is shown as mrkdwn.
+            return self.mrkdwn_blocks(self.render_buffered(token))
+        return make_blocks(token)
+
+    @staticmethod
+    def mrkdwn_blocks(text: str) -> list[Block]:
+        """Make sections of mrkdwn, splitting text that is too long for one."""
+        return [
+            {"type": "section", "text": {"type": "mrkdwn", "text": chunk}}
+            for chunk in split_blocks([text.rstrip("\n")], SLACK_MAX_BLOCK_TEXT)
+            if chunk
+        ]
+
+    def heading_blocks(self, token: block_token.Heading) -> list[Block]:
+        """Make version and higher headings into headers, others into bold text."""
+        if token.level <= 2:
+            return [header_block(self.plaintext(token))]
+        return self.mrkdwn_blocks(self.render_heading(token))
+
+    def code_blocks(self, token: block_token.BlockCode) -> list[Block]:
+        """Make a block of code into preformatted rich text."""
+        content = self.plaintext(token).rstrip("\n")
+        return [
+            self.rich_text_block(
+                [
+                    {
+                        "type": "rich_text_preformatted",
+                        "elements": [{"type": "text", "text": chunk}],
+                    }
+                ]
+            )
+            for chunk in split_blocks([content], SLACK_MAX_BLOCK_TEXT)
+        ]
+
+    def list_blocks(self, token: block_token.List) -> list[Block]:
+        """Make a list into rich text lists, indented by how nested they are.
+
+        Entries are split between blocks so that each block's text is within
+        Slack's limit.
+        """
+        blocks: list[Block] = []
+        lists: list[Block] = []
+        size = 0
+        for depth, number, child in iter_list(token):
+            entry = self.rich_text_section(child)
+            entry_size = sum(
+                len(element.get("text", "")) for element in entry["elements"]
+            )
+            if lists and size + entry_size > SLACK_MAX_BLOCK_TEXT:
+                blocks.append(self.rich_text_block(lists))
+                (lists, size) = ([], 0)
+            size += entry_size
+
+            style = "bullet" if number is None else "ordered"
+            current = lists[-1] if lists else None
+            if (
+                current is None
+                or current["indent"] != depth
+                or current["style"] != style
+            ):
+                current = {
+                    "type": "rich_text_list",
+                    "style": style,
+                    "indent": depth,
+                    "elements": [],
+                }
+                if number is not None and number != 1:
+                    current["offset"] = number - 1
+                lists.append(current)
+            current["elements"].append(entry)
+        if lists:
+            blocks.append(self.rich_text_block(lists))
+        return blocks
+
+    def thematic_break_blocks(self, token: block_token.ThematicBreak) -> list[Block]:
+        """Make a thematic break into a divider."""
+        _ = token
+        return [{"type": "divider"}]
+
+    @staticmethod
+    def rich_text_block(elements: list[Block]) -> Block:
+        """Make a rich text block."""
+        return {"type": "rich_text", "elements": elements}
+
+    def rich_text_section(self, token: token.Token) -> Block:
+        """Make a block into a section of rich text."""
+        if token.__class__.__name__ == "Paragraph":
+            elements = list(self.rich_text(token, {}))
+        else:
+            elements = [{"type": "text", "text": self.plaintext(token)}]
+        return {"type": "rich_text_section", "elements": elements}
+
+    def rich_text(self, token: token.Token, style: dict[str, bool]) -> Iterator[Block]:
+        """Yield the rich text elements for the children of a token."""
+        for child in token.children or []:
+            name = child.__class__.__name__
+            if name in self.STYLES:
+                yield from self.rich_text(child, {**style, self.STYLES[name]: True})
+                continue
+
+            element: Block
+            if name == "Link":
+                link = cast(span_token.Link, child)
+                element = {"type": "link", "url": link.target}
+            elif name == "AutoLink":
+                auto_link = cast(span_token.AutoLink, child)
+                element = {
+                    "type": "link",
+                    "url": f"mailto:{auto_link.target}"
+                    if auto_link.mailto
+                    else auto_link.target,
+                }
+            elif name == "Image":
+                element = {"type": "link", "url": cast(span_token.Image, child).src}
+            elif name == "LineBreak":
+                element = {"type": "text", "text": "\n"}
+            elif child.children is not None:
+                yield from self.rich_text(child, style)
+                continue
+            else:
+                element = {"type": "text", "text": getattr(child, "content", "")}
+            if element["type"] == "link":
+                element["text"] = self.plaintext(child)
+            if style:
+                element["style"] = style
+            yield element
+
+
+class TracingBlockKitRenderer(TracingRenderer, BlockKitRenderer):
+    """A BlockKitRenderer that logs every token and block it renders."""
+
+    def blocks(self, token: token.Token) -> list[Block]:
+        """Make a top-level block into Block Kit blocks, logging them."""
+        blocks = super().blocks(token)
+        log.debug("Blocks for %r: %r", token, blocks)
+        return blocks
@@ -0,0 +1,357 @@
+# Copyright (c) Alianza, Inc. All rights reserved.
+"""On-disk index of the sections in a changelog.
+
+The index records where each chunk found by the section pre-scan starts and
+ends in the file, so that later runs against the same changelog can read the
+candidate sections for a version straight out of the file instead of
+scanning it again. It is stored as JSON beside the changelog, and is checked
+against the changelog's size, modification time and content hash before use.
+"""
+
+import hashlib
+import io
+import json
+import locale
+import logging
+import mmap
+import os
+import tempfile
+from collections.abc import Iterator
+from dataclasses import dataclass
+from typing import Any, BinaryIO
+
+from mistletoe.block_token import Document
+
+from .common import version_heading
+from .sectionscanner import (
+    AmbiguousChangelogError,
+    Chunk,
+    DefinitionRun,
+    assemble_version_lines,
+    iter_chunks,
+)
+
+log = logging.getLogger(__name__)
+
+INDEX_FORMAT = 2
+INDEX_SUFFIX = ".announcer-index.json"
+
+
+def index_path(filename: str) -> str:
+    """Return the path of the index for a changelog."""
+    return filename + INDEX_SUFFIX
+
+
+def changelog_encoding() -> str | None:
+    """Return the encoding changelogs are read with, if it can be indexed."""
+    encoding = locale.getpreferredencoding(False)
+    if "\n".encode(encoding) != b"\n":
+        return None
+    return encoding
+
+
+def decode_lines(data: bytes, encoding: str) -> list[str]:
+    """Decode lines from a changelog the same way as reading it as text.
+
+    Lines only end at newlines, as when reading a file, and not at the other
+    line boundaries str.splitlines knows, such as form feeds.
+    """
+    return list(io.StringIO(data.decode(encoding), newline=None))
+
+
+@dataclass
+class VersionRange:
+    """The byte range of a version's section, and its diff URL."""
+
+    start: int
+    end: int
+    diff_url: str | None
+
+
+def chunk_to_row(chunk: Chunk) -> list[Any]:
+    """Convert a chunk to the compact form stored in an index."""
+    return [
+        chunk.start,
+        chunk.end,
+        chunk.heading,
+        chunk.headings,
+        [[run.positions, run.labels, run.is_complete()] for run in chunk.definitions],
+        sorted(chunk.uncertain_labels),
+    ]
+
+
+def chunk_from_row(row: list[Any]) -> Chunk:
+    """Convert a chunk from the compact form stored in an index."""
+    (start, end, heading, headings, runs, uncertain_labels) = row
+    return Chunk(
+        start=start,
+        end=end,
+        heading=heading,
+        headings=headings,
+        definitions=[
+            DefinitionRun(
+                positions=[(p_start, p_end) for (p_start, p_end) in positions],
+                labels=labels,
+                complete=complete,
+            )
+            for (positions, labels, complete) in runs
+        ],
+        uncertain_labels=set(uncertain_labels),
+    )
+
+
+class ChangelogIndex:
+    """The positions of the sections in a changelog file."""
+
+    def __init__(
+        self,
+        filename: str,
+        size: int,
+        mtime_ns: int,
+        sha256: str,
+        rows: list[list[Any]] | None,
+        versions: dict[str, list[VersionRange]],
+    ) -> None:
+        """Create an index of a changelog.
+
+        Rows hold the chunks of the changelog in a compact form, or are None
+        if the changelog cannot be split into sections.
+        """
+        self.filename = filename
+        self.size = size
+        self.mtime_ns = mtime_ns
+        self.sha256 = sha256
+        self.rows = rows
+        self.versions = versions
+
+    @classmethod
+    def build(cls, filename: str) -> "ChangelogIndex":
+        """Scan a changelog and index its sections."""
+        encoding = changelog_encoding()
+        with open(filename, "rb") as f:
+            stat = os.fstat(f.fileno())
+            digest = hashlib.sha256()
+            offsets = [0]
+
+            def lines(f: BinaryIO) -> Iterator[str]:
+                for data in f:
+                    digest.update(data)
+                    offsets.append(offsets[-1] + len(data))
+                    if encoding is None or b"\r" in data.rstrip(b"\r\n"):
+                        # Lone carriage returns are line endings to a text
+                        # reader, so the byte offsets would not match up.
+                        raise AmbiguousChangelogError(data)
+                    yield from decode_lines(data, encoding)
+
+            try:
+                chunks: list[Chunk] | None = list(iter_chunks(lines(f)))
+            except (AmbiguousChangelogError, UnicodeDecodeError):
+                log.debug("Changelog %s cannot be split into sections", filename)
+                chunks = None
+                for data in f:
+                    digest.update(data)
+
+        rows = None
+        versions: dict[str, list[VersionRange]] = {}
+        if chunks is not None:
+            for chunk in chunks:
+                # Convert line numbers to byte offsets.
+                chunk.start = offsets[chunk.start]
+                chunk.end = offsets[chunk.end]
+                for run in chunk.definitions:
+                    run.positions = [
+                        (offsets[start], offsets[end]) for start, end in run.positions
+                    ]
+                    run.is_complete()
+            versions = index_versions(chunks)
+            rows = [chunk_to_row(chunk) for chunk in chunks]
+
+        return cls(
+            filename,
+            stat.st_size,
+            stat.st_mtime_ns,
+            digest.hexdigest(),
+            rows,
+            versions,
+        )
+
+    @classmethod
+    def load(cls, filename: str) -> "ChangelogIndex | None":
+        """Load the index for a changelog, if there is a valid one."""
+        try:
+            with open(index_path(filename), "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data["format"] != INDEX_FORMAT:
+                log.debug("Index for %s has an old format", filename)
+                return None
+            index = cls(
+                filename,
+                data["size"],
+                data["mtime_ns"],
+                data["sha256"],
+                data["chunks"],
+                {
+                    version: [VersionRange(*r) for r in ranges]
+                    for version, ranges in data["versions"].items()
+                },
+            )
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            log.warning("Ignoring unreadable index for %s: %s", filename, e)
+            return None
+
+        return index
+
+    def save(self) -> None:
+        """Write the index beside the changelog."""
+        data = {
+            "format": INDEX_FORMAT,
+            "size": self.size,
+            "mtime_ns": self.mtime_ns,
+            "sha256": self.sha256,
+            "chunks": self.rows,
+            "versions": {
+                version: [[r.start, r.end, r.diff_url] for r in ranges]
+                for version, ranges in self.versions.items()
+            },
+        }
+
+        # Write to a temporary file of our own first, so that readers never see
+        # a partial index, even while other threads or processes write it.
+        path = index_path(self.filename)
+        (fd, temporary) = tempfile.mkstemp(
+            dir=os.path.dirname(path) or ".", suffix=".tmp"
+        )
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(data, f, separators=(",", ":"))
+            os.replace(temporary, path)
+        except BaseException:
+            os.unlink(temporary)
+            raise
+
+    def is_current(self) -> bool:
+        """Return whether the changelog is unchanged since it was indexed."""
+        try:
+            stat = os.stat(self.filename)
+        except OSError:
+            return False
+        if stat.st_size != self.size:
+            return False
+        if stat.st_mtime_ns == self.mtime_ns:
+            return True
+
+        # The file has been touched, but may not have changed.
+        digest = hashlib.sha256()
+        with open(self.filename, "rb") as f:
+            for data in iter(lambda: f.read(1 << 16), b""):
+                digest.update(data)
+        if digest.hexdigest() != self.sha256:
+            return False
+        self.mtime_ns = stat.st_mtime_ns
+        return True
+
+    def extract_version_lines(self, version: str) -> list[str] | None:
+        """Read the lines mistletoe needs to render a version from the changelog.
+
+        Only the sections the index found for the version are read, along with
+        the definitions they may refer to. None is returned if the index has
+        no sections for the version, or if the changelog could not be split
+        into sections.
+        """
+        encoding = changelog_encoding()
+        ranges = self.versions.get(version)
+        if self.rows is None or encoding is None or not ranges:
+            return None
+
+        # The index knows which chunks are the version's sections. Other
+        # chunks only matter for their definitions.
+        starts = {r.start for r in ranges}
+        try:
+            chunks = [
+                chunk_from_row(row)
+                for row in self.rows
+                if row[0] in starts or row[4] or row[5]
+            ]
+        except (LookupError, TypeError, ValueError) as e:
+            log.warning("Ignoring unreadable index for %s: %s", self.filename, e)
+            return None
+        for chunk in chunks:
+            if chunk.start not in starts:
+                chunk.headings = []
+        if not any(chunk.is_candidate(version) for chunk in chunks):
+            return None
+
+        with (
+            open(self.filename, "rb") as f,
+            mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data,
+        ):
+            return assemble_version_lines(
+                chunks,
+                version,
+                lambda start, end: decode_lines(data[start:end], encoding),
+            )
+
+
+def index_versions(chunks: list[Chunk]) -> dict[str, list[VersionRange]]:
+    """Find the version and diff URL of each chunk's heading.
+
+    The headings are parsed on their own, with the definitions they may refer
+    to. The text of the chunks is dropped once it has been used.
+    """
+    lines: list[str] = []
+    heading_chunks = {}
+    for chunk in chunks:
+        if chunk.heading is not None:
+            # mistletoe numbers lines from 1.
+            heading_chunks[len(lines) + 1] = chunk
+            lines.extend([chunk.heading, "\n"])
+    for chunk in chunks:
+        for run in chunk.definitions:
+            lines.extend(run.text or [])
+            lines.append("\n")
+            run.text = None
+        chunk.text = None
+
+    versions: dict[str, list[VersionRange]] = {}
+    for child in Document(lines).children or []:
+        heading = version_heading(child)
+        section = heading_chunks.get(getattr(child, "line_number", 0))
+        if heading is not None and section is not None:
+            versions.setdefault(heading.version, []).append(
+                VersionRange(section.start, section.end, heading.diff_url)
+            )
+    return versions
+
+
+def refresh_index(filename: str) -> ChangelogIndex:
+    """Build the index for a changelog and write it beside the changelog."""
+    index = ChangelogIndex.build(filename)
+    index.save()
+    return index
+
+
+def current_index(filename: str) -> ChangelogIndex | None:
+    """Load the index for a changelog, rebuilding it if the changelog changed.
+
+    None is returned if the changelog has not been indexed.
+    """
+    index = ChangelogIndex.load(filename)
+    if index is None:
+        return None
+
+    mtime_ns = index.mtime_ns
+    if index.is_current():
+        if index.mtime_ns == mtime_ns:
+            return index
+        log.debug("Changelog %s was touched but not changed", filename)
+    else:
+        log.info("Changelog %s has changed; rebuilding its index", filename)
+        index = ChangelogIndex.build(filename)
+
+    try:
+        index.save()
+    except OSError as e:
+        log.warning("Failed to update index for %s: %s", filename, e)
+    return index
@@ -3,22 +3,25 @@
 
 import html
 import logging
-from typing import cast
 
-from mistletoe import block_token, span_token, token
+from mistletoe import block_token, span_token
 from mistletoe.base_renderer import BaseRenderer
 
 from announcer.common import (
+    BufferedRenderer,
     ListCounter,
     ListEntry,
+    PlainTextExtractor,
+    TracingRenderer,
+    iter_list,
+    iter_listitem,
     render_block_document,
-    render_to_plaintext,
 )
 
 log = logging.getLogger(__name__)
 
 
-class ChangeLogRenderer(BaseRenderer):
+class ChangeLogRenderer(BufferedRenderer, BaseRenderer):
     """Class to render a changelog to Slack's markdown format."""
 
     def __init__(self, version: str, *extras: object) -> None:
@@ -27,24 +30,34 @@ class ChangeLogRenderer(BaseRenderer):
         self.version = version
         self.diff_url: str | None = None
         self.sections: list[dict[str, str]] = []
+        self.plaintext = PlainTextExtractor()
+        self.write_map = {
+            "Strong": self.write_strong,
+            "Emphasis": self.write_emphasis,
+            "Strikethrough": self.write_strikethrough,
+            "EscapeSequence": self.write_inner,
+            "Paragraph": self.write_inner,
+            "Quote": self.write_quote,
+            "List": self.write_list,
+        }
 
     def __exit__(self, *args: object) -> None:
         """Override the exit method to reset the diff_url."""
         super().__exit__(*args)
         self.diff_url = None
+        self.plaintext = PlainTextExtractor()
 
     def render_document(self, token: block_token.Document) -> str:
         """Override the render_document method to only render the section for the given version."""
-        rendered = render_block_document(self.version, token, self.render)
+        # Only remember the text of tokens for the length of one render.
+        self.plaintext = PlainTextExtractor()
+        rendered = render_block_document(
+            self.version, token, self.render_buffered, self.plaintext
+        )
+        self.sections = [{"text": section} for section in rendered.rendered]
         self.diff_url = rendered.diff_url
         return "".join(rendered.rendered)
 
-    def render(self, token: token.Token) -> str:
-        """Override the render method to add debug logging."""
-        ret = self.render_map[token.__class__.__name__](token)
-        log.debug("Rendering %r returns %r", token, ret)
-        return ret
-
     def render_strong(self, token: span_token.Strong) -> str:
         """Render strong text as *text*."""
         return f"*{self.render_inner(token)}*"
@@ -77,7 +90,7 @@ class ChangeLogRenderer(BaseRenderer):
         """Render a link as <target|inner>."""
         template = "<{target}|{inner}>"
         target = token.target
-        inner = self.escape_html(render_to_plaintext(token))
+        inner = self.escape_html(self.plaintext(token))
         return template.format(target=target, inner=inner)
 
     def render_auto_link(self, token: span_token.AutoLink) -> str:
@@ -87,7 +100,7 @@ class ChangeLogRenderer(BaseRenderer):
             target = f"mailto:{token.target}"
         else:
             target = token.target
-        inner = self.escape_html(render_to_plaintext(token))
+        inner = self.escape_html(self.plaintext(token))
         return template.format(target=target, inner=inner)
 
     def render_escape_sequence(self, token: span_token.EscapeSequence) -> str:
@@ -105,7 +118,7 @@ class ChangeLogRenderer(BaseRenderer):
     def render_heading(self, token: block_token.Heading) -> str:
         """Render level 3 headings as *heading*, other levels as plain text."""
         template = "*{}*\n" if token.level == 3 else "{}\n"
-        return template.format(render_to_plaintext(token))
+        return template.format(self.plaintext(token))
 
     def render_quote(self, token: block_token.Quote) -> str:
         """Render a quote as > text."""
@@ -129,61 +142,51 @@ class ChangeLogRenderer(BaseRenderer):
 
     def render_list(self, token: block_token.List) -> str:
         """Render a list."""
-        analysed = self.analyse_list(token, 0)
-        rendered_list = [self.render_listentry(e) for e in analysed]
-        return "".join(rendered_list)
+        return "".join(
+            f"{self.list_bullet(depth, number)}{self.render(child)}\n"
+            for (depth, number, child) in iter_list(token)
+        )
+
+    def analyse_list(self, token: block_token.List, depth: int) -> list[ListEntry]:
+        """Analyse a list and return a list of ListEntry objects representing the list entries.
+
+        Lists are no longer rendered from these, which are only kept for callers.
+        """
+        return [
+            ListEntry(entry_depth, number, self.render(child))
+            for (entry_depth, number, child) in iter_list(token, depth)
+        ]
+
+    def analyse_listitem(
+        self, token: block_token.ListItem, depth: int, counter: ListCounter
+    ) -> list[ListEntry]:
+        """Analyse a list item and return a list of ListEntry objects representing the list item entries."""
+        return [
+            ListEntry(entry_depth, number, self.render(child))
+            for (entry_depth, number, child) in iter_listitem(token, depth, counter)
+        ]
 
     def render_listentry(self, listentry: ListEntry) -> str:
         """Render a list entry."""
-        if listentry.number is not None:
-            bullet = f"{listentry.number}."
+        bullet = self.list_bullet(listentry.depth, listentry.number)
+        return f"{bullet}{listentry.content}\n"
+
+    @staticmethod
+    def list_bullet(depth: int, number: int | None) -> str:
+        """Return the indent and bullet that start a list entry."""
+        if number is not None:
+            bullet = f"{number}."
         else:
-            if listentry.depth > 0:
+            if depth > 0:
                 # Use TRIANGULAR BULLET for subbullets
                 bullet = "\u2023"
             else:
                 # Use BULLET
                 bullet = "\u2022"
 
-        leading_spaces = " " * (listentry.depth * 4)
-
-        return f"{leading_spaces}{bullet} {listentry.content}\n"
-
-    def analyse_list(self, token: block_token.List, depth: int) -> list[ListEntry]:
-        """Analyse a list and return a list of ListEntry objects representing the list entries."""
-        analysed = []
+        leading_spaces = " " * (depth * 4)
 
-        # token.start is a property, List.start() is a class method.
-        start = cast(int | None, token.start)
-
-        counter = ListCounter(start)
-        if token.children:
-            for list_item in token.children:
-                list_item = cast(block_token.ListItem, list_item)
-                analysed.extend(self.analyse_listitem(list_item, depth, counter))
-
-        return analysed
-
-    def analyse_listitem(
-        self, token: block_token.ListItem, depth: int, counter: ListCounter
-    ) -> list[ListEntry]:
-        """Analyse a list item and return a list of ListEntry objects representing the list item entries."""
-        entries = []
-
-        if token.children:
-            for listitem_child in token.children:
-                if listitem_child.__class__.__name__ == "List":
-                    listitem_child = cast(block_token.List, listitem_child)
-                    sub_entries = self.analyse_list(listitem_child, depth + 1)
-                    entries.extend(sub_entries)
-                else:
-                    number = next(counter)
-                    entries.append(
-                        ListEntry(depth, number, self.render(listitem_child))
-                    )
-
-        log.debug("Listitem entries: %s", entries)
-        return entries
+        return f"{leading_spaces}{bullet} "
 
     def render_list_item(self, token: block_token.ListItem) -> str:
         """Uncalled method.
@@ -229,7 +232,56 @@ class ChangeLogRenderer(BaseRenderer):
         """Don't render HTML blocks, just render the inner text."""
         return token.content
 
+    def write_strong(self, token: span_token.Strong, out: list[str]) -> None:
+        """Write strong text as *text*."""
+        out.append("*")
+        self.write_inner(token, out)
+        out.append("*")
+
+    def write_emphasis(self, token: span_token.Emphasis, out: list[str]) -> None:
+        """Write emphasis text as _text_."""
+        out.append("_")
+        self.write_inner(token, out)
+        out.append("_")
+
+    def write_strikethrough(
+        self, token: span_token.Strikethrough, out: list[str]
+    ) -> None:
+        """Write strikethrough text as ~text~."""
+        out.append("~")
+        self.write_inner(token, out)
+        out.append("~")
+
+    def write_quote(self, token: block_token.Quote, out: list[str]) -> None:
+        """Write a quote as > text."""
+        out.append("> ")
+        self.write_inner(token, out)
+        out.append("\n")
+
+    def write_list(self, token: block_token.List, out: list[str]) -> None:
+        """Write a list."""
+        for depth, number, child in iter_list(token):
+            out.append(self.list_bullet(depth, number))
+            self.write(child, out)
+            out.append("\n")
+
     @staticmethod
     def escape_html(raw: str) -> str:
         """Escape HTML special characters in a string."""
         return html.escape(raw, quote=False)
+
+
+class TracingChangeLogRenderer(TracingRenderer, ChangeLogRenderer):
+    """A ChangeLogRenderer that logs every token and list entry it renders."""
+
+    def render_list(self, token: block_token.List) -> str:
+        """Render a list, logging each of its entries."""
+        return "".join(
+            self.render_listentry(ListEntry(depth, number, self.render(child)))
+            for (depth, number, child) in iter_list(token)
+        )
+
+    def render_listentry(self, listentry: ListEntry) -> str:
+        """Render a list entry, logging it."""
+        log.debug("List entry: %s", listentry)
+        return super().render_listentry(listentry)
@@ -2,14 +2,19 @@
 """Common functionality for all renderers."""
 
 import logging
-from collections import namedtuple
-from collections.abc import Callable
+from collections.abc import Callable, Iterator
 from dataclasses import dataclass
-from typing import cast
+from typing import NamedTuple, cast
 
 from mistletoe import block_token, span_token, token
 
-ListEntry = namedtuple("ListEntry", ["depth", "number", "content"])
+
+class ListEntry(NamedTuple):
+    """A rendered line of a list, and where it sits in the list."""
+
+    depth: int
+    number: int | None
+    content: str
 
 
 log = logging.getLogger(__name__)
@@ -18,6 +23,8 @@ log = logging.getLogger(__name__)
 class ListCounter:
     """A simple counter for numbered lists."""
 
+    __slots__ = ("current",)
+
     def __init__(self, start: int | None) -> None:
         """Initialise the counter with the given start value."""
         self.current = start
@@ -30,15 +37,244 @@ class ListCounter:
         return current
 
 
+def iter_list(
+    token: block_token.List, depth: int = 0
+) -> Iterator[tuple[int, int | None, block_token.BlockToken]]:
+    """Yield the depth, number and content of each entry in a list.
+
+    Entries of nested lists are included in order.
+    """
+    # token.start is a property, List.start() is a class method.
+    start = cast(int | None, token.start)
+
+    counter = ListCounter(start)
+    for list_item in token.children or []:
+        list_item = cast(block_token.ListItem, list_item)
+        yield from iter_listitem(list_item, depth, counter)
+
+
+def iter_listitem(
+    token: block_token.ListItem, depth: int, counter: ListCounter
+) -> Iterator[tuple[int, int | None, block_token.BlockToken]]:
+    """Yield the depth, number and content of each entry in a list item."""
+    for listitem_child in token.children or []:
+        if listitem_child.__class__.__name__ == "List":
+            listitem_child = cast(block_token.List, listitem_child)
+            yield from iter_list(listitem_child, depth + 1)
+        else:
+            yield (
+                depth,
+                next(counter),
+                cast(block_token.BlockToken, listitem_child),
+            )
+
+
+class TracingRenderer:
+    """Mixin for renderers that logs every token rendered and its output.
+
+    Logging each token is costly even when debug logging is off, so this is
+    kept out of the renderers themselves and only mixed in when tracing.
+    Every token goes through render, so nothing is buffered.
+    """
+
+    buffered = False
+    render_map: dict[str, Callable[[token.Token], str]]
+
+    def render(self, token: token.Token) -> str:
+        """Render a token, logging the result."""
+        ret = self.render_map[token.__class__.__name__](token)
+        log.debug("Rendering %r returns %r", token, ret)
+        return ret
+
+
+class PlainTextExtractor:
+    """Render tokens to plain text, remembering the text of every subtree.
+
+    Tokens are walked without recursion, so deeply nested input can't exhaust
+    the stack, and the text of a subtree is only built once however many
+    times it is asked for. An extractor should only be used for one render,
+    as it keeps every token it has seen alive.
+    """
+
+    def __init__(self) -> None:
+        """Create an extractor with nothing cached."""
+        # Keyed on token identity. Each token is held alongside its text so
+        # that its id can't be reused by another token.
+        self.cache: dict[int, tuple[token.Token, str]] = {}
+
+    def __call__(self, root: token.Token) -> str:
+        """Return the plain text of a token."""
+        if root.children is None:
+            return getattr(root, "content", "")
+
+        cache = self.cache
+        cached = cache.get(id(root))
+        if cached is not None:
+            return cached[1]
+
+        # Most tokens (e.g. links) only hold text, so don't bother walking or
+        # caching those.
+        parts = []
+        for child in root.children:
+            if child.children is not None:
+                break
+            parts.append(getattr(child, "content", ""))
+        else:
+            return "".join(parts)
+
+        # Each entry is a token with children, and whether they have been
+        # done. The text of tokens without children is cheap to get, so it
+        # isn't cached.
+        stack: list[tuple[token.Token, bool]] = [(root, False)]
+        while stack:
+            (current, children_done) = stack.pop()
+            children = current.children or []
+            if children_done:
+                cache[id(current)] = (
+                    current,
+                    "".join(
+                        getattr(child, "content", "")
+                        if child.children is None
+                        else cache[id(child)][1]
+                        for child in children
+                    ),
+                )
+            elif id(current) not in cache:
+                stack.append((current, True))
+                stack.extend(
+                    (child, False) for child in children if child.children is not None
+                )
+
+        return cache[id(root)][1]
+
+
+class BufferedRenderer:
+    """Mixin for renderers that can write their output into one buffer.
+
+    Rendering returns a string for every token, which its parent then joins
+    with its siblings', so text is copied once per level of nesting. When
+    buffered, tokens with a writer in write_map instead append their text to
+    a shared list, which is joined once at the end. Tokens without a writer
+    are rendered as usual and the result appended.
+    """
+
+    # Whether render_buffered writes into a buffer, or just renders.
+    buffered = True
+    render_map: dict[str, Callable[[token.Token], str]]
+    write_map: dict[str, Callable[..., None]]
+
+    def write(self, token: token.Token, out: list[str]) -> None:
+        """Write a token's output to a buffer."""
+        name = token.__class__.__name__
+        writer = self.write_map.get(name)
+        if writer is not None:
+            writer(token, out)
+        else:
+            out.append(self.render_map[name](token))
+
+    def write_inner(self, token: token.Token, out: list[str]) -> None:
+        """Write the output of a token's children to a buffer."""
+        for child in token.children or []:
+            self.write(child, out)
+
+    def render_buffered(self, token: token.Token) -> str:
+        """Render a token, writing into a buffer if buffered."""
+        if not self.buffered:
+            return self.render_map[token.__class__.__name__](token)
+        out: list[str] = []
+        self.write(token, out)
+        return "".join(out)
+
+
 def render_to_plaintext(token: token.Token) -> str:
     """Render a token to plain text."""
-    if token.children is not None:
-        rendered = [render_to_plaintext(child) for child in token.children]
-        return "".join(rendered)
-    elif hasattr(token, "content"):
-        return token.content
-    else:
-        return ""
+    return PlainTextExtractor()(token)
+
+
+@dataclass
+class VersionHeading:
+    """A dataclass to hold the details of a level 2 version heading."""
+
+    version: str
+    diff_url: str | None
+
+
+def version_heading(
+    child: token.Token,
+    plaintext: Callable[[token.Token], str] = render_to_plaintext,
+) -> VersionHeading | None:
+    """Return the version details if the token is a level 2 heading.
+
+    The heading's text is found with the plaintext function.
+    """
+    if child.__class__.__name__ != "Heading":
+        return None
+
+    heading = cast(block_token.Heading, child)
+    if heading.level != 2 or heading.children is None:
+        return None
+
+    # Get the text of the first child of this heading. This should be the
+    # version number, or "Unreleased".
+    first_child = next(iter(heading.children))
+    diff_url = None
+    if first_child.__class__.__name__ == "Link":
+        diff_url = str(cast(span_token.Link, first_child).target)
+
+    return VersionHeading(version=plaintext(first_child), diff_url=diff_url)
+
+
+def has_version(token: block_token.Document, version: str) -> bool:
+    """Return whether the document has a level 2 heading for the given version."""
+    for child in token.children or []:
+        heading = version_heading(child)
+        if heading is not None and heading.version == version:
+            return True
+    return False
+
+
+@dataclass
+class VersionSection:
+    """The top-level tokens in the section for a version, and its diff URL.
+
+    The tokens start with the version's level 2 heading. If the version has
+    more than one heading, the tokens under each are included.
+    """
+
+    version: str
+    diff_url: str | None
+    children: list[token.Token]
+
+
+def split_versions(
+    token: block_token.Document,
+    plaintext: Callable[[token.Token], str] = render_to_plaintext,
+) -> dict[str, VersionSection]:
+    """Find the section for every version in a document, in one pass.
+
+    The sections are in the order they are in the document. The text of
+    headings is found with the plaintext function.
+    """
+    sections: dict[str, VersionSection] = {}
+    section: VersionSection | None = None
+    for child in token.children or []:
+        heading = version_heading(child, plaintext)
+        if heading is not None:
+            section = sections.setdefault(
+                heading.version, VersionSection(heading.version, None, [])
+            )
+            if heading.diff_url is not None:
+                section.diff_url = heading.diff_url
+        if section is not None:
+            section.children.append(child)
+    return sections
+
+
+def section_document(section: VersionSection) -> block_token.Document:
+    """Make a document of just the tokens in a version's section."""
+    document = block_token.Document([])
+    document.children = list(section.children)
+    return document
 
 
 @dataclass
@@ -53,36 +289,17 @@ def render_block_document(
     version: str,
     token: block_token.Document,
     render_function: Callable[[token.Token], str],
+    plaintext: Callable[[token.Token], str] = render_to_plaintext,
 ) -> DocumentRender:
-    """Render a document token to plain text, only rendering the section for the given version."""
-    to_render = []
-    diff_url: str | None = None
-    rendering = False
-
-    if token.children:
-        for child in token.children:
-            if child.__class__.__name__ == "Heading":
-                heading = cast(block_token.Heading, child)
-                if heading.level == 2 and heading.children is not None:
-                    # Get the text of the first child of this heading. This should be the
-                    # version number, or "Unreleased".
-                    first_child = next(iter(heading.children))
-                    heading_text = render_to_plaintext(first_child)
-
-                    # Only render things under the right level 2 heading.
-                    if heading_text == version:
-                        rendering = True
-                        if first_child.__class__.__name__ == "Link":
-                            first_child = cast(span_token.Link, first_child)
-                            diff_url = str(first_child.target)
-
-                    else:
-                        rendering = False
-
-            if rendering:
-                to_render.append(child)
-            else:
-                log.debug("Not rendering %s", child)
+    """Render a document token to plain text, only rendering the section for the given version.
+
+    The text of headings is found with the plaintext function.
+    """
+    # Only render things under the right level 2 heading.
+    section = split_versions(token, plaintext).get(version)
+    to_render = list(section.children) if section is not None else []
+    diff_url = section.diff_url if section is not None else None
+    tracing = log.isEnabledFor(logging.DEBUG)
 
     if to_render and to_render[-1].__class__.__name__ == "Heading":
         # The last field is a heading. Headings on their own are usually because
@@ -90,11 +307,12 @@ def render_block_document(
         # this, let's just delete it.
         log.warning(
             "Deleting empty heading as is the last field: %s",
-            render_to_plaintext(to_render[-1]),
+            plaintext(to_render[-1]),
         )
         to_render.pop()
 
-    log.debug("Document contents %r", to_render)
+    if tracing:
+        log.debug("Document contents %r", to_render)
 
     rendered = [render_function(child) for child in to_render]
     return DocumentRender(
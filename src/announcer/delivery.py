@@ -0,0 +1,328 @@
+# Copyright (c) Alianza, Inc. All rights reserved.
+"""Delivery of messages to webhooks.
+
+requests is only imported once a message is sent, to keep start-up fast.
+Messages are encoded as JSON once, to UTF-8 bytes, with orjson if it is
+installed and the standard library otherwise.
+"""
+
+import functools
+import importlib
+import json
+import logging
+import threading
+import time
+from collections.abc import Callable, Sequence
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any
+from urllib.parse import urlsplit
+
+from . import metrics
+from .retry import DEFAULT_RATE_LIMIT, HostRateLimiter, RetryPolicy
+
+if TYPE_CHECKING:
+    import requests
+
+log = logging.getLogger(__name__)
+
+DEFAULT_CONCURRENCY = 8
+DEFAULT_TIMEOUT = 10.0
+DEFAULT_RETRY_POLICY = RetryPolicy()
+
+# The number of hosts to keep connections open to, and the number of
+# connections to keep open to each host. Webhooks are normally spread over
+# only a few hosts (e.g. hooks.slack.com), so most of the connections are
+# kept per host to allow concurrent delivery to reuse them.
+POOL_HOSTS = 4
+POOL_CONNECTIONS_PER_HOST = 16
+
+# The data to send to a webhook: either one message, or a list of messages
+# (e.g. the parts of a message that was too big to send at once) to send in
+# order.
+MessageData = dict[str, Any] | list[dict[str, Any]]
+
+_session: "requests.Session | None" = None
+_session_lock = threading.Lock()
+
+
+def encode_json_stdlib(message_data: dict[str, Any]) -> bytes:
+    """Encode a message as compact JSON with the standard library."""
+    return json.dumps(message_data, ensure_ascii=False, separators=(",", ":")).encode(
+        "utf-8"
+    )
+
+
+@functools.cache
+def json_encoder() -> Callable[[dict[str, Any]], bytes]:
+    """Return the function to encode messages as JSON with.
+
+    This is orjson's, if it is installed, which produces the same JSON as
+    encode_json_stdlib much faster.
+    """
+    try:
+        orjson = importlib.import_module("orjson")
+    except ImportError:
+        return encode_json_stdlib
+    encode: Callable[[dict[str, Any]], bytes] = orjson.dumps
+    return encode
+
+
+def encode_message(message_data: dict[str, Any]) -> bytes:
+    """Encode a message as JSON, to send to a webhook."""
+    return json_encoder()(message_data)
+
+
+def encode_messages(
+    messages: Sequence[tuple[str, MessageData]],
+) -> list[list[bytes]]:
+    """Encode each part of each message, returning the parts for each.
+
+    Parts that are the same object, as when several destinations are sent
+    the same message, are only encoded once, and share their encoding.
+    """
+    encoded: dict[int, bytes] = {}
+    parts = []
+    with metrics.timed("encode", messages=len(messages)) as record:
+        for _webhook, message_data in messages:
+            message_parts = []
+            for part in (
+                message_data if isinstance(message_data, list) else [message_data]
+            ):
+                data = encoded.get(id(part))
+                if data is None:
+                    data = encoded[id(part)] = encode_message(part)
+                message_parts.append(data)
+            parts.append(message_parts)
+        if record is not None:
+            record["encoded"] = len(encoded)
+            record["bytes"] = sum(len(data) for data in encoded.values())
+    return parts
+
+
+def make_session(
+    pool_hosts: int = POOL_HOSTS,
+    pool_connections_per_host: int = POOL_CONNECTIONS_PER_HOST,
+) -> "requests.Session":
+    """Create an HTTP session that keeps connections to webhook hosts open."""
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=pool_hosts, pool_maxsize=pool_connections_per_host
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers["Content-Type"] = "application/json"
+    return session
+
+
+def get_session() -> "requests.Session":
+    """Return the HTTP session shared by all deliveries in this process."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = make_session()
+        return _session
+
+
+@dataclass
+class DeliveryResult:
+    """The outcome of sending a message to a webhook."""
+
+    webhook: str
+    error: OSError | None = None
+    elapsed: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        """Return whether the message was delivered."""
+        return self.error is None
+
+
+@dataclass(frozen=True)
+class DeliveryOptions:
+    """Options controlling how messages are delivered; see deliver."""
+
+    concurrency: int = DEFAULT_CONCURRENCY
+    timeout: float = DEFAULT_TIMEOUT
+    deadline: float | None = None
+    retry_policy: RetryPolicy = DEFAULT_RETRY_POLICY
+    # The average number of requests per second to send to each host, or 0
+    # for no limit.
+    rate_limit: float = DEFAULT_RATE_LIMIT
+
+
+class DeliveryError(Exception):
+    """One or more messages could not be delivered."""
+
+    def __init__(self, results: list[DeliveryResult]) -> None:
+        """Create an error from the results of a delivery."""
+        self.results = results
+        failed = [result for result in results if not result.ok]
+        super().__init__(f"{len(failed)} of {len(results)} messages failed to send")
+
+
+def post_message(
+    webhook: str,
+    message_data: dict[str, Any] | bytes,
+    timeout: float = DEFAULT_TIMEOUT,
+    session: "requests.Session | None" = None,
+    retry_policy: RetryPolicy = DEFAULT_RETRY_POLICY,
+    rate_limiter: HostRateLimiter | None = None,
+    retry_until: float | None = None,
+) -> None:
+    """Send a message to a webhook, retrying if it fails
+
+    The message is either data to encode as JSON, or JSON already encoded by
+    encode_message. The shared session is used unless another is given, so
+    that connections to the webhook's host are reused. No retries are started
+    after the retry_until time, as given by time.monotonic(), and no request
+    is left waiting for a response beyond it.
+    """
+    import requests
+
+    if isinstance(message_data, bytes):
+        data = message_data
+    else:
+        with metrics.timed("encode") as record:
+            data = encode_message(message_data)
+            if record is not None:
+                record["bytes"] = len(data)
+
+    log.debug("Webhook %s", webhook)
+    if log.isEnabledFor(logging.DEBUG):
+        log.debug("Sending info %s", data.decode("utf-8"))
+
+    if session is None:
+        session = get_session()
+    host = urlsplit(webhook).netloc
+    attempt = 0
+    waited = 0.0
+
+    while True:
+        if rate_limiter is not None:
+            rate_limiter.acquire(webhook)
+        attempt += 1
+        request_timeout = timeout
+        if retry_until is not None:
+            request_timeout = min(timeout, retry_until - time.monotonic())
+            if request_timeout <= 0:
+                raise requests.Timeout(f"No time left to send to {host}")
+
+        # Send the data using requests to the webhook.
+        try:
+            with metrics.timed(
+                "post", host=host, attempt=attempt, bytes=len(data)
+            ) as record:
+                r = session.post(webhook, data, timeout=request_timeout)
+                if record is not None:
+                    record["status"] = r.status_code
+                r.raise_for_status()
+            return
+        except requests.RequestException as e:
+            delay = retry_policy.retry_delay(e, attempt, waited)
+            if delay is None or (
+                retry_until is not None and time.monotonic() + delay > retry_until
+            ):
+                raise
+            log.warning(
+                "Attempt %d to send to %s failed (%s); retrying in %.1fs",
+                attempt,
+                host,
+                e,
+                delay,
+            )
+
+            if (
+                rate_limiter is not None
+                and isinstance(e, requests.HTTPError)
+                and e.response is not None
+                and e.response.status_code == 429
+            ):
+                # Hold back every request to this host, not just this one.
+                rate_limiter.pause(webhook, delay)
+
+        time.sleep(delay)
+        waited += delay
+
+
+def deliver(
+    messages: Sequence[tuple[str, MessageData]],
+    concurrency: int = DEFAULT_CONCURRENCY,
+    timeout: float = DEFAULT_TIMEOUT,
+    deadline: float | None = None,
+    session: "requests.Session | None" = None,
+    retry_policy: RetryPolicy = DEFAULT_RETRY_POLICY,
+    rate_limiter: HostRateLimiter | None = None,
+) -> list[DeliveryResult]:
+    """Send messages to webhooks concurrently.
+
+    Each message is a webhook URL and the data to send to it. A list of
+    messages for one webhook is sent in order, one after another over the same
+    connection, and stops at the first that fails. At most
+    concurrency messages are sent at once, each with the given timeout. If a
+    deadline is given, nothing is sent once that many seconds have passed:
+    requests still waiting for a response are given up on, the rest of a list
+    of messages isn't sent, and any message not delivered is reported as
+    failed. Nothing is left sending once this returns. Failed requests are
+    retried according to the retry policy, and requests to each host can be
+    rate limited. A failure to send one message does not stop the others from
+    being sent. The results are in the same order as the messages.
+    """
+    import requests
+
+    if not messages:
+        return []
+    if session is None:
+        session = get_session()
+    retry_until = time.monotonic() + deadline if deadline is not None else None
+
+    # Encode everything before sending anything.
+    encoded = encode_messages(messages)
+
+    def past_deadline() -> bool:
+        return retry_until is not None and time.monotonic() >= retry_until
+
+    def send(webhook: str, parts: list[bytes]) -> DeliveryResult:
+        start = time.monotonic()
+        sent = 0
+        try:
+            for part in parts:
+                if past_deadline():
+                    break
+                post_message(
+                    webhook,
+                    part,
+                    timeout,
+                    session,
+                    retry_policy,
+                    rate_limiter,
+                    retry_until,
+                )
+                sent += 1
+        except requests.Timeout as e:
+            if not past_deadline():
+                return DeliveryResult(webhook, e, time.monotonic() - start)
+        except requests.RequestException as e:
+            return DeliveryResult(webhook, e, time.monotonic() - start)
+        if sent < len(parts):
+            error = TimeoutError(
+                f"Not delivered within the {deadline}s deadline "
+                f"({sent} of {len(parts)} messages sent)"
+            )
+            return DeliveryResult(webhook, error, time.monotonic() - start)
+        return DeliveryResult(webhook, None, time.monotonic() - start)
+
+    # Every sender stops by itself at the deadline, so wait for all of them:
+    # anything reported as not delivered has stopped being sent.
+    with ThreadPoolExecutor(
+        max_workers=max(1, min(concurrency, len(messages))),
+        thread_name_prefix="announcer-delivery",
+    ) as executor:
+        futures = [
+            executor.submit(send, webhook, parts)
+            for ((webhook, _message_data), parts) in zip(messages, encoded, strict=True)
+        ]
+    return [future.result() for future in futures]
@@ -0,0 +1,194 @@
+# Copyright (c) Alianza, Inc. All rights reserved.
+"""Links to the pages of the forges that changelogs are hosted on.
+
+The diff URL of a version (the link in its heading) is matched against the
+URL patterns of every registered forge at once, with one regular expression
+made from all of them. That finds the forge, the base URL of the repository
+and the reference the version was released from, from which the link to the
+changelog at that reference is built.
+"""
+
+import functools
+import logging
+import os
+import re
+from dataclasses import dataclass
+
+log = logging.getLogger(__name__)
+
+# The path of the changelog in its repository, if it can't be worked out.
+DEFAULT_CHANGELOG_PATH = "CHANGELOG.md"
+
+# Matches the named groups in a forge's URL patterns.
+NAMED_GROUP_RE = re.compile(r"\(\?P<(base|reference)>")
+
+
+@dataclass(frozen=True)
+class Forge:
+    """A kind of forge, and how to find and build links to its pages.
+
+    Each URL pattern matches a diff URL, with a base group for the URL of the
+    repository and a reference group for the reference of the version. The
+    changelog template is formatted with the base URL, reference and path of
+    the changelog in the repository.
+    """
+
+    name: str
+    url_patterns: tuple[str, ...]
+    changelog_template: str
+
+
+@dataclass(frozen=True)
+class ForgeUrls:
+    """The forge, repository URL and reference found from a diff URL."""
+
+    forge: Forge
+    base_url: str
+    reference: str
+    diff_url: str
+    # Where the reference is in the diff URL.
+    reference_span: tuple[int, int]
+
+    def changelog_url(self, path: str = DEFAULT_CHANGELOG_PATH) -> str:
+        """Return the URL of the changelog at the reference."""
+        return self.forge.changelog_template.format(
+            base=self.base_url, reference=self.reference, path=path
+        )
+
+    def with_reference(self, reference: str) -> str:
+        """Return the diff URL, changed to be for another reference."""
+        (start, end) = self.reference_span
+        return self.diff_url[:start] + reference + self.diff_url[end:]
+
+
+GITLAB = Forge(
+    "gitlab",
+    (
+        "^(?P<base>.+)/-/compare/[^/]+[.][.][.]?(?P<reference>[^/.][^/]*)$",
+        "^(?P<base>.+)/-/tree/(?P<reference>[^/]+)$",
+        # gitlab.com still serves compare and tree pages without the /-/.
+        "^(?P<base>https?://gitlab[.]com/.+)/compare/[^/]+[.][.][.](?P<reference>[^/]+)$",
+        "^(?P<base>https?://gitlab[.]com/.+)/tree/(?P<reference>[^/]+)$",
+    ),
+    "{base}/-/blob/{reference}/{path}",
+)
+BITBUCKET = Forge(
+    "bitbucket",
+    (
+        # Bitbucket compares the first reference with the second, which is
+        # separated from it by a carriage return.
+        "^(?P<base>.+)/branches/compare/(?P<reference>[^/]+?)(?:%0[Dd]|\r)[^/]+$",
+        "^(?P<base>https?://bitbucket[.]org/[^/]+/[^/]+)/src/(?P<reference>[^/]+)/?$",
+    ),
+    "{base}/src/{reference}/{path}",
+)
+GITEA = Forge(
+    "gitea",
+    (
+        # Gitea and Forgejo compare URLs look like GitHub's, so only those on
+        # known hosts are recognised.
+        (
+            "^(?P<base>https?://(?:[^/]+[.])?(?:codeberg[.]org|gitea[.]com)/[^/]+/[^/]+)"
+            "/compare/[^/]+[.][.][.](?P<reference>[^/]+)$"
+        ),
+        "^(?P<base>.+)/src/(?:branch|tag|commit)/(?P<reference>[^/]+)$",
+    ),
+    "{base}/src/{reference}/{path}",
+)
+GITHUB = Forge(
+    "github",
+    (
+        "^(?P<base>.*)/compare/[^/]+[.][.][.](?P<reference>[^/]+)$",
+        "^(?P<base>.*)/tree/(?P<reference>[^/]+)$",
+    ),
+    "{base}/blob/{reference}/{path}",
+)
+
+# The forges to try, in order. GitHub's patterns match any host, so it is
+# tried last.
+FORGES: list[Forge] = [GITLAB, BITBUCKET, GITEA, GITHUB]
+
+
+def register_forge(forge: Forge) -> None:
+    """Add a forge, to be tried before those already registered."""
+    FORGES.insert(0, forge)
+    url_pattern.cache_clear()
+    derive_forge_urls.cache_clear()
+
+
+@functools.cache
+def url_pattern() -> tuple[re.Pattern[str], list[Forge]]:
+    """Return one pattern for the URLs of every forge, and the forges.
+
+    Each forge's patterns are wrapped in a group named after the index of the
+    forge, and their groups are renamed to be unique to it, so that the
+    forge that matched is the last group of a match.
+    """
+    forges = list(FORGES)
+    alternatives = []
+    for number, forge in enumerate(forges):
+        patterns: list[str] = []
+        for pattern in forge.url_patterns:
+            patterns.append(
+                NAMED_GROUP_RE.sub(rf"(?P<\g<1>{number}_{len(patterns)}>", pattern)
+            )
+        alternatives.append(f"(?P<forge{number}>{'|'.join(patterns)})")
+    return (re.compile("|".join(alternatives)), forges)
+
+
+@functools.lru_cache(maxsize=1024)
+def derive_forge_urls(diff_url: str) -> ForgeUrls | None:
+    """Find the forge, repository and reference of a diff URL."""
+    (pattern, forges) = url_pattern()
+    match = pattern.match(diff_url)
+    if match is None or match.lastgroup is None:
+        log.debug("Diff URL %s is not for a known forge", diff_url)
+        return None
+
+    number = int(match.lastgroup.removeprefix("forge"))
+    forge = forges[number]
+    for index in range(len(forge.url_patterns)):
+        base_url = match.group(f"base{number}_{index}")
+        if base_url is not None:
+            reference = f"reference{number}_{index}"
+            return ForgeUrls(
+                forge,
+                base_url,
+                match.group(reference),
+                diff_url,
+                match.span(reference),
+            )
+    return None
+
+
+def range_diff_url(oldest_url: str | None, newest_url: str | None) -> str | None:
+    """Return a diff URL for the changes in a range of versions.
+
+    This is the diff URL of the oldest version in the range, changed to be for
+    the reference of the newest, if they are for the same repository.
+    Otherwise, it is the newest's diff URL.
+    """
+    oldest = derive_forge_urls(oldest_url) if oldest_url else None
+    newest = derive_forge_urls(newest_url) if newest_url else None
+    if oldest is None or newest is None or oldest.base_url != newest.base_url:
+        return newest_url
+    return oldest.with_reference(newest.reference)
+
+
+@functools.cache
+def repository_path(changelogfile: str) -> str:
+    """Return the path of a changelog within its git repository.
+
+    The repository is found by looking for a .git directory (or file, for
+    worktrees) above the changelog. If there isn't one, the changelog is
+    assumed to be at the top of the repository.
+    """
+    path = os.path.abspath(changelogfile)
+    directory = os.path.dirname(path)
+    while True:
+        if os.path.exists(os.path.join(directory, ".git")):
+            return os.path.relpath(path, directory).replace(os.sep, "/")
+        parent = os.path.dirname(directory)
+        if parent == directory:
+            return os.path.basename(path)
+        directory = parent
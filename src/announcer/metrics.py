@@ -0,0 +1,164 @@
+# Copyright (c) Alianza, Inc. All rights reserved.
+"""Timing records for each stage of an announcement.
+
+Recording is off unless started, and each instrumented stage then costs no
+more than a check of whether it is on.
+"""
+
+import contextlib
+import json
+import threading
+import time
+from collections.abc import Callable, Iterator
+from typing import TypeVar
+
+T = TypeVar("T")
+
+# A record of one stage: its name, how long it took and details such as the
+# number of bytes sent.
+MetricsRecord = dict[str, object]
+
+
+class MetricsRecorder:
+    """Collect timing records, possibly from many threads."""
+
+    def __init__(self) -> None:
+        """Create an empty recorder."""
+        self.records: list[MetricsRecord] = []
+        self.lock = threading.Lock()
+
+    def add(self, record: MetricsRecord) -> None:
+        """Add a record."""
+        with self.lock:
+            self.records.append(record)
+
+
+_recorder: MetricsRecorder | None = None
+_disabled = contextlib.nullcontext(None)
+
+
+def enabled() -> bool:
+    """Return whether metrics are being recorded."""
+    return _recorder is not None
+
+
+def start() -> None:
+    """Start recording metrics, discarding any recorded already."""
+    global _recorder
+    _recorder = MetricsRecorder()
+
+
+def stop() -> list[MetricsRecord]:
+    """Stop recording metrics, returning the records."""
+    global _recorder
+    (recorder, _recorder) = (_recorder, None)
+    return recorder.records if recorder is not None else []
+
+
+def add_records(records: list[MetricsRecord]) -> None:
+    """Add records collected elsewhere, e.g. in another process."""
+    recorder = _recorder
+    if recorder is not None:
+        for record in records:
+            recorder.add(record)
+
+
+def timed(
+    stage: str, **details: object
+) -> contextlib.AbstractContextManager[MetricsRecord | None]:
+    """Time a stage, if metrics are being recorded.
+
+    The context manager gives the stage's record so that more details can be
+    added to it, or None if metrics are not being recorded. If the stage
+    raises an exception, the type of exception is recorded as its error.
+    """
+    recorder = _recorder
+    if recorder is None:
+        return _disabled
+    return _timed(recorder, stage, details)
+
+
+@contextlib.contextmanager
+def _timed(
+    recorder: MetricsRecorder, stage: str, details: dict[str, object]
+) -> Iterator[MetricsRecord]:
+    """Time a stage, adding its record to a recorder."""
+    record: MetricsRecord = {"stage": stage, **details}
+    start_time = time.perf_counter()
+    try:
+        yield record
+    except BaseException as e:
+        record["error"] = type(e).__name__
+        raise
+    finally:
+        record["seconds"] = time.perf_counter() - start_time
+        recorder.add(record)
+
+
+def count_calls(
+    obj: object, methods: list[str], record: MetricsRecord, key: str
+) -> None:
+    """Count the calls to any of an object's methods in a record.
+
+    The methods are replaced on the object itself, so that nothing is counted
+    for other objects of the same class. Methods the object doesn't have are
+    skipped.
+    """
+    calls = 0
+    record[key] = calls
+
+    def counting(function: Callable[..., T]) -> Callable[..., T]:
+        def counted(*args: object, **kwargs: object) -> T:
+            nonlocal calls
+            calls += 1
+            record[key] = calls
+            return function(*args, **kwargs)
+
+        return counted
+
+    for method in methods:
+        if hasattr(obj, method):
+            setattr(obj, method, counting(getattr(obj, method)))
+
+
+def call_recording(
+    enable: bool, function: Callable[..., T], *args: object
+) -> tuple[T, list[MetricsRecord]]:
+    """Call a function, returning its result and any metrics it recorded.
+
+    Metrics are only recorded if enabled. This lets metrics be collected from
+    worker processes.
+    """
+    if not enable:
+        return (function(*args), [])
+
+    start()
+    try:
+        result = function(*args)
+    finally:
+        records = stop()
+    return (result, records)
+
+
+def write_records(filename: str, records: list[MetricsRecord]) -> None:
+    """Write records to a file, as one JSON object per line."""
+    with open(filename, "w") as f:
+        f.writelines(json.dumps(record) + "\n" for record in records)
+
+
+@contextlib.contextmanager
+def recording_to(filename: str | None) -> Iterator[None]:
+    """Record metrics while in the context, then write them to a file.
+
+    Nothing is recorded if no file is given. The metrics are written even if
+    an exception is raised, as failed runs are often the interesting ones.
+    """
+    if filename is None:
+        yield
+        return
+
+    start()
+    try:
+        yield
+    finally:
+        write_records(filename, stop())
@@ -0,0 +1,145 @@
+# Copyright (c) Alianza, Inc. All rights reserved.
+"""Payloads rendered ahead of time, to be sent later.
+
+A dry run writes the messages that would be sent to each destination as
+payloads, one JSON object per line, without sending anything. Posting the
+payloads later sends exactly those messages, without reading, parsing or
+rendering any changelog.
+"""
+
+import json
+import logging
+import os
+import re
+import sys
+from collections.abc import Iterable, Iterator
+from dataclasses import asdict, dataclass, fields
+from typing import IO, Any
+
+log = logging.getLogger(__name__)
+
+# The output or input that means stdout or stdin.
+STDIO = "-"
+
+# The suffix of payload files written to, or read from, a directory.
+PAYLOAD_SUFFIX = ".ndjson"
+
+# Matches the characters not to use in the names of payload files.
+UNSAFE_FILENAME_RE = re.compile(r"[^A-Za-z0-9._-]+")
+
+
+@dataclass
+class Payload:
+    """The messages to send to a destination, in order."""
+
+    projectname: str
+    version: str
+    target: str
+    webhook: str
+    messages: list[dict[str, Any]]
+
+    @classmethod
+    def from_dict(cls, data: object, source: str) -> "Payload":
+        """Make a payload from an object in JSON.
+
+        Raises TypeError or ValueError if the object isn't a valid payload.
+        """
+        if not isinstance(data, dict):
+            raise TypeError(f"Invalid payload in {source}: {data!r}")
+        names = {f.name for f in fields(cls)}
+        if set(data) != names:
+            raise ValueError(
+                f"Invalid payload in {source}: expected the fields "
+                f"{', '.join(sorted(names))}"
+            )
+        for name in sorted(names - {"messages"}):
+            if not isinstance(data[name], str):
+                raise TypeError(f"Invalid payload in {source}: {name} must be a string")
+        messages = data["messages"]
+        if not isinstance(messages, list) or not all(
+            isinstance(message, dict) for message in messages
+        ):
+            raise TypeError(
+                f"Invalid payload in {source}: messages must be a list of objects"
+            )
+        return cls(**data)
+
+
+def payload_filename(projectname: str, version: str) -> str:
+    """Return the name of the file for the payloads of a version of a project."""
+    return UNSAFE_FILENAME_RE.sub("_", f"{projectname}-{version}") + PAYLOAD_SUFFIX
+
+
+def write_payloads(payloads: Iterable[Payload], output: str) -> None:
+    """Write payloads, one JSON object per line.
+
+    The output is a file, "-" for stdout, or an existing directory, in which
+    the payloads for each version of each project are written to a file of
+    their own (see payload_filename).
+    """
+    if output == STDIO:
+        count = write_lines(payloads, sys.stdout)
+        sys.stdout.flush()
+        log.info("Wrote %d payloads to stdout", count)
+        return
+
+    files: dict[str, list[Payload]] = {}
+    if os.path.isdir(output):
+        for payload in payloads:
+            filename = payload_filename(payload.projectname, payload.version)
+            files.setdefault(os.path.join(output, filename), []).append(payload)
+    else:
+        files[output] = list(payloads)
+
+    for path, file_payloads in files.items():
+        with open(path, "w", encoding="utf-8") as f:
+            count = write_lines(file_payloads, f)
+        log.info("Wrote %d payloads to %s", count, path)
+
+
+def write_lines(payloads: Iterable[Payload], f: IO[str]) -> int:
+    """Write payloads to a file, returning how many were written."""
+    count = 0
+    for payload in payloads:
+        f.write(json.dumps(asdict(payload)))
+        f.write("\n")
+        count += 1
+    return count
+
+
+def read_payloads(path: str) -> list[Payload]:
+    """Read payloads written by write_payloads.
+
+    The path is a file, "-" for stdin, or a directory, in which every file
+    ending in .ndjson is read in order of name.
+    """
+    if path == STDIO:
+        return list(parse_lines(sys.stdin, "stdin"))
+
+    if os.path.isdir(path):
+        paths = [
+            os.path.join(path, filename)
+            for filename in sorted(os.listdir(path))
+            if filename.endswith(PAYLOAD_SUFFIX)
+        ]
+    else:
+        paths = [path]
+
+    payloads: list[Payload] = []
+    for payload_path in paths:
+        with open(payload_path, "r", encoding="utf-8") as f:
+            payloads.extend(parse_lines(f, payload_path))
+    return payloads
+
+
+def parse_lines(lines: Iterable[str], source: str) -> Iterator[Payload]:
+    """Parse the payloads in lines of JSON, skipping blank lines."""
+    for number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        location = f"{source} line {number}"
+        try:
+            data = json.loads(line)
+        except ValueError as e:
+            raise ValueError(f"Invalid payload in {location}: {e}") from e
+        yield Payload.from_dict(data, location)
@@ -0,0 +1,161 @@
+# Copyright (c) Alianza, Inc. All rights reserved.
+"""Merging the sections of a range of versions into one announcement.
+
+The versions in a range are taken in the order they are in the changelog,
+newest first, rather than by comparing version numbers. Their sections are
+merged into one document under a single level 2 heading, grouping the
+content under each subheading (e.g. "Added" or "Fixed") across versions.
+List entries that are the same in more than one version are only included
+once.
+"""
+
+import copy
+from collections.abc import Sequence
+from typing import cast
+
+from mistletoe import block_token, span_token, token
+
+from announcer.common import VersionSection, render_to_plaintext, version_heading
+
+UNRELEASED = "unreleased"
+
+
+def select_versions(
+    versions: Sequence[str], since: str, until: str | None = None
+) -> list[str]:
+    """Return the versions after since, up to and including until.
+
+    The versions are in changelog order, newest first. Without until, the
+    range is up to the newest version that has been released. Raises
+    ValueError if either version isn't in the changelog, or the range is
+    empty.
+    """
+    if since not in versions:
+        raise ValueError(f"Version {since} is not in the changelog")
+    if until is not None and until not in versions:
+        raise ValueError(f"Version {until} is not in the changelog")
+
+    selected = []
+    collecting = False
+    for version in versions:
+        if version == since:
+            break
+        if until is None:
+            collecting = collecting or version.lower() != UNRELEASED
+        elif version == until:
+            collecting = True
+        if collecting:
+            selected.append(version)
+
+    if not selected:
+        raise ValueError(
+            f"No versions after {since}"
+            + (f" up to {until}" if until is not None else "")
+        )
+    return selected
+
+
+def range_label(versions: Sequence[str]) -> str:
+    """Return the label of a range of versions, given newest first."""
+    if len(versions) == 1:
+        return versions[0]
+    return f"{versions[-1]} to {versions[0]}"
+
+
+def entry_key(child: token.Token) -> tuple[str, str]:
+    """Return what is compared to find identical entries."""
+    return (child.__class__.__name__, " ".join(render_to_plaintext(child).split()))
+
+
+class SectionMerger:
+    """Merge the sections of versions, grouping the content of subheadings."""
+
+    def __init__(self) -> None:
+        """Create an empty merger."""
+        # The content of each subheading, keyed on its level and text. Content
+        # before any subheading has no key.
+        self.groups: dict[tuple[int, str] | None, list[token.Token]] = {None: []}
+        self.headings: dict[tuple[int, str], token.Token] = {}
+        # The merged lists in each group, keyed on whether they're ordered.
+        self.lists: dict[tuple[tuple[int, str] | None, bool], block_token.List] = {}
+        self.seen: set[tuple[tuple[int, str] | None, tuple[str, str]]] = set()
+
+    def add(self, section: VersionSection) -> None:
+        """Add the content of a version's section."""
+        group: tuple[int, str] | None = None
+        for child in section.children:
+            if version_heading(child) is not None:
+                group = None
+            elif child.__class__.__name__ in ("Heading", "SetextHeading"):
+                heading = child
+                group = (
+                    getattr(heading, "level", 0),
+                    render_to_plaintext(heading).strip(),
+                )
+                self.headings.setdefault(group, heading)
+                self.groups.setdefault(group, [])
+            elif child.__class__.__name__ == "List":
+                self.add_list(group, cast(block_token.List, child))
+            else:
+                self.add_entry(group, child)
+
+    def add_list(self, group: tuple[int, str] | None, child: block_token.List) -> None:
+        """Add the entries of a list to the group's list of the same kind."""
+        ordered = child.start is not None
+        merged = self.lists.get((group, ordered))
+        if merged is None:
+            merged = copy.copy(child)
+            merged.children = []
+            self.lists[(group, ordered)] = merged
+            self.groups[group].append(merged)
+        entries = list(merged.children or [])
+        for item in child.children or []:
+            key = (group, entry_key(item))
+            if key not in self.seen:
+                self.seen.add(key)
+                entries.append(item)
+        merged.children = entries
+
+    def add_entry(self, group: tuple[int, str] | None, child: token.Token) -> None:
+        """Add a block to a group, unless the group already has it."""
+        key = (group, entry_key(child))
+        if key not in self.seen:
+            self.seen.add(key)
+            self.groups[group].append(child)
+
+    def children(self) -> list[token.Token]:
+        """Return the merged content, with the subheadings."""
+        children = []
+        for group, tokens in self.groups.items():
+            if not tokens:
+                # Leave out subheadings with nothing under them.
+                continue
+            if group is not None:
+                children.append(self.headings[group])
+            children.extend(tokens)
+        return children
+
+
+def merge_sections(
+    sections: Sequence[VersionSection], label: str, diff_url: str | None
+) -> block_token.Document:
+    """Merge the sections of versions into a document for the label.
+
+    The document has a level 2 heading for the label, linking to the diff
+    URL, so that it renders as the section for a version called label.
+    """
+    merger = SectionMerger()
+    for section in sections:
+        merger.add(section)
+
+    heading = f"## [{label}](diff)\n" if diff_url else f"## {label}\n"
+    document = block_token.Document([heading])
+    children = list(document.children or [])
+    if diff_url and children:
+        # Set the URL on the heading's link directly, as it may not be a
+        # valid link destination in Markdown (e.g. if it has spaces).
+        link = next(iter(children[0].children or []), None)
+        if isinstance(link, span_token.Link):
+            link.target = diff_url
+    document.children = [*children, *merger.children()]
+    return document
@@ -0,0 +1,145 @@
+# Copyright (c) Alianza, Inc. All rights reserved.
+"""On-disk cache of rendered changelog versions.
+
+Rendering a version depends only on the lines of the changelog that the
+section pre-scan finds for it, the renderer and the version of announcer, so
+entries are keyed on a hash of those. Retrying an announcement, or making the
+same announcement to more channels later, then reads the rendered version
+from the cache instead of parsing and rendering the changelog again.
+
+The cache is bounded in size. Reading an entry marks it as recently used, and
+the least recently used entries are removed when the cache grows too big.
+"""
+
+import functools
+import hashlib
+import json
+import logging
+import os
+import tempfile
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from . import VersionDetails
+
+log = logging.getLogger(__name__)
+
+# Changed whenever the format of entries changes.
+CACHE_FORMAT = 1
+CACHE_SUFFIX = ".json"
+DEFAULT_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+
+@functools.cache
+def announcer_version() -> str:
+    """Return the installed version of announcer."""
+    from importlib.metadata import PackageNotFoundError, version
+
+    try:
+        return version("announcer")
+    except PackageNotFoundError:
+        return "unknown"
+
+
+def cache_key(lines: list[str], renderer_class: type, version: str) -> str:
+    """Return the key for rendering a version from a changelog's lines."""
+    digest = hashlib.sha256()
+    for part in (
+        str(CACHE_FORMAT),
+        announcer_version(),
+        f"{renderer_class.__module__}.{renderer_class.__qualname__}",
+        version,
+    ):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    for line in lines:
+        digest.update(line.encode("utf-8", "surrogateescape"))
+    return digest.hexdigest()
+
+
+class RenderCache:
+    """A directory of rendered changelog versions, bounded in size."""
+
+    def __init__(
+        self, directory: str, max_bytes: int = DEFAULT_CACHE_MAX_BYTES
+    ) -> None:
+        """Create a cache in a directory, which is made when first written to."""
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+    def path(self, key: str) -> str:
+        """Return the path of the entry for a key."""
+        return os.path.join(self.directory, key + CACHE_SUFFIX)
+
+    def get(self, key: str) -> "VersionDetails | None":
+        """Return the cached details for a key, if there are any."""
+        path = self.path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            details = (data["rendered"], data["diff_url"], data["sections"])
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            log.warning("Ignoring unreadable cache entry %s: %s", path, e)
+            return None
+
+        # Mark the entry as recently used.
+        try:
+            os.utime(path)
+        except OSError as e:
+            log.debug("Failed to mark cache entry %s as used: %s", path, e)
+        log.debug("Using cached render %s", path)
+        return details
+
+    def put(self, key: str, details: "VersionDetails") -> None:
+        """Cache the details for a key, removing old entries to make room.
+
+        Failing to write to the cache is logged, but is not an error.
+        """
+        (rendered, diff_url, sections) = details
+        data = {"rendered": rendered, "diff_url": diff_url, "sections": sections}
+        path = self.path(key)
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            # Write to a temporary file of our own first, so that readers
+            # never see a partial entry, even while other threads or
+            # processes write the same one.
+            (fd, temporary) = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    json.dump(data, f, separators=(",", ":"))
+                os.replace(temporary, path)
+            except BaseException:
+                os.unlink(temporary)
+                raise
+            self.evict()
+        except OSError as e:
+            log.warning("Failed to cache render in %s: %s", self.directory, e)
+
+    def evict(self) -> None:
+        """Remove the least recently used entries until the cache fits."""
+        entries = []
+        total = 0
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if not entry.name.endswith(CACHE_SUFFIX):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+                total += stat.st_size
+
+        entries.sort()
+        for _mtime_ns, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            log.debug("Evicting cache entry %s", path)
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                # Another process got there first.
+                pass
+            total -= size
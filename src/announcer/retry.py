@@ -0,0 +1,165 @@
+# Copyright (c) Alianza, Inc. All rights reserved.
+"""Retrying and rate limiting of webhook requests."""
+
+import logging
+import random
+import threading
+import time
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+from urllib.parse import urlsplit
+
+if TYPE_CHECKING:
+    import requests
+
+log = logging.getLogger(__name__)
+
+# Responses that mean the request may succeed if it is sent again.
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+DEFAULT_RATE_LIMIT = 4.0
+DEFAULT_BURST = 8
+
+
+def parse_retry_after(response: "requests.Response | None") -> float | None:
+    """Return the number of seconds a response asks to wait before retrying."""
+    if response is None:
+        return None
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+
+    import email.utils
+
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        log.debug("Ignoring invalid Retry-After header %r", value)
+        return None
+    return max(0.0, retry_at.timestamp() - time.time())
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """How often, and how long to wait before, retrying a failed request."""
+
+    # The most times to send a request, including the first.
+    max_attempts: int = 5
+    # The delay before the first retry, doubling for each retry after that.
+    base_delay: float = 0.5
+    # The longest delay between two attempts, unless a server asks for more.
+    max_delay: float = 30.0
+    # The most time to spend waiting to retry a request in total.
+    max_total_delay: float = 60.0
+
+    def retry_delay(
+        self, error: "requests.RequestException", attempt: int, waited: float
+    ) -> float | None:
+        """Return how long to wait before retrying a failed request.
+
+        The attempt is the number of attempts made so far, and waited is the
+        total time already spent waiting to retry. None is returned if the
+        request should not be retried.
+        """
+        import requests
+
+        if attempt >= self.max_attempts:
+            return None
+
+        if isinstance(error, requests.HTTPError):
+            if error.response is None or (
+                error.response.status_code not in RETRY_STATUSES
+            ):
+                return None
+        elif not isinstance(error, (requests.ConnectionError, requests.Timeout)):
+            return None
+
+        delay = parse_retry_after(error.response)
+        if delay is None:
+            # Exponential backoff, with jitter so that many clients retrying
+            # at once spread out their requests.
+            backoff = min(self.max_delay, self.base_delay * 2 ** (attempt - 1))
+            delay = backoff / 2 + random.uniform(0, backoff / 2)  # noqa: S311
+
+        if waited + delay > self.max_total_delay:
+            return None
+        return delay
+
+
+NO_RETRY = RetryPolicy(max_attempts=1)
+
+
+class TokenBucket:
+    """Limit the rate of requests, allowing short bursts."""
+
+    def __init__(self, rate: float, burst: int) -> None:
+        """Create a bucket allowing rate requests per second on average."""
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """Wait until a request may be sent."""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(
+                    self.burst, self.tokens + (now - self.updated) * self.rate
+                )
+                self.updated = now
+                if now >= self.paused_until and self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = max(self.paused_until - now, (1 - self.tokens) / self.rate)
+            time.sleep(wait)
+
+    def pause(self, seconds: float) -> None:
+        """Stop any requests being sent for a time."""
+        with self.lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+
+class HostRateLimiter:
+    """Limit the rate of requests to each host."""
+
+    def __init__(
+        self, rate: float = DEFAULT_RATE_LIMIT, burst: int = DEFAULT_BURST
+    ) -> None:
+        """Create a limiter allowing rate requests per second to each host.
+
+        A rate of 0 disables rate limiting.
+        """
+        self.rate = rate
+        self.burst = burst
+        self.buckets: dict[str, TokenBucket] = {}
+        self.lock = threading.Lock()
+
+    def bucket(self, url: str) -> TokenBucket | None:
+        """Return the token bucket for a URL's host."""
+        if self.rate <= 0:
+            return None
+        host = urlsplit(url).netloc
+        with self.lock:
+            if host not in self.buckets:
+                self.buckets[host] = TokenBucket(self.rate, self.burst)
+            return self.buckets[host]
+
+    def acquire(self, url: str) -> None:
+        """Wait until a request may be sent to a URL."""
+        bucket = self.bucket(url)
+        if bucket is not None:
+            bucket.acquire()
+
+    def pause(self, url: str, seconds: float) -> None:
+        """Stop any requests being sent to a URL's host for a time."""
+        bucket = self.bucket(url)
+        if bucket is not None:
+            bucket.pause(seconds)
@@ -0,0 +1,356 @@
+# Copyright (c) Alianza, Inc. All rights reserved.
+"""Line-based pre-scan of changelogs to find the section for a version.
+
+Parsing a whole changelog with mistletoe is expensive for large files, but
+only the section under the requested level 2 heading is ever rendered. The
+scanner here streams the file line by line, splitting it into chunks at level
+2 ATX headings, and keeps only the candidate chunks (plus any link reference
+definitions) for mistletoe to parse.
+
+The scanner is deliberately conservative: it only splits at a line when
+mistletoe would certainly parse it as a top-level heading. Missing a boundary
+just means more text is passed to mistletoe, which then makes the real
+decision about what to render. Setext headings are never boundaries, as they
+are not treated as version headings when rendering.
+"""
+
+import re
+from collections.abc import Callable, Iterable, Iterator
+from dataclasses import dataclass, field
+
+from mistletoe.block_token import Footnote
+
+# A level 2 ATX heading starting in the first column. Indented headings may
+# belong to a list item, so they are never treated as boundaries.
+BOUNDARY_RE = re.compile(r"##(?:\s|$)")
+
+# Anything that could be a level 2 ATX heading.
+POSSIBLE_HEADING_RE = re.compile(r" {0,3}##(?:\s|$)")
+
+# Any ATX heading.
+ATX_HEADING_RE = re.compile(r" {0,3}#{1,6}(?:\s|$)")
+
+# The opening line of a fenced code block, as matched by mistletoe.
+CODE_FENCE_RE = re.compile(r"( {0,3})(`{3,}|~{3,})([^\n]*)")
+
+# The start of a link reference definition, and whether its destination is
+# on the following line.
+LINK_DEFINITION_RE = re.compile(r" {0,3}\[([^\]]+)\]:(\s*$)?")
+
+# Something that might be a link reference definition, anywhere in a line.
+ANY_DEFINITION_RE = re.compile(r"\[([^\]]+)\]:")
+
+
+class AmbiguousChangelogError(Exception):
+    """The scanner cannot reliably split this changelog into sections."""
+
+
+def normalize_label(label: str) -> str:
+    """Normalize a link label the way mistletoe matches them."""
+    return " ".join(label.split()).casefold()
+
+
+def is_complete_definition(line: str) -> bool:
+    """Return whether a line on its own is exactly one link reference definition."""
+    if not line.endswith("\n"):
+        line += "\n"
+    match_info = Footnote.match_reference(line, 0)
+    return match_info is not None and not line[match_info[0] :].strip()
+
+
+class SectionScanner:
+    """Classify changelog lines while tracking the block structure."""
+
+    def __init__(self) -> None:
+        """Create a scanner positioned at the start of a document."""
+        self.fence: str | None = None
+        self.fence_indent = 0
+        self.table = False
+        self.previous = ""
+        self.block_start = True
+        # Whether the current line is part of a run of link reference
+        # definitions, and whether it starts a new run where a definition is
+        # certainly allowed rather than continuing a paragraph.
+        self.definition = False
+        self.run_start = False
+        self.certain = False
+        self.destination = False
+
+    def is_boundary(self, line: str) -> bool:
+        """Consume a line, returning whether it starts a new level 2 section."""
+        previous = self.previous
+        self.previous = line
+        block_start = self.block_start
+        self.block_start = False
+        self.run_start = False
+
+        if self.fence is not None:
+            self.definition = False
+            stripped = line.lstrip(" ")
+            indent = len(line) - len(stripped)
+            if stripped.strip() and indent < self.fence_indent:
+                # An indented fence may belong to a list item, which this less
+                # indented line would close. Without tracking containers,
+                # give up.
+                raise AmbiguousChangelogError(line)
+
+            if (
+                stripped.startswith(self.fence)
+                and len(stripped.split(maxsplit=1)) == 1
+                and indent < 4
+            ):
+                # Only a closing fence of at least the same length ends the
+                # block.
+                self.fence = None
+                self.block_start = True
+            return False
+
+        if not line.strip():
+            self.table = False
+            self.definition = False
+            self.block_start = True
+            return False
+
+        if self.table and "|" in line:
+            # Table rows consume any line with a pipe in, even headings.
+            self.definition = False
+            return False
+        self.table = "|" in line and "|" in previous and "-" in line
+
+        definition_m = LINK_DEFINITION_RE.match(line)
+        if self.definition and (
+            definition_m
+            or self.destination
+            or line.lstrip().startswith(('"', "'", "("))
+        ):
+            # Further definitions, or the destination or title of the
+            # previous one. mistletoe only decides whether these are code or
+            # headings after trying to parse them as definitions.
+            if CODE_FENCE_RE.match(line) or ATX_HEADING_RE.match(line):
+                raise AmbiguousChangelogError(line)
+            self.destination = bool(definition_m and definition_m.group(2) is not None)
+            return False
+        self.definition = False
+
+        if BOUNDARY_RE.match(line):
+            self.block_start = True
+            return True
+
+        fence_m = CODE_FENCE_RE.match(line)
+        if fence_m and not (fence_m.group(2)[0] == "`" and "`" in fence_m.group(3)):
+            self.fence = fence_m.group(2)
+            self.fence_indent = len(fence_m.group(1))
+        elif ATX_HEADING_RE.match(line):
+            self.block_start = True
+        elif definition_m:
+            # Link reference definitions cannot interrupt a paragraph, so
+            # without tracking containers they are only certain at the start
+            # of a block.
+            self.definition = True
+            self.run_start = True
+            self.certain = block_start
+            self.destination = definition_m.group(2) is not None
+
+        return False
+
+
+def definition_labels(line: str) -> list[str]:
+    """Return the normalized labels of anything that looks like a definition."""
+    return [normalize_label(label) for label in ANY_DEFINITION_RE.findall(line)]
+
+
+@dataclass
+class DefinitionRun:
+    """A run of lines that are link reference definitions, if they all parse.
+
+    Positions are line numbers when scanning, or byte offsets in an index.
+    """
+
+    positions: list[tuple[int, int]]
+    labels: list[list[str]]
+    text: list[str] | None = None
+    # Whether every line is a complete definition on its own, once known.
+    complete: bool | None = None
+
+    def is_complete(self) -> bool:
+        """Return whether mistletoe will parse each line the same on its own."""
+        if self.complete is None:
+            self.complete = all(
+                is_complete_definition(line) for line in self.text or []
+            )
+        return self.complete
+
+
+@dataclass
+class Chunk:
+    """The lines from one level 2 heading up to the next.
+
+    The first chunk in a file has no heading. Positions are line numbers when
+    scanning, or byte offsets in an index.
+    """
+
+    start: int
+    end: int
+    heading: str | None
+    # Every line that might be a level 2 heading.
+    headings: list[str] = field(default_factory=list)
+    # Runs of link reference definitions that are certainly not paragraphs.
+    definitions: list[DefinitionRun] = field(default_factory=list)
+    # Labels of anything else that might be a link reference definition.
+    uncertain_labels: set[str] = field(default_factory=set)
+    text: list[str] | None = None
+
+    def is_candidate(self, version: str) -> bool:
+        """Return whether this chunk might be the section for the version."""
+        return any(version in heading for heading in self.headings)
+
+
+def iter_chunks(lines: Iterable[str]) -> Iterator[Chunk]:
+    """Split changelog lines into chunks, holding the text of each.
+
+    Raises AmbiguousChangelogError if the lines cannot be split reliably.
+    """
+    scanner = SectionScanner()
+    chunk_text: list[str] = []
+    chunk = Chunk(start=0, end=0, heading=None, text=chunk_text)
+    run_text: list[str] = []
+    run = DefinitionRun(positions=[], labels=[], text=run_text)
+    run_certain = False
+
+    for number, line in enumerate(lines):
+        boundary = scanner.is_boundary(line)
+        if run.positions and (scanner.run_start or not scanner.definition):
+            if run_certain:
+                chunk.definitions.append(run)
+            else:
+                chunk.uncertain_labels.update(*run.labels)
+            run_text = []
+            run = DefinitionRun(positions=[], labels=[], text=run_text)
+
+        if boundary:
+            chunk.end = number
+            yield chunk
+            chunk_text = []
+            chunk = Chunk(start=number, end=number, heading=line, text=chunk_text)
+
+        chunk_text.append(line)
+        if scanner.definition:
+            if scanner.run_start:
+                run_certain = scanner.certain
+            run.positions.append((number, number + 1))
+            run.labels.append(definition_labels(line))
+            run_text.append(line)
+        elif "]:" in line:
+            # This might be a definition in a paragraph or container.
+            chunk.uncertain_labels.update(definition_labels(line))
+
+        if POSSIBLE_HEADING_RE.match(line):
+            chunk.headings.append(line)
+
+    if run.positions:
+        if run_certain:
+            chunk.definitions.append(run)
+        else:
+            chunk.uncertain_labels.update(*run.labels)
+    chunk.end = chunk.start + len(chunk_text)
+    yield chunk
+
+
+def load_nothing(start: int, end: int) -> list[str]:
+    """Refuse to load text that should already have been held."""
+    raise ValueError(f"No text held for {start}-{end}")
+
+
+def assemble_version_lines(
+    chunks: Iterable[Chunk],
+    version: str,
+    load: Callable[[int, int], list[str]] = load_nothing,
+) -> list[str] | None:
+    """Return the lines mistletoe needs to render the given version.
+
+    The result holds every chunk that is a candidate for the version, and the
+    link reference definitions those chunks might refer to, in their original
+    order. Any text that is not already held in the chunks is read with the
+    load function. None is returned if no chunk is a candidate.
+    """
+    chunks = list(chunks)
+    candidates = [chunk.is_candidate(version) for chunk in chunks]
+    for chunk, candidate in zip(chunks, candidates, strict=True):
+        if candidate and chunk.text is None:
+            chunk.text = load(chunk.start, chunk.end)
+
+    selected_text = normalize_label(
+        "".join(
+            "".join(chunk.text or [])
+            for chunk, candidate in zip(chunks, candidates, strict=True)
+            if candidate
+        )
+    )
+    if not selected_text:
+        return None
+
+    def referenced(labels: Iterable[str]) -> bool:
+        return any(f"[{label}]" in selected_text for label in labels)
+
+    selected: list[str] = []
+    for chunk, candidate in zip(chunks, candidates, strict=True):
+        segments = []
+        if candidate:
+            segments.append(chunk.text or [])
+        elif referenced(chunk.uncertain_labels):
+            # Some lines may or may not be link reference definitions. That
+            # only matters if the selected chunks might refer to them.
+            return None
+        else:
+            for run in chunk.definitions:
+                wanted = [referenced(labels) for labels in run.labels]
+                if not any(wanted):
+                    continue
+
+                # Only keep runs of definitions that mistletoe will certainly
+                # parse the same way on their own, so that unreferenced ones
+                # can be dropped. Anything else could end up being rendered
+                # as a paragraph.
+                if run.complete is None and run.text is None:
+                    run.text = [
+                        "".join(load(start, end)) for start, end in run.positions
+                    ]
+                if not run.is_complete():
+                    return None
+
+                segment = []
+                for index, (start, end) in enumerate(run.positions):
+                    if not wanted[index]:
+                        continue
+                    if run.text is not None:
+                        segment.append(run.text[index])
+                    else:
+                        segment.extend(load(start, end))
+                segments.append(segment)
+
+        for segment in segments:
+            if selected and selected[-1] != "\n":
+                # Link reference definitions cannot interrupt a paragraph.
+                selected.append("\n")
+            selected.extend(segment)
+
+    return selected
+
+
+def extract_version_lines(lines: Iterable[str], version: str) -> list[str] | None:
+    """Return the lines mistletoe needs to render the given version.
+
+    Only the text of candidate chunks and definitions is kept while streaming
+    through the lines. None is returned if no chunk is a candidate, or if the
+    changelog cannot be split reliably.
+    """
+    chunks = []
+    try:
+        for chunk in iter_chunks(lines):
+            if not chunk.is_candidate(version):
+                chunk.text = None
+            chunks.append(chunk)
+    except AmbiguousChangelogError:
+        return None
+
+    return assemble_version_lines(chunks, version)
@@ -0,0 +1,425 @@
+# Copyright (c) Alianza, Inc. All rights reserved.
+"""A long-running announcer service, taking announcements over HTTP.
+
+The service has no authentication: anyone who can connect to it can make it
+read any changelog the service can read, and post it to any webhook. It
+listens on the loopback interface unless told otherwise.
+
+Announcements are posted to the service as JSON, in the same form as the
+entries of a batch manifest, and queued for a fixed number of workers to
+make. Everything that is slow to start (importing mistletoe and requests,
+opening connections to webhook hosts) is done once, and the parsed sections
+of changelogs are kept, so that announcing again from a changelog that
+hasn't changed doesn't parse it again.
+
+mistletoe keeps the types of token to parse in global state, which renderers
+change, so changelogs are parsed and rendered by one worker at a time.
+Messages are sent by all the workers at once.
+"""
+
+import itertools
+import json
+import logging
+import os
+import queue
+import socketserver
+import stat
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import TYPE_CHECKING, Any
+
+from . import (
+    BatchEntry,
+    Changelog,
+    DeliveryOptions,
+    TargetTypes,
+    batch_entry_from_dict,
+    build_messages,
+    deliver_messages,
+    render_version_details,
+    renderer_class,
+)
+from .delivery import get_session
+from .forges import repository_path
+from .retry import HostRateLimiter
+
+if TYPE_CHECKING:
+    from mistletoe.block_token import Document
+
+    from .rendercache import RenderCache
+
+log = logging.getLogger(__name__)
+
+DEFAULT_WORKERS = 2
+DEFAULT_QUEUE_SIZE = 100
+DEFAULT_DOCUMENT_CACHE_SIZE = 64
+
+# The number of finished announcements to remember the status of.
+MAX_FINISHED = 1000
+
+# The most bytes of JSON to accept in a request.
+MAX_REQUEST_BYTES = 1024 * 1024
+
+# The statuses of an announcement.
+QUEUED = "queued"
+RUNNING = "running"
+DELIVERED = "delivered"
+FAILED = "failed"
+
+
+class DocumentCache:
+    """The parsed sections of changelog versions, least recently used first.
+
+    Entries are keyed on the path of the changelog and the version, and are
+    only used while the changelog's modification time and size are the same
+    as when it was parsed.
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_DOCUMENT_CACHE_SIZE) -> None:
+        """Create a cache of at most max_entries parsed documents."""
+        self.max_entries = max_entries
+        self.entries: OrderedDict[
+            tuple[str, str], tuple[int, int, Document, list[str] | None]
+        ] = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get_document(self, changelogfile: str, version: str) -> "Document":
+        """Return the parsed section for a version, parsing it if needed.
+
+        The document is parsed as by Changelog.get_document, and must be
+        parsed while no other thread is parsing or rendering.
+        """
+        return self.get_parsed(changelogfile, version)[0]
+
+    def get_parsed(
+        self, changelogfile: str, version: str
+    ) -> tuple["Document", list[str] | None]:
+        """Return the parsed section for a version, and the lines it came from.
+
+        The lines are those found by Changelog.get_lines, which renders are
+        cached on, or None if the whole changelog had to be parsed.
+        """
+        key = (os.path.abspath(changelogfile), version)
+        stat = os.stat(changelogfile)
+        with self.lock:
+            cached = self.entries.get(key)
+            if cached is not None and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+                self.entries.move_to_end(key)
+                log.debug("Using parsed %s %s", changelogfile, version)
+                return (cached[2], cached[3])
+
+        changelog = Changelog(changelogfile, renderer_class(TargetTypes.SLACK))
+        lines = changelog.get_lines(version)
+        document = changelog.parse_lines(version, lines)
+        if document is None:
+            lines = None
+            document = changelog.parse_file(version)
+        with self.lock:
+            self.entries[key] = (stat.st_mtime_ns, stat.st_size, document, lines)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return (document, lines)
+
+
+@dataclass
+class Announcement:
+    """An announcement made by the service, and how it went."""
+
+    id: int
+    entry: BatchEntry
+    status: str = QUEUED
+    errors: list[str] = field(default_factory=list)
+    done: threading.Event = field(default_factory=threading.Event)
+
+    def to_json(self) -> dict[str, Any]:
+        """Return the state of the announcement, to send to clients."""
+        return {
+            "id": self.id,
+            "projectname": self.entry.projectname,
+            "changelogversion": self.entry.changelogversion,
+            "status": self.status,
+            "errors": self.errors,
+        }
+
+
+class AnnouncementService:
+    """A queue of announcements, made by a pool of worker threads."""
+
+    def __init__(
+        self,
+        options: DeliveryOptions | None = None,
+        workers: int = DEFAULT_WORKERS,
+        queue_size: int = DEFAULT_QUEUE_SIZE,
+        documents: DocumentCache | None = None,
+        cache: "RenderCache | None" = None,
+    ) -> None:
+        """Create a service; start must be called before it makes announcements.
+
+        Announcements are rejected with queue.Full once queue_size of them are
+        waiting for a worker.
+        """
+        self.options = options or DeliveryOptions()
+        self.workers = workers
+        self.documents = documents or DocumentCache()
+        self.cache = cache
+        self.queue: queue.Queue[Announcement | None] = queue.Queue(queue_size)
+        # Requests to each webhook host are limited across all announcements.
+        self.rate_limiter = HostRateLimiter(self.options.rate_limit)
+        self.render_lock = threading.Lock()
+        self.announcements: dict[int, Announcement] = {}
+        self.ids = itertools.count(1)
+        self.lock = threading.Lock()
+        self.threads: list[threading.Thread] = []
+
+    def start(self) -> None:
+        """Warm up, and start the workers."""
+        # Import the renderers and requests, and create the HTTP session,
+        # before the first announcement needs them.
+        for target in TargetTypes:
+            renderer_class(target)
+        get_session()
+
+        for number in range(self.workers):
+            thread = threading.Thread(
+                target=self.work, name=f"announcer-worker-{number}", daemon=True
+            )
+            thread.start()
+            self.threads.append(thread)
+
+    def stop(self) -> None:
+        """Stop the workers once they have made the queued announcements."""
+        for _thread in self.threads:
+            self.queue.put(None)
+        for thread in self.threads:
+            thread.join()
+        self.threads = []
+
+    def submit(self, entry: BatchEntry) -> Announcement:
+        """Queue an announcement, raising queue.Full if the queue is full."""
+        with self.lock:
+            announcement = Announcement(next(self.ids), entry)
+            self.queue.put_nowait(announcement)
+            self.announcements[announcement.id] = announcement
+            self.forget_finished()
+        log.info(
+            "Queued announcement %d of %s %s",
+            announcement.id,
+            entry.projectname,
+            entry.changelogversion,
+        )
+        return announcement
+
+    def forget_finished(self) -> None:
+        """Forget the oldest finished announcements, beyond MAX_FINISHED.
+
+        Must be called with the lock held.
+        """
+        finished = [
+            announcement_id
+            for (announcement_id, announcement) in self.announcements.items()
+            if announcement.done.is_set()
+        ]
+        for announcement_id in finished[: max(len(finished) - MAX_FINISHED, 0)]:
+            del self.announcements[announcement_id]
+
+    def get(self, announcement_id: int) -> Announcement | None:
+        """Return an announcement that has been submitted."""
+        with self.lock:
+            return self.announcements.get(announcement_id)
+
+    def work(self) -> None:
+        """Make queued announcements until told to stop."""
+        while True:
+            announcement = self.queue.get()
+            if announcement is None:
+                return
+            announcement.status = RUNNING
+            try:
+                self.announce(announcement.entry)
+            except Exception as e:
+                log.exception("Announcement %d failed", announcement.id)
+                announcement.errors = [str(e)]
+                announcement.status = FAILED
+            else:
+                announcement.status = DELIVERED
+            finally:
+                announcement.done.set()
+
+    def announce(self, entry: BatchEntry) -> None:
+        """Make an announcement, raising an exception if it fails."""
+        with self.render_lock:
+            (document, lines) = self.documents.get_parsed(
+                entry.changelogfile, entry.changelogversion
+            )
+            details = render_version_details(
+                entry.changelogfile,
+                entry.changelogversion,
+                {d.target for d in entry.destinations},
+                self.cache,
+                document,
+                lines,
+            )
+        messages = build_messages(
+            entry.destinations,
+            entry.changelogversion,
+            entry.projectname,
+            details,
+            repository_path(entry.changelogfile),
+        )
+        deliver_messages(
+            messages,
+            [
+                f"{entry.projectname} {entry.changelogversion} "
+                f"destination {n} ({d.target})"
+                for n, d in enumerate(entry.destinations, 1)
+            ],
+            self.options,
+            self.rate_limiter,
+        )
+
+
+class ServiceRequestHandler(BaseHTTPRequestHandler):
+    """Handle requests to the announcer service.
+
+    POST /announcements queues an announcement, GET /announcements/ID returns
+    its status, and GET /health returns 200 while the service is running.
+    """
+
+    server: "ServiceServer"
+
+    def do_GET(self) -> None:
+        """Return the status of the service or of an announcement."""
+        path = self.path.split("?", 1)[0]
+        if path == "/health":
+            self.send_json(HTTPStatus.OK, {"status": "ok"})
+            return
+
+        prefix = "/announcements/"
+        if path.startswith(prefix) and path[len(prefix) :].isdigit():
+            announcement = self.server.service.get(int(path[len(prefix) :]))
+            if announcement is not None:
+                self.send_json(HTTPStatus.OK, announcement.to_json())
+                return
+        self.send_json(HTTPStatus.NOT_FOUND, {"error": "Not found"})
+
+    def do_POST(self) -> None:
+        """Queue an announcement."""
+        if self.path.split("?", 1)[0] != "/announcements":
+            self.send_json(HTTPStatus.NOT_FOUND, {"error": "Not found"})
+            return
+
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            length = -1
+        if length < 0:
+            self.send_json(HTTPStatus.BAD_REQUEST, {"error": "Invalid Content-Length"})
+            return
+        if length > MAX_REQUEST_BYTES:
+            self.send_json(
+                HTTPStatus.REQUEST_ENTITY_TOO_LARGE, {"error": "Request too large"}
+            )
+            return
+        try:
+            # Changelog paths are relative to the service's directory.
+            entry = batch_entry_from_dict(
+                json.loads(self.rfile.read(length)), "", "request"
+            )
+        except (ValueError, TypeError, KeyError) as e:
+            self.send_json(HTTPStatus.BAD_REQUEST, {"error": f"Invalid request: {e}"})
+            return
+
+        try:
+            announcement = self.server.service.submit(entry)
+        except queue.Full:
+            self.send_json(
+                HTTPStatus.SERVICE_UNAVAILABLE, {"error": "Too many announcements"}
+            )
+            return
+        self.send_json(HTTPStatus.ACCEPTED, announcement.to_json())
+
+    def send_json(self, status: HTTPStatus, data: dict[str, Any]) -> None:
+        """Send a JSON response."""
+        body = json.dumps(data).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def address_string(self) -> str:
+        """Return the client's address, which is empty for Unix sockets."""
+        return str(self.client_address[0]) if self.client_address else "local"
+
+    def log_message(self, format: str, *args: object) -> None:
+        """Log requests at debug level, rather than to stderr."""
+        log.debug("%s %s", self.address_string(), format % args)
+
+
+class ServiceServer(ThreadingHTTPServer):
+    """An HTTP server for the announcer service."""
+
+    daemon_threads = True
+
+    def __init__(self, address: tuple[str, int], service: AnnouncementService) -> None:
+        """Create a server listening on a host and port."""
+        super().__init__(address, ServiceRequestHandler)
+        self.service = service
+
+
+class UnixServiceServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """An HTTP server for the announcer service on a Unix socket."""
+
+    daemon_threads = True
+
+    def __init__(self, path: str, service: AnnouncementService) -> None:
+        """Create a server listening on a Unix socket."""
+        super().__init__(path, ServiceRequestHandler)
+        self.service = service
+
+
+def is_socket(path: str) -> bool:
+    """Return whether a path is a Unix socket."""
+    try:
+        return stat.S_ISSOCK(os.lstat(path).st_mode)
+    except FileNotFoundError:
+        return False
+
+
+def serve(
+    service: AnnouncementService,
+    host: str = "127.0.0.1",
+    port: int = 0,
+    socket_path: str | None = None,
+) -> None:
+    """Run the service until interrupted, then make any queued announcements.
+
+    A socket left at socket_path by an earlier run is replaced, but any other
+    file there is left alone, and FileExistsError is raised.
+    """
+    server: ServiceServer | UnixServiceServer
+    if socket_path is not None:
+        if is_socket(socket_path):
+            os.remove(socket_path)
+        elif os.path.lexists(socket_path):
+            raise FileExistsError(f"{socket_path} exists and is not a socket")
+        server = UnixServiceServer(socket_path, service)
+        log.info("Serving announcements on %s", socket_path)
+    else:
+        server = ServiceServer((host, port), service)
+        log.info("Serving announcements on %s:%d", host, server.server_address[1])
+
+    service.start()
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        log.info("Stopping")
+    finally:
+        server.server_close()
+        service.stop()
+        if socket_path is not None and is_socket(socket_path):
+            os.remove(socket_path)
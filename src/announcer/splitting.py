@@ -0,0 +1,396 @@
+# Copyright (c) Alianza, Inc. All rights reserved.
+"""Splitting of rendered changelogs into messages that fit a size limit.
+
+Text is split between the top-level blocks that were rendered (headings,
+paragraphs, lists and code blocks) wherever possible. Blocks that are too big
+on their own are split between list entries, then between lines, and lines
+that are too big are split as a last resort. A code block that has to be
+split is closed at the end of one chunk and reopened at the start of the next,
+so that no chunk ends in the middle of one.
+
+Teams cards are packed with whole sections, measured by the size of their
+encoded JSON. Sections and Adaptive Card elements that are too big for a card
+on their own are split the same way: HTML lists and quotes between their items,
+TextBlocks between list entries, then lines, and containers between their
+items. Slack Block Kit messages are packed the same way, splitting rich text
+blocks between their list entries.
+"""
+
+import json
+import re
+from collections.abc import Iterable, Iterator
+from typing import Any
+
+# The most bytes of text to put in each Slack message. Slack truncates
+# messages that are much longer than this.
+SLACK_MAX_TEXT_BYTES = 4000
+
+# The most blocks Slack allows in a message, and the most text in each.
+SLACK_MAX_BLOCKS = 50
+SLACK_MAX_BLOCK_TEXT = 3000
+
+# The most bytes of JSON to send in each Slack Block Kit message. Fifty blocks
+# of rich text can be far bigger than Slack accepts in one message.
+SLACK_MAX_MESSAGE_BYTES = 16000
+
+# The most bytes of JSON to send in each Teams card. Teams rejects cards of
+# more than about 28KB.
+TEAMS_MAX_CARD_BYTES = 27000
+
+FENCE = "```"
+FENCE_LINE = f"{FENCE}\n"
+FENCE_LINE_BYTES = len(FENCE_LINE)
+
+# Chunks must have room for more than reopening and closing a code block.
+MIN_MAX_BYTES = 4 * FENCE_LINE_BYTES
+
+# The start of an entry in a list rendered for Slack.
+LIST_ENTRY_RE = re.compile("^ *(\u2022|\u2023|[0-9]+[.]) ")
+
+# An HTML list or quote rendered for Teams, with its items on their own lines.
+HTML_CONTAINER_RE = re.compile(
+    r"\A<(ul|ol|blockquote)\b([^>]*)>\n(.*)\n</\1>\Z", re.DOTALL
+)
+
+# The tags of the HTML blocks rendered for Teams, which can span lines.
+HTML_BLOCK_TAG_RE = re.compile(r"<(/?)(ul|ol|li|blockquote|p|pre|h[1-6])\b[^>]*>")
+
+# The number of the first item in an ordered HTML list.
+HTML_START_RE = re.compile(r'\bstart="([0-9]+)"')
+
+
+def utf8_len(text: str) -> int:
+    """Return the number of bytes in the UTF-8 encoding of some text."""
+    return len(text.encode("utf-8"))
+
+
+def split_blocks(blocks: Iterable[str], max_bytes: int) -> list[str]:
+    """Pack rendered blocks into as few chunks as fit within max_bytes each."""
+    if max_bytes < MIN_MAX_BYTES:
+        raise ValueError(f"max_bytes must be at least {MIN_MAX_BYTES}: {max_bytes}")
+
+    chunks = []
+    current: list[str] = []
+    size = 0
+    for block in blocks:
+        for piece in block_pieces(block, max_bytes):
+            piece_size = utf8_len(piece)
+            if current and size + piece_size > max_bytes:
+                chunks.append("".join(current))
+                current = []
+                size = 0
+            current.append(piece)
+            size += piece_size
+    if current:
+        chunks.append("".join(current))
+    return chunks
+
+
+def block_pieces(block: str, max_bytes: int) -> Iterator[str]:
+    """Yield pieces of a block that are each within max_bytes."""
+    if utf8_len(block) <= max_bytes:
+        yield block
+        return
+
+    for entry in block_entries(block):
+        if utf8_len(entry) <= max_bytes:
+            yield entry
+        else:
+            yield from split_lines(entry, max_bytes)
+
+
+def block_entries(block: str) -> Iterator[str]:
+    """Yield the list entries in a block, or its lines if it isn't a list.
+
+    A list entry includes any lines that follow it up to the next entry, and
+    a code block is always kept within one entry.
+    """
+    entry: list[str] = []
+    in_fence = False
+    for line in block.splitlines(keepends=True):
+        if (
+            entry
+            and not in_fence
+            and (LIST_ENTRY_RE.match(line) or not LIST_ENTRY_RE.match(entry[0]))
+        ):
+            yield "".join(entry)
+            entry = []
+        entry.append(line)
+        if line.count(FENCE) % 2:
+            in_fence = not in_fence
+    if entry:
+        yield "".join(entry)
+
+
+def split_lines(text: str, max_bytes: int) -> Iterator[str]:
+    """Split text between lines into pieces within max_bytes.
+
+    Code blocks are closed and reopened where they are split, and room is
+    always left to do so.
+    """
+    piece: list[str] = []
+    size = 0
+    in_fence = False
+    for line in text.splitlines(keepends=True):
+        for part in split_line(line, max_bytes - 2 * FENCE_LINE_BYTES):
+            part_size = utf8_len(part)
+            if piece and size + part_size + FENCE_LINE_BYTES > max_bytes:
+                if in_fence:
+                    # Close the code block here, and reopen it in the next piece.
+                    piece.append(FENCE_LINE)
+                    yield "".join(piece)
+                    (piece, size) = ([FENCE_LINE], FENCE_LINE_BYTES)
+                else:
+                    yield "".join(piece)
+                    (piece, size) = ([], 0)
+            piece.append(part)
+            size += part_size
+            if part.count(FENCE) % 2:
+                in_fence = not in_fence
+    if piece:
+        yield "".join(piece)
+
+
+def split_line(line: str, max_bytes: int) -> Iterator[str]:
+    """Split a line into parts within max_bytes, without splitting characters."""
+    data = line.encode("utf-8")
+    while len(data) > max_bytes:
+        end = max_bytes
+        # Don't split a multi-byte character; continuation bytes are 10xxxxxx.
+        while data[end] & 0xC0 == 0x80:
+            end -= 1
+        yield data[:end].decode("utf-8")
+        data = data[end:]
+    yield data.decode("utf-8")
+
+
+def pack_sizes(sizes: list[int], max_size: int) -> list[range]:
+    """Greedily group consecutive items into as few groups as fit in max_size.
+
+    Returns the range of indices of the items in each group. An item that is
+    bigger than max_size on its own is put in a group by itself.
+    """
+    groups = []
+    start = 0
+    total = 0
+    for index, size in enumerate(sizes):
+        if index > start and total + size > max_size:
+            groups.append(range(start, index))
+            (start, total) = (index, 0)
+        total += size
+    if start < len(sizes):
+        groups.append(range(start, len(sizes)))
+    return groups
+
+
+def json_size(value: object) -> int:
+    """Return the size of a value's JSON, as measured to pack cards.
+
+    This is at least the size of the JSON that is sent, however it is encoded.
+    """
+    return len(json.dumps(value))
+
+
+def json_text_size(text: str) -> int:
+    """Return the size of the JSON string of some text, without its quotes."""
+    return json_size(text) - len('""')
+
+
+def split_html(html: str, first_max: int, max_bytes: int) -> list[str]:
+    """Split an HTML section rendered for Teams into sections that fit a limit.
+
+    Sizes are those of the sections' JSON strings. Lists are split between
+    their items, and quotes between their blocks, with each piece wrapped in
+    the same tag; ordered lists continue their numbering. The first piece is
+    within first_max bytes, so that it can fill what is left of a card, and
+    left out if nothing fits. Other sections can't be split, and are returned
+    whole.
+    """
+    match = HTML_CONTAINER_RE.match(html)
+    if match is None or json_text_size(html) <= first_max:
+        return [html]
+
+    (tag, attributes, inner) = match.groups()
+    closing = f"\n</{tag}>"
+    overhead = json_text_size(f"<{tag}{attributes}>\n{closing}")
+    budget = max_bytes - overhead
+    children = [
+        piece
+        for child in html_children(inner)
+        for piece in split_html(child, budget, budget)
+    ]
+
+    groups: list[list[str]] = [[]]
+    (size, limit) = (overhead, first_max)
+    for child in children:
+        child_size = json_text_size(child) + json_text_size("\n")
+        if size + child_size > limit and (groups[-1] or len(groups) == 1):
+            groups.append([])
+            (size, limit) = (overhead, max_bytes)
+        groups[-1].append(child)
+        size += child_size
+
+    start_match = HTML_START_RE.search(attributes)
+    start = int(start_match.group(1)) if start_match else 1
+    pieces = []
+    for group in groups:
+        if group:
+            if tag == "ol":
+                attributes = f' start="{start}"' if start != 1 else ""
+            pieces.append(f"<{tag}{attributes}>\n" + "\n".join(group) + closing)
+        start += len(group)
+    return pieces
+
+
+def html_children(html: str) -> list[str]:
+    """Return the blocks on the lines of some HTML, such as the items of a list.
+
+    A block that spans lines, such as a list item holding a nested list, is
+    kept whole.
+    """
+    children = []
+    lines: list[str] = []
+    depth = 0
+    for line in html.split("\n"):
+        lines.append(line)
+        for tag in HTML_BLOCK_TAG_RE.finditer(line):
+            depth += -1 if tag.group(1) else 1
+        if depth <= 0:
+            children.append("\n".join(lines))
+            (lines, depth) = ([], 0)
+    if lines:
+        children.append("\n".join(lines))
+    return children
+
+
+def split_element(
+    element: dict[str, Any], first_max: int, max_bytes: int
+) -> list[dict[str, Any]]:
+    """Split an Adaptive Card element into elements whose JSON fits a limit.
+
+    The first element is within first_max bytes, so that it can fill what is
+    left of a card, and the rest within max_bytes. Elements other than
+    TextBlocks and containers can't be split, and are returned whole.
+    """
+    if element.get("type") == "TextBlock":
+        overhead = json_size({**element, "text": ""})
+        return [
+            {**element, "text": text}
+            for text in pack_json_text(
+                element["text"], first_max - overhead, max_bytes - overhead
+            )
+        ]
+
+    if element.get("type") == "Container":
+        overhead = json_size({**element, "items": []})
+        budget = max_bytes - overhead
+        items = [
+            piece
+            for item in element.get("items", [])
+            for piece in split_element(item, budget, budget)
+        ]
+        sizes = [json_size(item) + len(", ") for item in items]
+        return [
+            {**element, "items": [items[index] for index in group]}
+            for group in pack_sizes(sizes, budget)
+        ]
+
+    return [element]
+
+
+def split_rich_text(
+    block: dict[str, Any], first_max: int, max_bytes: int
+) -> list[dict[str, Any]]:
+    """Split a Block Kit rich text block into blocks whose JSON fits a limit.
+
+    Blocks are split between their elements, and lists between their entries,
+    with ordered lists continuing their numbering. The first block is within
+    first_max bytes, so that it can fill what is left of a message, and left
+    out if nothing fits. Other blocks can't be split, and are returned whole.
+    """
+    if block.get("type") != "rich_text" or json_size(block) <= first_max:
+        return [block]
+
+    overhead = json_size({**block, "elements": []})
+    separator = len(", ")
+    pieces: list[list[dict[str, Any]]] = [[]]
+    (size, limit) = (overhead, first_max)
+    for element in block["elements"]:
+        is_list = element.get("type") == "rich_text_list"
+        current: dict[str, Any] | None = None
+        for index, entry in enumerate(element["elements"] if is_list else [element]):
+            entry_size = json_size(entry) + separator
+            if is_list and current is None:
+                entry_size += json_size(continued_list(element, index)) + separator
+            if size + entry_size > limit and (pieces[-1] or len(pieces) == 1):
+                pieces.append([])
+                (size, limit) = (overhead, max_bytes)
+                if current is not None:
+                    # The list continues in a list of its own.
+                    current = None
+                    entry_size += json_size(continued_list(element, index)) + separator
+            if is_list:
+                if current is None:
+                    current = continued_list(element, index)
+                    pieces[-1].append(current)
+                current["elements"].append(entry)
+            else:
+                pieces[-1].append(entry)
+            size += entry_size
+
+    return [{**block, "elements": elements} for elements in pieces if elements]
+
+
+def continued_list(element: dict[str, Any], index: int) -> dict[str, Any]:
+    """Return an empty rich text list that continues a list from an entry."""
+    current = {key: value for (key, value) in element.items() if key != "offset"}
+    current["elements"] = []
+    # The offset is the number of the list's first entry, less one.
+    offset = element.get("offset", 0) + index
+    if element.get("style") == "ordered" and offset:
+        current["offset"] = offset
+    return current
+
+
+def pack_json_text(text: str, first_max: int, max_bytes: int) -> list[str]:
+    """Split text into pieces whose JSON strings fit, without their quotes.
+
+    Text is split between list entries, then lines, then characters. The
+    first piece is within first_max bytes, and left out if nothing fits.
+    """
+    chunks: list[str] = []
+    current: list[str] = []
+    (size, limit) = (0, first_max)
+    for piece in json_text_pieces(text, max_bytes):
+        piece_size = json_text_size(piece)
+        if size + piece_size > limit:
+            chunks.append("".join(current).removesuffix("\n"))
+            (current, size, limit) = ([], 0, max_bytes)
+        current.append(piece)
+        size += piece_size
+    chunks.append("".join(current).removesuffix("\n"))
+    return [chunk for chunk in chunks if chunk]
+
+
+def json_text_pieces(text: str, max_bytes: int) -> Iterator[str]:
+    """Yield pieces of text whose JSON strings are each within max_bytes."""
+    for entry in block_entries(text):
+        if json_text_size(entry) <= max_bytes:
+            yield entry
+            continue
+        for line in entry.splitlines(keepends=True):
+            if json_text_size(line) <= max_bytes:
+                yield line
+                continue
+            # Split the line between characters, as a last resort.
+            part: list[str] = []
+            size = 0
+            for character in line:
+                character_size = json_text_size(character)
+                if part and size + character_size > max_bytes:
+                    yield "".join(part)
+                    (part, size) = ([], 0)
+                part.append(character)
+                size += character_size
+            if part:
+                yield "".join(part)
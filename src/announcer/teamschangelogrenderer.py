@@ -1,17 +1,24 @@
 # Copyright (C) Metaswitch Networks.
 """TeamsChangeLogRenderer for mistletoe."""
 
+import html
 import logging
+from collections.abc import Iterable
 
-from mistletoe import block_token, token
+from mistletoe import block_token, span_token, token
 from mistletoe.html_renderer import HtmlRenderer
 
-from announcer.common import render_block_document
+from announcer.common import (
+    BufferedRenderer,
+    PlainTextExtractor,
+    TracingRenderer,
+    render_block_document,
+)
 
 log = logging.getLogger(__name__)
 
 
-class TeamsChangeLogRenderer(HtmlRenderer):
+class TeamsChangeLogRenderer(BufferedRenderer, HtmlRenderer):
     """Renderer for changelogs in the format used by Microsoft Teams."""
 
     def __init__(self, version: str, *extras: object) -> None:
@@ -20,21 +27,126 @@ class TeamsChangeLogRenderer(HtmlRenderer):
         self.version = version
         self.diff_url: str | None = None
         self.sections: list[dict[str, str]] = []
+        self.plaintext = PlainTextExtractor()
+        self.write_map = {
+            "Strong": self.write_strong,
+            "Emphasis": self.write_emphasis,
+            "Strikethrough": self.write_strikethrough,
+            "EscapeSequence": self.write_inner,
+            "Link": self.write_link,
+            "Heading": self.write_heading,
+            "Paragraph": self.write_paragraph,
+            "Quote": self.write_quote,
+            "List": self.write_list,
+            "ListItem": self.write_list_item,
+        }
 
     def __exit__(self, *args: object) -> None:
         """Override the __exit__ method to reset the diff_url."""
         super().__exit__(*args)
         self.diff_url = None
+        self.plaintext = PlainTextExtractor()
 
     def render_document(self, token: block_token.Document) -> str:
         """Override the render_document method to only render the section for the given version."""
-        rendered = render_block_document(self.version, token, self.render)
+        # Only remember the text of tokens for the length of one render.
+        self.plaintext = PlainTextExtractor()
+        rendered = render_block_document(
+            self.version, token, self.render_buffered, self.plaintext
+        )
         self.sections = [{"text": section} for section in rendered.rendered]
         self.diff_url = rendered.diff_url
         return "".join(rendered.rendered)
 
-    def render(self, token: token.Token) -> str:
-        """Override the render method to add debug logging."""
-        ret = self.render_map[token.__class__.__name__](token)
-        log.debug("Rendering %r returns %r", token, ret)
-        return ret
+    # The writers below match HtmlRenderer's render methods.
+
+    def write_tagged(self, tag: str, token: token.Token, out: list[str]) -> None:
+        """Write a token's children wrapped in an HTML tag."""
+        out.append(f"<{tag}>")
+        self.write_inner(token, out)
+        out.append(f"</{tag}>")
+
+    def write_strong(self, token: span_token.Strong, out: list[str]) -> None:
+        """Write strong text."""
+        self.write_tagged("strong", token, out)
+
+    def write_emphasis(self, token: span_token.Emphasis, out: list[str]) -> None:
+        """Write emphasised text."""
+        self.write_tagged("em", token, out)
+
+    def write_strikethrough(
+        self, token: span_token.Strikethrough, out: list[str]
+    ) -> None:
+        """Write struck through text."""
+        self.write_tagged("del", token, out)
+
+    def write_heading(self, token: block_token.Heading, out: list[str]) -> None:
+        """Write a heading."""
+        self.write_tagged(f"h{token.level}", token, out)
+
+    def write_link(self, token: span_token.Link, out: list[str]) -> None:
+        """Write a link."""
+        target = self.escape_url(token.target)
+        title = f' title="{html.escape(token.title)}"' if token.title else ""
+        out.append(f'<a href="{target}"{title}>')
+        self.write_inner(token, out)
+        out.append("</a>")
+
+    def write_paragraph(self, token: block_token.Paragraph, out: list[str]) -> None:
+        """Write a paragraph, without <p> tags in a tight list."""
+        if self._suppress_ptag_stack[-1]:
+            self.write_inner(token, out)
+        else:
+            self.write_tagged("p", token, out)
+
+    def write_lines(self, tokens: Iterable[token.Token], out: list[str]) -> None:
+        """Write tokens on separate lines."""
+        for index, child in enumerate(tokens):
+            if index:
+                out.append("\n")
+            self.write(child, out)
+
+    def write_quote(self, token: block_token.Quote, out: list[str]) -> None:
+        """Write a quote."""
+        out.append("<blockquote>")
+        self._suppress_ptag_stack.append(False)
+        for child in token.children or []:
+            out.append("\n")
+            self.write(child, out)
+        self._suppress_ptag_stack.pop()
+        out.append("\n</blockquote>")
+
+    def write_list(self, token: block_token.List, out: list[str]) -> None:
+        """Write a list."""
+        if token.start is not None:
+            tag = "ol"
+            attr = f' start="{token.start}"' if token.start != 1 else ""
+        else:
+            tag = "ul"
+            attr = ""
+        out.append(f"<{tag}{attr}>\n")
+        self._suppress_ptag_stack.append(not token.loose)
+        self.write_lines(token.children or [], out)
+        self._suppress_ptag_stack.pop()
+        out.append(f"\n</{tag}>")
+
+    def write_list_item(self, token: block_token.ListItem, out: list[str]) -> None:
+        """Write a list item."""
+        children = list(token.children or [])
+        if not children:
+            out.append("<li></li>")
+            return
+
+        # Paragraphs in tight lists aren't put on their own lines.
+        tight = self._suppress_ptag_stack[-1]
+        out.append("<li>")
+        if not (tight and children[0].__class__.__name__ == "Paragraph"):
+            out.append("\n")
+        self.write_lines(children, out)
+        if not (tight and children[-1].__class__.__name__ == "Paragraph"):
+            out.append("\n")
+        out.append("</li>")
+
+
+class TracingTeamsChangeLogRenderer(TracingRenderer, TeamsChangeLogRenderer):
+    """A TeamsChangeLogRenderer that logs every token it renders."""
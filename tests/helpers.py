@@ -0,0 +1,27 @@
+# Copyright (c) Alianza, Inc. All rights reserved.
+"""Helpers shared by the tests."""
+
+import os
+import shutil
+from pathlib import Path
+
+from announcer.forges import repository_path
+
+TEST_DIR = os.path.dirname(__file__)
+
+
+def changelog_url(reference: str, filename: str) -> str:
+    """Return the URL of a test changelog in the repository at a reference."""
+    path = repository_path(os.path.join(TEST_DIR, filename))
+    return f"https://github.com/Metaswitch/announcer/blob/{reference}/{path}"
+
+
+def copy_changelog(tmp_path: Path, name: str = "testannounce1.md") -> str:
+    """Copy a test changelog, so that it can be changed.
+
+    The copy is CHANGELOG.md in tmp_path, so that an index or cache can be
+    written beside it.
+    """
+    changelog = tmp_path / "CHANGELOG.md"
+    shutil.copy(os.path.join(TEST_DIR, name), changelog)
+    return str(changelog)
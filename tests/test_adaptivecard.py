@@ -0,0 +1,182 @@
+# Copyright (c) Alianza, Inc. All rights reserved.
+"""Tests for announcing to Teams workflows with Adaptive Cards."""
+
+import json
+import os
+from pathlib import Path
+
+from helpers import changelog_url
+from pytest_httpserver import HTTPServer
+
+import announcer
+
+TEST_DIR = os.path.dirname(__file__)
+
+
+def test_announce_workflows(httpserver: HTTPServer) -> None:
+    """Test announcing a version to a Teams workflow."""
+    httpserver.expect_request("/workflow").respond_with_data("ok")
+    destination = announcer.Destination(
+        announcer.TargetTypes.WORKFLOWS, httpserver.url_for("/workflow")
+    )
+
+    announcer.announce_destinations(
+        [destination],
+        "1.0.0",
+        os.path.join(TEST_DIR, "testannounce1.md"),
+        "test_announce1",
+    )
+
+    [(request, _response)] = httpserver.log
+    assert json.loads(request.data) == {
+        "type": "message",
+        "attachments": [
+            {
+                "contentType": "application/vnd.microsoft.card.adaptive",
+                "content": {
+                    "$schema": "http://adaptivecards.io/schemas/adaptive-card.json",
+                    "type": "AdaptiveCard",
+                    "version": "1.4",
+                    "msteams": {"width": "Full"},
+                    "body": [
+                        {
+                            "type": "TextBlock",
+                            "text": "test_announce1 1.0.0",
+                            "weight": "Bolder",
+                            "size": "Large",
+                            "wrap": True,
+                        },
+                        {
+                            "type": "TextBlock",
+                            "text": "1.0.0 - 2018-09-26",
+                            "weight": "Bolder",
+                            "size": "Large",
+                            "wrap": True,
+                        },
+                        {
+                            "type": "TextBlock",
+                            "text": "Added",
+                            "weight": "Bolder",
+                            "size": "Medium",
+                            "wrap": True,
+                        },
+                        {
+                            "type": "TextBlock",
+                            "text": "\u2022 Test Announce changelog: "
+                            "[Announcer](https://github.com/Metaswitch/announcer)",
+                            "wrap": True,
+                        },
+                    ],
+                    "actions": [
+                        {
+                            "type": "Action.OpenUrl",
+                            "title": "View changes",
+                            "url": "https://github.com/Metaswitch/announcer/compare/0.1.0...1.0.0",
+                        },
+                        {
+                            "type": "Action.OpenUrl",
+                            "title": "View testannounce1.md",
+                            "url": changelog_url("1.0.0", "testannounce1.md"),
+                        },
+                    ],
+                },
+            }
+        ],
+    }
+
+
+def test_workflow_formatting() -> None:
+    """Test that formatting is rendered to the markdown TextBlocks support."""
+    changelog = announcer.Changelog(
+        os.path.join(TEST_DIR, "testchangelog_formatting.md"),
+        announcer.renderer_class(announcer.TargetTypes.WORKFLOWS),
+    )
+
+    (rendered, _diff_url, sections) = changelog.get_version_details("0.1.0")
+
+    body = json.loads(rendered)
+    assert body == [json.loads(section["text"]) for section in sections]
+    lines = [
+        line
+        for element in body
+        for item in element.get("items", [element])
+        for line in item["text"].splitlines()
+    ]
+    assert "\u2022 Testing **bolds** work properly." in lines
+    assert "\u2022 Testing _italics_ work properly." in lines
+    assert "\u00a0" * 4 + "\u2023 Testing mid level list1" in lines
+    assert "2. List that starts at 2" in lines
+    [code] = [element for element in body if element.get("fontType") == "Monospace"]
+    assert code["text"] == 'var s = "JavaScript syntax highlighting";\nalert(s);'
+
+
+def test_workflow_cards(httpserver: HTTPServer, tmp_path: Path) -> None:
+    """Test that a long announcement is packed into cards within the limit."""
+    changelog = tmp_path / "CHANGELOG.md"
+    changelog.write_text(
+        "## [1.0.0] - 2025-01-01\n"
+        + "".join(f"### Section {n}\n- Change {n}\n" for n in range(20))
+        + "\n[1.0.0]: https://github.com/example/project/compare/0.9.0...1.0.0\n"
+    )
+    httpserver.expect_request("/workflow").respond_with_data("ok")
+    destination = announcer.Destination(
+        announcer.TargetTypes.WORKFLOWS,
+        httpserver.url_for("/workflow"),
+        max_card_bytes=2000,
+    )
+
+    announcer.announce_destinations([destination], "1.0.0", str(changelog), "project")
+
+    assert all(len(request.data) <= 2000 for (request, _response) in httpserver.log)
+    cards = [
+        json.loads(request.data)["attachments"][0]["content"]
+        for (request, _response) in httpserver.log
+    ]
+    assert len(cards) > 1
+    assert "actions" in cards[0]
+    assert cards[1]["body"][0]["text"] == "project 1.0.0 (continued)"
+    assert "actions" not in cards[1]
+    headings = [
+        element["text"]
+        for card in cards
+        for element in card["body"][1:]
+        if element.get("size") == "Medium"
+    ]
+    assert headings == [f"Section {n}" for n in range(20)]
+
+
+def test_workflow_cards_split_long_list(tmp_path: Path) -> None:
+    """Test that a list too long for one card is split between its entries."""
+    changelog = tmp_path / "CHANGELOG.md"
+    changelog.write_text(
+        "## [1.0.0] - 2025-01-01\n### Added\n"
+        + "".join(
+            f"- Change {n} with [a link](https://example.com/{n})\n"
+            for n in range(1500)
+        )
+        + "\n[1.0.0]: https://github.com/example/project/compare/0.9.0...1.0.0\n"
+    )
+    (_rendered, diff_url, sections) = announcer.Changelog(
+        str(changelog), announcer.renderer_class(announcer.TargetTypes.WORKFLOWS)
+    ).get_version_details("1.0.0")
+
+    messages = announcer.workflow_messages("1.0.0", "project", sections, diff_url)
+
+    assert len(messages) > 1
+    assert all(
+        len(json.dumps(message)) <= announcer.TEAMS_MAX_CARD_BYTES
+        for message in messages
+    )
+    bodies = [message["attachments"][0]["content"]["body"] for message in messages]
+    # The list starts in the first card, after the headings.
+    assert bodies[0][-1]["text"].startswith("\u2022 Change 0 ")
+    entries = [
+        line
+        for body in bodies
+        for element in body
+        for line in element["text"].splitlines()
+        if line.startswith("\u2022")
+    ]
+    assert entries == [
+        f"\u2022 Change {n} with [a link](https://example.com/{n})" for n in range(1500)
+    ]
@@ -4,10 +4,14 @@
 import json
 import os
 import sys
-from argparse import Namespace
+from argparse import ArgumentTypeError, Namespace
 from collections.abc import Callable
+from pathlib import Path
 from unittest.mock import patch
 
+import pytest
+from helpers import changelog_url
+from mistletoe import block_token
 from pytest_httpserver import HTTPServer
 from werkzeug.wrappers import Request, Response
 
@@ -56,12 +60,12 @@ TESTANNOUNCE1_ATTACHMENTS = [
             },
             {
                 "type": "button",
-                "url": "https://github.com/Metaswitch/announcer/blob/1.0.0/CHANGELOG.md",
-                "text": "View CHANGELOG.md",
+                "url": changelog_url("1.0.0", "testannounce1.md"),
+                "text": "View testannounce1.md",
             },
         ],
         "fallback": "View changes at https://github.com/Metaswitch/announcer/compare/0.1.0...1.0.0\n"
-        "View CHANGELOG.md at https://github.com/Metaswitch/announcer/blob/1.0.0/CHANGELOG.md",
+        "View testannounce1.md at " + changelog_url("1.0.0", "testannounce1.md"),
         "color": "good",
     },
 ]
@@ -219,8 +223,8 @@ def test_announce_tags(httpserver: HTTPServer) -> None:
                     },
                     {
                         "fallback": "View changes at https://github.com/Metaswitch/announcer/"
-                        "tree/0.1.0-msw\nView CHANGELOG.md at https://github.com/"
-                        "Metaswitch/announcer/blob/0.1.0-msw/CHANGELOG.md",
+                        "tree/0.1.0-msw\nView testannounce_tags.md at "
+                        + changelog_url("0.1.0-msw", "testannounce_tags.md"),
                         "color": "good",
                         "actions": [
                             {
@@ -230,9 +234,10 @@ def test_announce_tags(httpserver: HTTPServer) -> None:
                             },
                             {
                                 "type": "button",
-                                "text": "View CHANGELOG.md",
-                                "url": "https://github.com/Metaswitch/announcer/blob/0.1.0-msw/"
-                                "CHANGELOG.md",
+                                "text": "View testannounce_tags.md",
+                                "url": changelog_url(
+                                    "0.1.0-msw", "testannounce_tags.md"
+                                ),
                             },
                         ],
                     },
@@ -280,11 +285,13 @@ def test_announce_teams(httpserver: HTTPServer) -> None:
                     },
                     {
                         "@type": "OpenUri",
-                        "name": "View CHANGELOG.md",
+                        "name": "View testchangelog_formatting.md",
                         "targets": [
                             {
                                 "os": "default",
-                                "uri": "https://github.com/Metaswitch/announcer/blob/0.1.0/CHANGELOG.md",
+                                "uri": changelog_url(
+                                    "0.1.0", "testchangelog_formatting.md"
+                                ),
                             }
                         ],
                     },
@@ -350,11 +357,13 @@ def test_announce_teams_compatibility(httpserver: HTTPServer) -> None:
                     },
                     {
                         "@type": "OpenUri",
-                        "name": "View CHANGELOG.md",
+                        "name": "View testchangelog_formatting.md",
                         "targets": [
                             {
                                 "os": "default",
-                                "uri": "https://github.com/Metaswitch/announcer/blob/0.1.0/CHANGELOG.md",
+                                "uri": changelog_url(
+                                    "0.1.0", "testchangelog_formatting.md"
+                                ),
                             }
                         ],
                     },
@@ -373,3 +382,172 @@ def test_announce_teams_compatibility(httpserver: HTTPServer) -> None:
     )
 
     announcer.announce(args)
+
+
+def test_announce_destinations(httpserver: HTTPServer) -> None:
+    """Test announcing to several destinations parses the changelog once."""
+    username = "test_announce1"
+    teams_text = (
+        '<h2><a href="https://github.com/Metaswitch/announcer/compare/0.1.0...1.0.0">'
+        "1.0.0</a> - 2018-09-26</h2><h3>Added</h3><ul>\n<li>Test Announce "
+        'changelog: <a href="https://github.com/Metaswitch/announcer">Announcer</a>'
+        "</li>\n</ul>"
+    )
+
+    for path in ["/slack1", "/slack2"]:
+        httpserver.expect_request(path).respond_with_handler(
+            verify_dict(
+                {"attachments": TESTANNOUNCE1_ATTACHMENTS, "username": username}
+            )
+        )
+    httpserver.expect_request("/teams").respond_with_handler(
+        verify_dict(
+            {
+                "@type": "MessageCard",
+                "@context": "https://schema.org/extensions",
+                "summary": "test_announce1 1.0.0",
+                "title": "test_announce1 1.0.0",
+                "sections": [{"text": teams_text}],
+                "potentialAction": [
+                    {
+                        "@type": "OpenUri",
+                        "name": "View changes",
+                        "targets": [
+                            {
+                                "os": "default",
+                                "uri": "https://github.com/Metaswitch/announcer/compare/0.1.0...1.0.0",
+                            }
+                        ],
+                    },
+                    {
+                        "@type": "OpenUri",
+                        "name": "View testannounce1.md",
+                        "targets": [
+                            {
+                                "os": "default",
+                                "uri": changelog_url("1.0.0", "testannounce1.md"),
+                            }
+                        ],
+                    },
+                ],
+            }
+        )
+    )
+
+    testargs = [
+        "announce",
+        "--destination",
+        f"slack={httpserver.url_for('/slack1')}",
+        "--destination",
+        f"slack={httpserver.url_for('/slack2')}",
+        "--destination",
+        f"teams={httpserver.url_for('/teams')}",
+        "--changelogversion",
+        "1.0.0",
+        "--changelogfile",
+        os.path.join(TEST_DIR, "testannounce1.md"),
+        "--projectname",
+        "test_announce1",
+        "--username",
+        username,
+    ]
+
+    with (
+        patch.object(sys, "argv", testargs),
+        patch.object(block_token, "Document", wraps=block_token.Document) as document,
+    ):
+        announcer.main()
+
+    assert document.call_count == 1
+    assert len(httpserver.log) == 3
+
+
+def test_announce_destinations_file(httpserver: HTTPServer, tmp_path: Path) -> None:
+    """Test announcing to destinations listed in a file."""
+    httpserver.expect_request("/slack").respond_with_handler(
+        verify_dict(
+            {
+                "attachments": TESTANNOUNCE1_ATTACHMENTS,
+                "username": "file_user",
+                "icon_emoji": ":party_parrot:",
+            }
+        )
+    )
+    httpserver.expect_request("/slack_default").respond_with_handler(
+        verify_dict(
+            {
+                "attachments": TESTANNOUNCE1_ATTACHMENTS,
+                "username": "test_announce1",
+            }
+        )
+    )
+    destinations_file = tmp_path / "destinations.json"
+    destinations_file.write_text(
+        json.dumps(
+            [
+                {
+                    "target": "slack",
+                    "webhook": httpserver.url_for("/slack"),
+                    "username": "file_user",
+                    "iconemoji": "party_parrot",
+                },
+                {"target": "slack", "webhook": httpserver.url_for("/slack_default")},
+            ]
+        )
+    )
+
+    args = make_args(
+        changelogversion="1.0.0",
+        changelogfile=os.path.join(TEST_DIR, "testannounce1.md"),
+        projectname="test_announce1",
+        username="test_announce1",
+    )
+    args.destinations_file = str(destinations_file)
+
+    announcer.announce(args)
+    assert len(httpserver.log) == 2
+
+
+def test_parse_destination() -> None:
+    """Test parsing TARGET=WEBHOOK destination arguments."""
+    assert announcer.parse_destination("teams=https://example.com/hook?a=b") == (
+        announcer.TargetTypes.TEAMS,
+        "https://example.com/hook?a=b",
+    )
+    for value in ["https://example.com/hook", "email=https://example.com", "slack="]:
+        with pytest.raises(ArgumentTypeError):
+            announcer.parse_destination(value)
+
+
+def test_announce_slack_helper(httpserver: HTTPServer) -> None:
+    """Test that announce_slack posts through the shared delivery path."""
+    httpserver.expect_request("/slack").respond_with_handler(
+        verify_dict(
+            {"attachments": TESTANNOUNCE1_ATTACHMENTS, "username": "helper_user"}
+        )
+    )
+
+    announcer.announce_slack(
+        httpserver.url_for("/slack"),
+        "1.0.0",
+        os.path.join(TEST_DIR, "testannounce1.md"),
+        "test_announce1",
+        username="helper_user",
+    )
+    assert len(httpserver.log) == 1
+
+
+def test_announce_teams_helper(httpserver: HTTPServer) -> None:
+    """Test that announce_teams raises DeliveryError when the card is rejected."""
+    httpserver.expect_request("/teams").respond_with_data("nope", status=400)
+
+    with pytest.raises(announcer.DeliveryError):
+        announcer.announce_teams(
+            httpserver.url_for("/teams"),
+            "0.1.0",
+            os.path.join(TEST_DIR, "testchangelog_formatting.md"),
+            "testchangelog_formatting",
+            compatibility_teams_sections=False,
+        )
+    card = json.loads(httpserver.log[0][0].data)
+    assert card["title"] == "testchangelog_formatting 0.1.0"
@@ -0,0 +1,112 @@
+# Copyright (c) Alianza, Inc. All rights reserved.
+"""Tests for announcing a batch of versions."""
+
+import json
+import os
+import shutil
+import sys
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+from mistletoe import block_token
+from pytest_httpserver import HTTPServer
+
+import announcer
+
+TEST_DIR = os.path.dirname(__file__)
+
+
+def write_manifest(tmp_path: Path, entries: list[dict[str, object]]) -> str:
+    """Write a batch manifest, returning its path."""
+    manifest = tmp_path / "manifest.json"
+    manifest.write_text(json.dumps(entries))
+    return str(manifest)
+
+
+def manifest_entries(httpserver: HTTPServer) -> list[dict[str, object]]:
+    """Return manifest entries for two projects announcing to the server."""
+    return [
+        {
+            "projectname": "test_announce1",
+            "changelogfile": os.path.join(TEST_DIR, "testannounce1.md"),
+            "changelogversion": "1.0.0",
+            "destinations": [
+                {"target": "slack", "webhook": httpserver.url_for("/announce1")}
+            ],
+        },
+        {
+            "projectname": "test_simple",
+            "changelogfile": os.path.join(TEST_DIR, "testchangelog_simple.md"),
+            "changelogversion": "0.1.0",
+            "destinations": [
+                {"target": "slack", "webhook": httpserver.url_for("/simple")},
+                {"target": "teams", "webhook": httpserver.url_for("/simple")},
+            ],
+        },
+    ]
+
+
+def test_batch_main(httpserver: HTTPServer, tmp_path: Path) -> None:
+    """Test the batch subcommand announces every entry in the manifest."""
+    httpserver.expect_request("/announce1").respond_with_data("ok")
+    httpserver.expect_request("/simple").respond_with_data("ok")
+    manifest = write_manifest(tmp_path, manifest_entries(httpserver))
+
+    with patch.object(sys, "argv", ["announce", "batch", manifest]):
+        announcer.main()
+
+    assert len(httpserver.log) == 3
+    [slack_data] = [
+        json.loads(request.data)
+        for (request, _response) in httpserver.log
+        if request.path == "/announce1"
+    ]
+    assert slack_data["attachments"][0]["pretext"] == (
+        "*test_announce1 1.0.0* (https://github.com/Metaswitch/announcer)"
+    )
+
+
+def test_batch_jobs(httpserver: HTTPServer, tmp_path: Path) -> None:
+    """Test rendering a batch in several processes."""
+    httpserver.expect_request("/announce1").respond_with_data("ok")
+    httpserver.expect_request("/simple").respond_with_data("ok")
+    manifest = write_manifest(tmp_path, manifest_entries(httpserver))
+
+    announcer.announce_batch(announcer.load_manifest(manifest), jobs=2)
+
+    assert len(httpserver.log) == 3
+
+
+def test_batch_parses_each_version_once(httpserver: HTTPServer, tmp_path: Path) -> None:
+    """Test that entries for the same changelog version share a parse."""
+    httpserver.expect_request("/announce1").respond_with_data("ok")
+    entries = manifest_entries(httpserver)[:1] * 3
+    manifest = write_manifest(tmp_path, entries)
+
+    with patch.object(block_token, "Document", wraps=block_token.Document) as document:
+        announcer.announce_batch(announcer.load_manifest(manifest))
+
+    assert document.call_count == 1
+    assert len(httpserver.log) == 3
+
+
+def test_load_manifest(tmp_path: Path) -> None:
+    """Test that changelogs are found relative to the manifest."""
+    shutil.copy(os.path.join(TEST_DIR, "testannounce1.md"), tmp_path / "CL.md")
+    entry: dict[str, object] = {
+        "projectname": "test_announce1",
+        "changelogfile": "CL.md",
+        "changelogversion": "1.0.0",
+        "destinations": [{"target": "teams", "webhook": "https://example.com"}],
+    }
+
+    [batch_entry] = announcer.load_manifest(write_manifest(tmp_path, [entry]))
+    assert batch_entry.changelogfile == str(tmp_path / "CL.md")
+    assert batch_entry.destinations == [
+        announcer.Destination(announcer.TargetTypes.TEAMS, "https://example.com")
+    ]
+
+    entry["version"] = "1.0.0"
+    with pytest.raises(ValueError, match="version"):
+        announcer.load_manifest(write_manifest(tmp_path, [entry]))
@@ -0,0 +1,226 @@
+# Copyright (c) Alianza, Inc. All rights reserved.
+"""Tests for announcing to Slack with Block Kit blocks."""
+
+import json
+import os
+from pathlib import Path
+from typing import Any
+
+from helpers import changelog_url
+from pytest_httpserver import HTTPServer
+
+import announcer
+
+TEST_DIR = os.path.dirname(__file__)
+
+
+def render_blocks(filename: str, version: str) -> list[dict[str, Any]]:
+    """Render a version of a changelog to Block Kit blocks."""
+    changelog = announcer.Changelog(
+        filename, announcer.renderer_class(announcer.TargetTypes.SLACK_BLOCKS)
+    )
+    (rendered, _diff_url, sections) = changelog.get_version_details(version)
+    blocks = json.loads(rendered)
+    assert blocks == [json.loads(section["text"]) for section in sections]
+    return blocks
+
+
+def test_announce_slack_blocks(httpserver: HTTPServer) -> None:
+    """Test announcing a version to Slack with blocks."""
+    httpserver.expect_request("/slack").respond_with_data("ok")
+    destination = announcer.Destination(
+        announcer.TargetTypes.SLACK_BLOCKS,
+        httpserver.url_for("/slack"),
+        username="announcer",
+    )
+
+    announcer.announce_destinations(
+        [destination],
+        "1.0.0",
+        os.path.join(TEST_DIR, "testannounce1.md"),
+        "test_announce1",
+    )
+
+    [(request, _response)] = httpserver.log
+    assert json.loads(request.data) == {
+        "text": "test_announce1 1.0.0",
+        "username": "announcer",
+        "blocks": [
+            {
+                "type": "header",
+                "text": {"type": "plain_text", "text": "test_announce1 1.0.0"},
+            },
+            {
+                "type": "header",
+                "text": {"type": "plain_text", "text": "1.0.0 - 2018-09-26"},
+            },
+            {"type": "section", "text": {"type": "mrkdwn", "text": "*Added*"}},
+            {
+                "type": "rich_text",
+                "elements": [
+                    {
+                        "type": "rich_text_list",
+                        "style": "bullet",
+                        "indent": 0,
+                        "elements": [
+                            {
+                                "type": "rich_text_section",
+                                "elements": [
+                                    {
+                                        "type": "text",
+                                        "text": "Test Announce changelog: ",
+                                    },
+                                    {
+                                        "type": "link",
+                                        "url": "https://github.com/Metaswitch/announcer",
+                                        "text": "Announcer",
+                                    },
+                                ],
+                            }
+                        ],
+                    }
+                ],
+            },
+            {
+                "type": "actions",
+                "elements": [
+                    {
+                        "type": "button",
+                        "text": {"type": "plain_text", "text": "View Changes"},
+                        "url": "https://github.com/Metaswitch/announcer/compare/0.1.0...1.0.0",
+                    },
+                    {
+                        "type": "button",
+                        "text": {
+                            "type": "plain_text",
+                            "text": "View testannounce1.md",
+                        },
+                        "url": changelog_url("1.0.0", "testannounce1.md"),
+                    },
+                ],
+            },
+        ],
+    }
+
+
+def test_blocks_formatting() -> None:
+    """Test that nested lists and code are rendered to rich text."""
+    blocks = render_blocks(
+        os.path.join(TEST_DIR, "testchangelog_formatting.md"), "0.1.0"
+    )
+
+    rich_text = [block["elements"] for block in blocks if block["type"] == "rich_text"]
+    lists = [element for elements in rich_text for element in elements]
+    assert [(element["type"], element.get("indent")) for element in lists] == [
+        ("rich_text_list", 0),
+        ("rich_text_list", 0),
+        ("rich_text_list", 1),
+        ("rich_text_list", 0),
+        ("rich_text_list", 0),
+        ("rich_text_preformatted", None),
+        ("rich_text_list", 0),
+    ]
+    assert lists[0]["elements"][4]["elements"][1] == {
+        "type": "text",
+        "text": "bolds",
+        "style": {"bold": True},
+    }
+    assert lists[5]["elements"] == [
+        {"type": "text", "text": 'var s = "JavaScript syntax highlighting";\nalert(s);'}
+    ]
+    assert lists[6]["style"] == "ordered"
+    assert lists[6]["offset"] == 1
+    assert {"type": "divider"} in blocks
+
+
+def test_blocks_text_limit(tmp_path: Path) -> None:
+    """Test that text too long for one block is split between blocks."""
+    changelog = tmp_path / "CHANGELOG.md"
+    changelog.write_text(
+        "## [1.0.0] - 2025-01-01\n"
+        + "\n".join(f"Paragraph line {n} with some more text" for n in range(200))
+        + "\n\n"
+        + "".join(f"- List entry {n} with some more text\n" for n in range(200))
+        + "\n[1.0.0]: https://github.com/example/project/compare/0.9.0...1.0.0\n"
+    )
+
+    blocks = render_blocks(str(changelog), "1.0.0")
+
+    sections = [block for block in blocks if block["type"] == "section"]
+    lists = [block for block in blocks if block["type"] == "rich_text"]
+    assert len(sections) > 1
+    assert len(lists) > 1
+    assert all(len(block["text"]["text"]) <= 3000 for block in sections)
+    for block in lists:
+        texts = [
+            element["text"]
+            for list_element in block["elements"]
+            for entry in list_element["elements"]
+            for element in entry["elements"]
+        ]
+        assert sum(len(text) for text in texts) <= 3000
+
+
+def test_blocks_messages(httpserver: HTTPServer, tmp_path: Path) -> None:
+    """Test that more blocks than fit in one message are sent over several."""
+    changelog = tmp_path / "CHANGELOG.md"
+    changelog.write_text(
+        "## [1.0.0] - 2025-01-01\n"
+        + "".join(f"### Section {n}\n- Change {n}\n" for n in range(60))
+        + "\n[1.0.0]: https://github.com/example/project/compare/0.9.0...1.0.0\n"
+    )
+    httpserver.expect_request("/slack").respond_with_data("ok")
+    destination = announcer.Destination(
+        announcer.TargetTypes.SLACK_BLOCKS, httpserver.url_for("/slack")
+    )
+
+    announcer.announce_destinations([destination], "1.0.0", str(changelog), "project")
+
+    messages = [json.loads(request.data) for (request, _response) in httpserver.log]
+    assert len(messages) == 3
+    assert all(len(message["blocks"]) <= 50 for message in messages)
+    assert messages[0]["blocks"][0]["type"] == "header"
+    assert messages[0]["blocks"][-1]["type"] == "actions"
+    headings = [
+        block["text"]["text"]
+        for message in messages
+        for block in message["blocks"]
+        if block["type"] == "section"
+    ]
+    assert headings == [f"*Section {n}*" for n in range(60)]
+
+
+def test_blocks_message_bytes(tmp_path: Path) -> None:
+    """Test that a list too big for one message is split between its entries."""
+    changelog = tmp_path / "CHANGELOG.md"
+    changelog.write_text(
+        "## [1.0.0] - 2025-01-01\n### Added\n"
+        + "".join(
+            f"- Change {n} with [a link](https://example.com/{n})\n"
+            for n in range(1500)
+        )
+        + "\n[1.0.0]: https://github.com/example/project/compare/0.9.0...1.0.0\n"
+    )
+    (_rendered, diff_url, sections) = announcer.Changelog(
+        str(changelog), announcer.renderer_class(announcer.TargetTypes.SLACK_BLOCKS)
+    ).get_version_details("1.0.0")
+
+    messages = announcer.slack_block_messages("1.0.0", "project", sections, diff_url)
+
+    assert len(messages) > 1
+    assert all(
+        len(json.dumps(message)) <= announcer.SLACK_MAX_MESSAGE_BYTES
+        for message in messages
+    )
+    # The list starts in the first message, after the headings.
+    assert messages[0]["blocks"][-2]["type"] == "rich_text"
+    assert messages[0]["blocks"][-1]["type"] == "actions"
+    entries = [
+        entry["elements"][0]["text"]
+        for message in messages
+        for block in message["blocks"]
+        if block["type"] == "rich_text"
+        for list_element in block["elements"]
+        for entry in list_element["elements"]
+    ]
+    assert entries == [f"Change {n} with " for n in range(1500)]
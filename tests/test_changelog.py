@@ -1,7 +1,11 @@
 # Copyright (c) Alianza, Inc. All rights reserved.
 """Tests for the ChangelogRenderer."""
 
+import logging
 import os
+from pathlib import Path
+
+import pytest
 
 import announcer
 
@@ -48,3 +52,113 @@ def test_changelog_formatting() -> None:
         "```\n"
         "2. List that starts at 2\n"
     )
+
+
+@pytest.mark.parametrize("target", list(announcer.TargetTypes))
+def test_changelog_tracing(
+    target: announcer.TargetTypes, caplog: pytest.LogCaptureFixture
+) -> None:
+    """Test that tokens are only logged when debug logging is enabled."""
+    filename = os.path.join(TEST_DIR, "testchangelog_formatting.md")
+    plain = announcer.Changelog(filename, announcer.renderer_class(target))
+    expected = plain.get_version_details("0.1.0")
+    assert "Rendering" not in caplog.text
+
+    caplog.set_level(logging.DEBUG, logger="announcer")
+    tracing = announcer.Changelog(filename, announcer.renderer_class(target))
+    assert tracing.renderer_class is not plain.renderer_class
+    assert issubclass(tracing.renderer_class, plain.renderer_class)
+
+    assert tracing.get_version_details("0.1.0") == expected
+    assert "Rendering <mistletoe.span_token.RawText" in caplog.text
+    if target is announcer.TargetTypes.SLACK:
+        assert "List entry: ListEntry(depth=1, number=None" in caplog.text
+
+
+@pytest.mark.parametrize("target", list(announcer.TargetTypes))
+@pytest.mark.parametrize(
+    "filename", ["testchangelog_formatting.md", "testannounce1.md"]
+)
+def test_changelog_buffered(target: announcer.TargetTypes, filename: str) -> None:
+    """Test that rendering into a buffer gives the same result as joining strings."""
+    changelog = announcer.Changelog(
+        os.path.join(TEST_DIR, filename), announcer.renderer_class(target)
+    )
+    version = "0.1.0" if "formatting" in filename else "1.0.0"
+    document = changelog.get_document(version)
+
+    results = []
+    for buffered in (True, False):
+        with changelog.renderer_class(version) as renderer:
+            renderer.buffered = buffered
+            results.append((renderer.render(document), renderer.sections))
+
+    assert results[0] == results[1]
+
+
+@pytest.mark.parametrize("target", list(announcer.TargetTypes))
+def test_changelog_versions(target: announcer.TargetTypes, tmp_path: Path) -> None:
+    """Test that every version is found from one parse, and rendered as alone."""
+    changelog = tmp_path / "CHANGELOG.md"
+    changelog.write_text(
+        "# Changelog\n\nIntroduction.\n\n"
+        "## [Unreleased]\n### Added\n\n"
+        "## [1.0.2] - 2025-01-03\n### Fixed\n- Fix 2\n\n"
+        "## [1.0.1] - 2025-01-02\n### Fixed\n- Fix 1\n\n"
+        "## 1.0.0 - 2025-01-01\n### Added\n- Initial version\n\n"
+        "[Unreleased]: https://github.com/owner/project/compare/1.0.2...HEAD\n"
+        "[1.0.2]: https://github.com/owner/project/compare/1.0.1...1.0.2\n"
+        "[1.0.1]: https://github.com/owner/project/compare/1.0.0...1.0.1\n"
+    )
+    renderer = announcer.renderer_class(target)
+    versions = announcer.Changelog(str(changelog), renderer).get_versions()
+
+    assert list(versions) == ["Unreleased", "1.0.2", "1.0.1", "1.0.0 - 2025-01-01"]
+    assert versions["1.0.2"].diff_url == (
+        "https://github.com/owner/project/compare/1.0.1...1.0.2"
+    )
+    assert versions["1.0.0 - 2025-01-01"].diff_url is None
+    assert len(versions["1.0.1"].children) == 3
+    for version in versions:
+        expected = announcer.Changelog(str(changelog), renderer).get_version_details(
+            version
+        )
+        assert versions.get_version_details(version) == expected
+    with pytest.raises(KeyError):
+        versions.get_version_details("2.0.0")
+
+
+def test_changelog_versions_render_once() -> None:
+    """Test that each version is only rendered once for each renderer."""
+    versions = announcer.Changelog(
+        os.path.join(TEST_DIR, "testchangelog_simple.md"), announcer.ChangeLogRenderer
+    ).get_versions()
+    teams = announcer.renderer_class(announcer.TargetTypes.TEAMS)
+
+    slack_details = versions.get_version_details("0.1.0")
+    teams_details = versions.get_version_details("0.1.0", teams)
+
+    assert versions.get_version_details("0.1.0") is slack_details
+    assert versions.get_version_details("0.1.0", teams) is teams_details
+    assert teams_details[0].startswith("<h2>")
+
+
+def test_changelog_analyse_list() -> None:
+    """Test that lists can still be analysed into their entries."""
+    changelog = announcer.Changelog(
+        os.path.join(TEST_DIR, "testchangelog_formatting.md"),
+        announcer.ChangeLogRenderer,
+    )
+    document = changelog.get_document("0.1.0")
+    lists = [
+        child for child in document.children or [] if child.__class__.__name__ == "List"
+    ]
+    with announcer.ChangeLogRenderer("0.1.0") as renderer:
+        entries = renderer.analyse_list(lists[1], 0)
+    assert [(e.depth, e.number) for e in entries[:4]] == [
+        (0, None),
+        (1, None),
+        (1, None),
+        (0, None),
+    ]
+    assert entries[1].content == "Testing mid level list1"
@@ -0,0 +1,141 @@
+# Copyright (c) Alianza, Inc. All rights reserved.
+"""Tests for the on-disk changelog index."""
+
+import os
+import sys
+from pathlib import Path
+from unittest.mock import patch
+
+from helpers import copy_changelog
+
+import announcer
+from announcer.changelogindex import (
+    ChangelogIndex,
+    current_index,
+    index_path,
+    refresh_index,
+)
+from announcer.sectionscanner import extract_version_lines
+
+
+def test_index_versions(tmp_path: Path) -> None:
+    """Test that the index maps versions to their sections and diff URLs."""
+    changelog = copy_changelog(tmp_path)
+    index = refresh_index(changelog)
+
+    assert list(index.versions) == ["Unreleased", "1.0.0", "0.1.0"]
+    [version_range] = index.versions["1.0.0"]
+    assert version_range.diff_url == (
+        "https://github.com/Metaswitch/announcer/compare/0.1.0...1.0.0"
+    )
+    with open(changelog, "rb") as f:
+        f.seek(version_range.start)
+        section = f.read(version_range.end - version_range.start)
+    assert section.startswith(b"## [1.0.0] - 2018-09-26\n")
+    assert section.endswith(b"\n\n")
+
+
+def test_index_extracts_version(tmp_path: Path) -> None:
+    """Test that a saved index finds the same lines as scanning the file."""
+    changelog = copy_changelog(tmp_path, "testannounce_tags.md")
+    refresh_index(changelog)
+    index = ChangelogIndex.load(changelog)
+    assert index is not None
+
+    for version in ["Unreleased", "1.0.0", "0.1.0", "9.9.9"]:
+        with open(changelog) as f:
+            assert index.extract_version_lines(version) == extract_version_lines(
+                f, version
+            )
+
+
+def test_index_rebuilt_when_changed(tmp_path: Path) -> None:
+    """Test that the index is rebuilt when the changelog changes."""
+    changelog = copy_changelog(tmp_path)
+    refresh_index(changelog)
+
+    with open(changelog, "a") as f:
+        f.write("\n## 2.0.0\n### Added\n- A new version\n")
+
+    index = current_index(changelog)
+    assert index is not None
+    assert "2.0.0" in index.versions
+
+    cl = announcer.Changelog(changelog, announcer.ChangeLogRenderer)
+    (details, _diff_url, _sections) = cl.get_version_details("2.0.0")
+    assert details == "2.0.0\n*Added*\n\u2022 A new version\n"
+
+
+def test_index_kept_when_touched(tmp_path: Path) -> None:
+    """Test that touching the changelog without changing it keeps the index."""
+    changelog = copy_changelog(tmp_path)
+    index = refresh_index(changelog)
+    os.utime(changelog, ns=(index.mtime_ns + 10**9, index.mtime_ns + 10**9))
+
+    with patch.object(ChangelogIndex, "build") as build:
+        touched = current_index(changelog)
+    build.assert_not_called()
+    assert touched is not None
+    assert touched.mtime_ns == index.mtime_ns + 10**9
+
+
+def test_unreadable_index_ignored(tmp_path: Path) -> None:
+    """Test that a corrupt index is ignored rather than breaking announcements."""
+    changelog = copy_changelog(tmp_path)
+    Path(index_path(changelog)).write_text("{not json")
+
+    assert current_index(changelog) is None
+    cl = announcer.Changelog(changelog, announcer.ChangeLogRenderer)
+    (_details, diff_url, _sections) = cl.get_version_details("1.0.0")
+    assert diff_url == "https://github.com/Metaswitch/announcer/compare/0.1.0...1.0.0"
+
+
+def test_index_main(tmp_path: Path) -> None:
+    """Test the index subcommand."""
+    changelog = copy_changelog(tmp_path)
+
+    with patch.object(sys, "argv", ["announce", "index", changelog]):
+        announcer.main()
+
+    assert os.path.exists(index_path(changelog))
+
+
+def test_index_line_separators(tmp_path: Path) -> None:
+    """Test that only newlines end lines, as when reading the changelog."""
+    changelog = tmp_path / "CHANGELOG.md"
+    changelog.write_text(
+        "## [1.0.0] - 2025-01-01\n### Fixed\n- Form\x0cfeed and line\u2028separator\n"
+        "\n## [0.1.0] - 2024-01-01\n### Added\n- First release\n"
+        "\n[1.0.0]: https://example.com/1.0.0\n[0.1.0]: https://example.com/0.1.0\n",
+        encoding="utf-8",
+    )
+
+    with patch.object(sys, "argv", ["announce", "index", str(changelog)]):
+        announcer.main()
+    index = current_index(str(changelog))
+    assert index is not None
+
+    for version in ["1.0.0", "0.1.0"]:
+        with open(changelog) as f:
+            assert index.extract_version_lines(version) == extract_version_lines(
+                f, version
+            )
+    with open(changelog, "rb") as f:
+        f.seek(index.versions["0.1.0"][0].start)
+        assert f.readline() == b"## [0.1.0] - 2024-01-01\n"
+
+
+def test_index_finds_exact_version(tmp_path: Path) -> None:
+    """Test that only the sections the index found for a version are read."""
+    changelog = tmp_path / "CHANGELOG.md"
+    changelog.write_text(
+        "## [11.0.0] - 2025-01-01\n- Eleven\n\n## [1.0.0] - 2024-01-01\n- One\n"
+        "\n[11.0.0]: https://example.com/11.0.0\n[1.0.0]: https://example.com/1.0.0\n"
+    )
+    index = refresh_index(str(changelog))
+
+    lines = index.extract_version_lines("1.0.0")
+    assert lines is not None
+    assert "- One\n" in lines
+    assert "- Eleven\n" not in lines
+    assert index.extract_version_lines("2.0.0") is None
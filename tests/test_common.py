@@ -0,0 +1,61 @@
+# Copyright (c) Alianza, Inc. All rights reserved.
+"""Tests for the functionality shared by the renderers."""
+
+from typing import cast
+
+from mistletoe import block_token, token
+
+from announcer.common import ListEntry, PlainTextExtractor, render_to_plaintext
+
+
+class FakeToken:
+    """A token with either children or content, like mistletoe's tokens."""
+
+    def __init__(
+        self, children: "list[FakeToken] | None" = None, content: str = ""
+    ) -> None:
+        """Create a token."""
+        self.children = children
+        self.content = content
+
+
+def test_plaintext() -> None:
+    """Test that the plain text of a heading includes all its inline text."""
+    [heading] = (
+        block_token.Document("## 1.0.0 with *emphasis* and `code`\n").children or []
+    )
+
+    assert render_to_plaintext(heading) == "1.0.0 with emphasis and code"
+
+
+def test_plaintext_deeply_nested() -> None:
+    """Test that deeply nested tokens don't exhaust the stack."""
+    root = FakeToken(content="deep")
+    for _ in range(20000):
+        root = FakeToken(children=[root, FakeToken(content=".")])
+
+    text = render_to_plaintext(cast(token.Token, root))
+
+    assert text == "deep" + "." * 20000
+
+
+def test_plaintext_cached() -> None:
+    """Test that the text of each subtree is only built once."""
+    emphasis = FakeToken(children=[FakeToken(content="a")])
+    inner = FakeToken(children=[emphasis, FakeToken(content="b")])
+    outer = FakeToken(children=[inner, FakeToken(content="c")])
+    plaintext = PlainTextExtractor()
+
+    assert plaintext(cast(token.Token, inner)) == "ab"
+    inner.children = []
+    assert plaintext(cast(token.Token, outer)) == "abc"
+
+
+def test_list_entry() -> None:
+    """Test that list entries can be used as tuples."""
+    entry = ListEntry(1, None, "Change")
+
+    (depth, number, content) = entry
+    assert (depth, number, content) == (1, None, "Change")
+    assert entry[2] == "Change"
+    assert entry.depth == 1
@@ -0,0 +1,238 @@
+# Copyright (c) Alianza, Inc. All rights reserved.
+"""Tests for delivering messages to webhooks."""
+
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from collections.abc import Callable, Iterator
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import ClassVar
+from unittest.mock import patch
+
+import pytest
+import requests
+from pytest_httpserver import HTTPServer
+from werkzeug.wrappers import Request, Response
+
+import announcer
+from announcer import metrics
+from announcer.delivery import (
+    DeliveryError,
+    deliver,
+    encode_json_stdlib,
+    encode_messages,
+    json_encoder,
+    make_session,
+    post_message,
+)
+from announcer.retry import NO_RETRY
+
+TEST_DIR = os.path.dirname(__file__)
+
+
+@pytest.fixture
+def threaded_httpserver() -> Iterator[HTTPServer]:
+    """Run an HTTP server that handles requests concurrently."""
+    server = HTTPServer(threaded=True)
+    server.start()
+    yield server
+    server.clear()
+    server.stop()
+
+
+def slow_response(delay: float) -> Callable[[Request], Response]:
+    """Return a handler that responds after a delay."""
+
+    def _respond(_request: Request) -> Response:
+        time.sleep(delay)
+        return Response("OK", status=200)
+
+    return _respond
+
+
+def test_deliver_concurrently(threaded_httpserver: HTTPServer) -> None:
+    """Test that messages are sent at the same time."""
+    threaded_httpserver.expect_request("/slow").respond_with_handler(slow_response(0.5))
+    messages = [(threaded_httpserver.url_for("/slow"), {"n": n}) for n in range(4)]
+
+    start = time.monotonic()
+    results = deliver(messages, concurrency=4)
+    elapsed = time.monotonic() - start
+
+    assert all(result.ok for result in results)
+    assert elapsed < 1.5
+    assert len(threaded_httpserver.log) == 4
+
+
+def test_deliver_reports_each_failure(httpserver: HTTPServer) -> None:
+    """Test that a failure to send one message doesn't stop the others."""
+    httpserver.expect_request("/fail").respond_with_data("Nope", status=500)
+    httpserver.expect_request("/ok").respond_with_data("OK")
+
+    results = deliver(
+        [(httpserver.url_for("/fail"), {}), (httpserver.url_for("/ok"), {})],
+        concurrency=1,
+        retry_policy=NO_RETRY,
+    )
+
+    assert [result.webhook for result in results] == [
+        httpserver.url_for("/fail"),
+        httpserver.url_for("/ok"),
+    ]
+    assert isinstance(results[0].error, requests.HTTPError)
+    assert results[1].ok
+
+
+def test_deliver_deadline(threaded_httpserver: HTTPServer) -> None:
+    """Test that messages not sent by the deadline are reported as failures."""
+    threaded_httpserver.expect_request("/slow").respond_with_handler(slow_response(1.0))
+
+    start = time.monotonic()
+    [result] = deliver([(threaded_httpserver.url_for("/slow"), {})], deadline=0.2)
+
+    assert time.monotonic() - start < 0.9
+    assert isinstance(result.error, TimeoutError)
+
+
+def test_deliver_deadline_stops_sending(threaded_httpserver: HTTPServer) -> None:
+    """Test that the rest of a list of messages isn't sent after the deadline."""
+    threaded_httpserver.expect_request("/slow").respond_with_handler(slow_response(0.3))
+    parts = [{"n": n} for n in range(4)]
+
+    [result] = deliver([(threaded_httpserver.url_for("/slow"), parts)], deadline=0.5)
+    assert isinstance(result.error, TimeoutError)
+    assert "1 of 4 messages sent" in str(result.error)
+
+    # Nothing more arrives once the delivery has been reported.
+    time.sleep(0.5)
+    assert len(threaded_httpserver.log) <= 2
+
+
+def test_announce_destinations_failure(httpserver: HTTPServer) -> None:
+    """Test that a failed destination is reported after trying all of them."""
+    httpserver.expect_request("/fail").respond_with_data("Nope", status=404)
+    httpserver.expect_request("/ok").respond_with_data("OK")
+
+    with pytest.raises(DeliveryError) as excinfo:
+        announcer.announce_destinations(
+            [
+                announcer.Destination(
+                    announcer.TargetTypes.SLACK, httpserver.url_for("/fail")
+                ),
+                announcer.Destination(
+                    announcer.TargetTypes.TEAMS, httpserver.url_for("/ok")
+                ),
+            ],
+            "1.0.0",
+            os.path.join(TEST_DIR, "testannounce1.md"),
+            "test_announce1",
+        )
+
+    assert [result.ok for result in excinfo.value.results] == [False, True]
+    assert len(httpserver.log) == 2
+
+
+class KeepAliveHandler(BaseHTTPRequestHandler):
+    """Accept posts on connections that are kept open between requests."""
+
+    protocol_version = "HTTP/1.1"
+    connections: ClassVar[list[int]] = []
+
+    def setup(self) -> None:
+        """Count each new connection."""
+        super().setup()
+        self.connections.append(self.client_address[1])
+
+    def do_POST(self) -> None:
+        """Read the message, then respond OK."""
+        self.rfile.read(int(self.headers["Content-Length"]))
+        self.send_response(200)
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"OK")
+
+    def log_message(self, format: str, *args: object) -> None:
+        """Don't log requests."""
+
+
+def test_post_message_reuses_connections() -> None:
+    """Test that repeated posts to one host share a connection."""
+    server = ThreadingHTTPServer(("localhost", 0), KeepAliveHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    webhook = f"http://localhost:{server.server_address[1]}/slack"
+    session = make_session()
+
+    try:
+        for _ in range(3):
+            post_message(webhook, {}, session=session)
+        [result] = deliver([(webhook, {})], session=session)
+    finally:
+        server.shutdown()
+        server.server_close()
+        session.close()
+
+    assert result.ok
+    assert len(KeepAliveHandler.connections) == 1
+
+
+def test_json_encoders() -> None:
+    """Test that the standard library is used when orjson isn't installed."""
+    message = {"text": 'Caf\u00e9 \u2022 "quoted"', "blocks": [{"n": 1}, None]}
+    json_encoder.cache_clear()
+    try:
+        with patch.dict(sys.modules, {"orjson": None}):
+            assert json_encoder() is encode_json_stdlib
+        json_encoder.cache_clear()
+        encoded = json_encoder()(message)
+    finally:
+        json_encoder.cache_clear()
+
+    # Whichever encoder is used, the JSON is the same.
+    assert encoded == encode_json_stdlib(message)
+    assert json.loads(encoded) == message
+
+
+def test_encode_shared_messages(httpserver: HTTPServer) -> None:
+    """Test that destinations sent the same message share its encoding."""
+    httpserver.expect_request("/one").respond_with_data("ok")
+    httpserver.expect_request("/two").respond_with_data("ok")
+    destinations = [
+        announcer.Destination(announcer.TargetTypes.SLACK, httpserver.url_for(path))
+        for path in ("/one", "/two")
+    ]
+    changelogfile = os.path.join(TEST_DIR, "testannounce1.md")
+    details = announcer.render_version_details(
+        changelogfile, "1.0.0", {announcer.TargetTypes.SLACK}
+    )
+    messages = announcer.build_messages(destinations, "1.0.0", "proj", details)
+
+    assert messages[0][1] is messages[1][1]
+    [first, second] = encode_messages(messages)
+    assert first[0] is second[0]
+
+    metrics.start()
+    try:
+        results = deliver(messages)
+    finally:
+        records = metrics.stop()
+
+    assert all(result.ok for result in results)
+    [record] = [r for r in records if r["stage"] == "encode"]
+    assert record["encoded"] == 1
+    assert [request.data for (request, _response) in httpserver.log] == first * 2
+
+
+def test_post_message_debug_log(
+    httpserver: HTTPServer, caplog: pytest.LogCaptureFixture
+) -> None:
+    """Test that the JSON sent is logged at debug level."""
+    httpserver.expect_request("/slack").respond_with_data("ok")
+
+    with caplog.at_level(logging.DEBUG, logger="announcer.delivery"):
+        post_message(httpserver.url_for("/slack"), {"text": "Caf\u00e9"})
+
+    assert 'Sending info {"text":"Caf\u00e9"}' in caplog.messages
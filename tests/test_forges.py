@@ -0,0 +1,141 @@
+# Copyright (c) Alianza, Inc. All rights reserved.
+"""Tests for building links to the forges that changelogs are hosted on."""
+
+from collections.abc import Iterator
+from pathlib import Path
+
+import pytest
+
+import announcer
+from announcer import forges
+from announcer.forges import Forge, derive_forge_urls, register_forge, repository_path
+
+
+@pytest.mark.parametrize(
+    ("diff_url", "forge", "base_url", "changelog_url"),
+    [
+        (
+            "https://github.com/owner/project/compare/1.0.0...1.1.0",
+            "github",
+            "https://github.com/owner/project",
+            "https://github.com/owner/project/blob/1.1.0/docs/CHANGES.md",
+        ),
+        (
+            "https://github.com/owner/project/tree/1.1.0",
+            "github",
+            "https://github.com/owner/project",
+            "https://github.com/owner/project/blob/1.1.0/docs/CHANGES.md",
+        ),
+        (
+            "https://gitlab.example.com/group/sub/project/-/compare/1.0.0...1.1.0",
+            "gitlab",
+            "https://gitlab.example.com/group/sub/project",
+            "https://gitlab.example.com/group/sub/project/-/blob/1.1.0/docs/CHANGES.md",
+        ),
+        (
+            "https://gitlab.com/group/project/compare/v1.0.0...v1.1.0",
+            "gitlab",
+            "https://gitlab.com/group/project",
+            "https://gitlab.com/group/project/-/blob/v1.1.0/docs/CHANGES.md",
+        ),
+        (
+            "https://gitlab.example.com/group/project/-/tree/main",
+            "gitlab",
+            "https://gitlab.example.com/group/project",
+            "https://gitlab.example.com/group/project/-/blob/main/docs/CHANGES.md",
+        ),
+        (
+            "https://bitbucket.org/team/project/branches/compare/1.1.0%0D1.0.0",
+            "bitbucket",
+            "https://bitbucket.org/team/project",
+            "https://bitbucket.org/team/project/src/1.1.0/docs/CHANGES.md",
+        ),
+        (
+            "https://bitbucket.org/team/project/src/1.1.0",
+            "bitbucket",
+            "https://bitbucket.org/team/project",
+            "https://bitbucket.org/team/project/src/1.1.0/docs/CHANGES.md",
+        ),
+        (
+            "https://codeberg.org/owner/project/compare/1.0.0...1.1.0",
+            "gitea",
+            "https://codeberg.org/owner/project",
+            "https://codeberg.org/owner/project/src/1.1.0/docs/CHANGES.md",
+        ),
+        (
+            "https://git.example.com/owner/project/src/tag/1.1.0",
+            "gitea",
+            "https://git.example.com/owner/project",
+            "https://git.example.com/owner/project/src/1.1.0/docs/CHANGES.md",
+        ),
+    ],
+)
+def test_forge_urls(
+    diff_url: str, forge: str, base_url: str, changelog_url: str
+) -> None:
+    """Test that each forge's diff URLs are recognised."""
+    urls = derive_forge_urls(diff_url)
+
+    assert urls is not None
+    assert urls.forge.name == forge
+    assert urls.base_url == base_url
+    assert urls.changelog_url("docs/CHANGES.md") == changelog_url
+
+
+def test_unknown_url() -> None:
+    """Test that URLs that aren't for a known forge have no links."""
+    assert derive_forge_urls("https://example.com/releases/1.0.0") is None
+    assert announcer.changelog_link("https://example.com/releases/1.0.0") == (
+        None,
+        None,
+        "CHANGELOG.md",
+    )
+    assert announcer.derive_urls(None) == (None, None)
+
+
+@pytest.fixture
+def restore_forges() -> Iterator[None]:
+    """Restore the registered forges after a test."""
+    registered = list(forges.FORGES)
+    yield
+    forges.FORGES[:] = registered
+    forges.url_pattern.cache_clear()
+    derive_forge_urls.cache_clear()
+
+
+@pytest.mark.usefixtures("restore_forges")
+def test_register_forge() -> None:
+    """Test that registered forges are tried before the built in ones."""
+    diff_url = "https://git.example.com/owner/project/compare/1.0.0...1.1.0"
+    assert announcer.changelog_link(diff_url, "CHANGES.md")[1] == (
+        "https://git.example.com/owner/project/blob/1.1.0/CHANGES.md"
+    )
+
+    register_forge(
+        Forge(
+            "example",
+            (
+                "^(?P<base>https://git[.]example[.]com/.+)/compare/.+[.]{3}(?P<reference>.+)$",
+            ),
+            "{base}/raw/{reference}/{path}",
+        )
+    )
+
+    assert announcer.changelog_link(diff_url, "CHANGES.md") == (
+        "https://git.example.com/owner/project",
+        "https://git.example.com/owner/project/raw/1.1.0/CHANGES.md",
+        "CHANGES.md",
+    )
+
+
+def test_repository_path(tmp_path: Path) -> None:
+    """Test that changelogs are found relative to the top of their repository."""
+    (tmp_path / "repo" / ".git").mkdir(parents=True)
+    (tmp_path / "repo" / "docs").mkdir()
+    changelog = tmp_path / "repo" / "docs" / "CHANGES.md"
+    changelog.touch()
+    loose = tmp_path / "HISTORY.md"
+    loose.touch()
+
+    assert repository_path(str(changelog)) == "docs/CHANGES.md"
+    assert repository_path(str(loose)) == "HISTORY.md"
@@ -0,0 +1,94 @@
+# Copyright (c) Alianza, Inc. All rights reserved.
+"""Tests that slow dependencies are only imported when needed."""
+
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+from pytest_httpserver import HTTPServer
+
+TEST_DIR = os.path.dirname(__file__)
+
+
+def imported_modules(code: str) -> set[str]:
+    """Run code in a fresh interpreter, returning the modules it imported."""
+    # The modules are written to stderr, so that they aren't mixed up with
+    # anything the code prints.
+    result = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            f"{code}\nimport sys\nprint(*sys.modules, file=sys.stderr)",
+        ],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return set(result.stderr.split())
+
+
+@pytest.mark.parametrize(
+    "argv", [["--help"], ["batch", "--help"], ["index", "-h"], ["serve", "--help"]]
+)
+def test_help_is_lightweight(argv: list[str]) -> None:
+    """Test that showing help imports neither mistletoe nor requests."""
+    modules = imported_modules(
+        "import sys\n"
+        f"sys.argv = ['announce', *{argv!r}]\n"
+        "import announcer\n"
+        "try:\n"
+        "    announcer.main()\n"
+        "except SystemExit:\n"
+        "    pass\n"
+    )
+
+    assert "announcer" in modules
+    assert "mistletoe" not in modules
+    assert "requests" not in modules
+
+
+def test_render_does_not_import_requests() -> None:
+    """Test that rendering a changelog doesn't import requests."""
+    changelog = os.path.join(TEST_DIR, "testannounce1.md")
+    modules = imported_modules(
+        "import announcer\n"
+        f"changelog = announcer.Changelog({changelog!r}, "
+        "announcer.renderer_class(announcer.TargetTypes.SLACK))\n"
+        "changelog.get_version_details('1.0.0')\n"
+    )
+
+    assert "mistletoe" in modules
+    assert "requests" not in modules
+
+
+def test_post_payloads_does_not_import_mistletoe(
+    httpserver: HTTPServer, tmp_path: Path
+) -> None:
+    """Test that posting payloads doesn't parse or render anything."""
+    httpserver.expect_request("/slack").respond_with_data("ok")
+    payloads = tmp_path / "payloads.ndjson"
+    payloads.write_text(
+        json.dumps(
+            {
+                "projectname": "proj",
+                "version": "1.0.0",
+                "target": "slack",
+                "webhook": httpserver.url_for("/slack"),
+                "messages": [{"text": "Released"}],
+            }
+        )
+    )
+
+    modules = imported_modules(
+        "import sys\n"
+        f"sys.argv = ['announce', '--from-payload', {str(payloads)!r}]\n"
+        "import announcer\n"
+        "announcer.main()\n"
+    )
+
+    assert "requests" in modules
+    assert "mistletoe" not in modules
+    assert len(httpserver.log) == 1
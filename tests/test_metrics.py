@@ -0,0 +1,120 @@
+# Copyright (c) Alianza, Inc. All rights reserved.
+"""Tests for recording metrics about each stage of an announcement."""
+
+import json
+import os
+import sys
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+import requests
+from pytest_httpserver import HTTPServer
+
+import announcer
+from announcer import metrics
+from announcer.delivery import post_message
+from announcer.retry import NO_RETRY
+
+TEST_DIR = os.path.dirname(__file__)
+
+
+def read_records(filename: Path) -> list[dict[str, object]]:
+    """Read the records written to a metrics file."""
+    return [json.loads(line) for line in filename.read_text().splitlines()]
+
+
+def test_metrics_file(httpserver: HTTPServer, tmp_path: Path) -> None:
+    """Test that each stage of an announcement is recorded."""
+    httpserver.expect_request("/slack").respond_with_data("ok")
+    metrics_file = tmp_path / "metrics.jsonl"
+    testargs = [
+        "announce",
+        "--webhook",
+        httpserver.url_for("/slack"),
+        "--changelogversion",
+        "1.0.0",
+        "--changelogfile",
+        os.path.join(TEST_DIR, "testannounce1.md"),
+        "--projectname",
+        "test_announce1",
+        "--metrics-file",
+        str(metrics_file),
+    ]
+
+    with patch.object(sys, "argv", testargs):
+        announcer.main()
+
+    records = {record["stage"]: record for record in read_records(metrics_file)}
+    assert list(records) == [
+        "index",
+        "scan",
+        "parse",
+        "render",
+        "encode",
+        "post",
+        "deliver",
+    ]
+    assert all(isinstance(record["seconds"], float) for record in records.values())
+    assert records["scan"]["indexed"] is False
+    assert isinstance(records["render"]["tokens"], int)
+    assert records["render"]["tokens"] > 1
+    assert records["render"]["renderer"] == "ChangeLogRenderer"
+    assert records["encode"]["bytes"] == len(httpserver.log[0][0].data)
+    assert records["post"]["status"] == 200
+    assert records["post"]["host"] == f"{httpserver.host}:{httpserver.port}"
+    assert records["deliver"]["failed"] == 0
+    assert not metrics.enabled()
+
+
+def test_metrics_failed_request(httpserver: HTTPServer) -> None:
+    """Test that a failed request's status and error are recorded."""
+    httpserver.expect_request("/fail").respond_with_data("Nope", status=404)
+
+    metrics.start()
+    try:
+        with pytest.raises(requests.HTTPError):
+            post_message(httpserver.url_for("/fail"), {}, retry_policy=NO_RETRY)
+    finally:
+        records = metrics.stop()
+
+    [post] = [record for record in records if record["stage"] == "post"]
+    assert post["status"] == 404
+    assert post["error"] == "HTTPError"
+
+
+def test_metrics_disabled() -> None:
+    """Test that nothing is recorded unless metrics are started."""
+    with metrics.timed("stage") as record:
+        assert record is None
+
+    assert metrics.stop() == []
+
+
+def test_metrics_batch_jobs(httpserver: HTTPServer, tmp_path: Path) -> None:
+    """Test that metrics are collected from processes rendering a batch."""
+    httpserver.expect_request("/slack").respond_with_data("ok")
+    batch = [
+        announcer.BatchEntry(
+            "test",
+            os.path.join(TEST_DIR, changelog),
+            version,
+            [
+                announcer.Destination(
+                    announcer.TargetTypes.SLACK, httpserver.url_for("/slack")
+                )
+            ],
+        )
+        for (changelog, version) in [
+            ("testannounce1.md", "1.0.0"),
+            ("testchangelog_simple.md", "0.1.0"),
+        ]
+    ]
+    metrics_file = tmp_path / "metrics.jsonl"
+
+    with metrics.recording_to(str(metrics_file)):
+        announcer.announce_batch(batch, jobs=2)
+
+    stages = [record["stage"] for record in read_records(metrics_file)]
+    assert stages.count("render") == 2
+    assert stages.count("post") == 2
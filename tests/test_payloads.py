@@ -0,0 +1,160 @@
+# Copyright (c) Alianza, Inc. All rights reserved.
+"""Tests for writing payloads in a dry run and posting them later."""
+
+import json
+import os
+import sys
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+from pytest_httpserver import HTTPServer
+
+import announcer
+from announcer.payloads import Payload, read_payloads
+
+TEST_DIR = os.path.dirname(__file__)
+
+
+def announce_args(httpserver: HTTPServer, *extra: str) -> list[str]:
+    """Return arguments announcing testannounce1.md to Slack and Teams."""
+    return [
+        "announce",
+        "--destination",
+        f"slack={httpserver.url_for('/slack')}",
+        "--destination",
+        f"teams={httpserver.url_for('/teams')}",
+        "--changelogversion",
+        "1.0.0",
+        "--changelogfile",
+        os.path.join(TEST_DIR, "testannounce1.md"),
+        "--projectname",
+        "test_announce1",
+        *extra,
+    ]
+
+
+def test_dry_run_and_post(httpserver: HTTPServer, tmp_path: Path) -> None:
+    """Test that posting the payloads of a dry run sends the same messages."""
+    httpserver.expect_request("/slack").respond_with_data("ok")
+    httpserver.expect_request("/teams").respond_with_data("ok")
+    with patch.object(sys, "argv", announce_args(httpserver)):
+        announcer.main()
+    # Destinations are sent to concurrently, so compare the requests by path.
+    sent = {
+        request.path: json.loads(request.data)
+        for (request, _response) in httpserver.log
+    }
+    httpserver.clear_log()
+
+    with patch.object(
+        sys, "argv", announce_args(httpserver, "--dry-run", str(tmp_path))
+    ):
+        announcer.main()
+
+    # Nothing is sent, and the payloads are written to a file for the version.
+    assert httpserver.log == []
+    assert os.listdir(tmp_path) == ["test_announce1-1.0.0.ndjson"]
+    payloads = read_payloads(str(tmp_path))
+    assert [(p.target, p.webhook) for p in payloads] == [
+        ("slack", httpserver.url_for("/slack")),
+        ("teams", httpserver.url_for("/teams")),
+    ]
+
+    with patch.object(
+        sys, "argv", ["announce", "--from-payload", str(tmp_path), "--timeout", "5"]
+    ):
+        announcer.main()
+
+    assert {
+        request.path: json.loads(request.data)
+        for (request, _response) in httpserver.log
+    } == sent
+
+
+def test_dry_run_stdout(
+    httpserver: HTTPServer, capsys: pytest.CaptureFixture[str]
+) -> None:
+    """Test that payloads are written to stdout by default."""
+    with patch.object(sys, "argv", announce_args(httpserver, "--dry-run")):
+        announcer.main()
+
+    lines = capsys.readouterr().out.splitlines()
+    assert len(lines) == 2
+    slack = Payload.from_dict(json.loads(lines[0]), "stdout")
+    assert slack.projectname == "test_announce1"
+    assert slack.version == "1.0.0"
+    assert slack.messages[0]["attachments"][0]["pretext"].startswith(
+        "*test_announce1 1.0.0*"
+    )
+    assert httpserver.log == []
+
+
+def test_batch_dry_run(httpserver: HTTPServer, tmp_path: Path) -> None:
+    """Test that a batch can be written to one file of payloads."""
+    manifest = tmp_path / "manifest.json"
+    manifest.write_text(
+        json.dumps(
+            [
+                {
+                    "projectname": project,
+                    "changelogfile": os.path.join(TEST_DIR, filename),
+                    "changelogversion": version,
+                    "destinations": [
+                        {"target": "slack", "webhook": httpserver.url_for("/slack")}
+                    ],
+                }
+                for (project, filename, version) in (
+                    ("test_announce1", "testannounce1.md", "1.0.0"),
+                    ("test_simple", "testchangelog_simple.md", "0.1.0"),
+                )
+            ]
+        )
+    )
+    output = tmp_path / "payloads.ndjson"
+
+    with patch.object(
+        sys, "argv", ["announce", "batch", str(manifest), "--dry-run", str(output)]
+    ):
+        announcer.main()
+
+    assert httpserver.log == []
+    assert [(p.projectname, p.version) for p in read_payloads(str(output))] == [
+        ("test_announce1", "1.0.0"),
+        ("test_simple", "0.1.0"),
+    ]
+
+
+@pytest.mark.parametrize(
+    ("line", "error"),
+    [
+        ("{", ValueError),
+        ("[]", TypeError),
+        ('{"webhook": "https://example.com"}', ValueError),
+        (
+            (
+                '{"projectname": "p", "version": "1", "target": "slack", '
+                '"webhook": "https://example.com", "messages": {}}'
+            ),
+            TypeError,
+        ),
+    ],
+)
+def test_invalid_payloads(tmp_path: Path, line: str, error: type[Exception]) -> None:
+    """Test that invalid payloads are rejected, saying where they are."""
+    path = tmp_path / "payloads.ndjson"
+    path.write_text(f"\n{line}\n")
+
+    with pytest.raises(error, match="line 2"):
+        read_payloads(str(path))
+
+
+def test_payload_arguments() -> None:
+    """Test that payloads aren't written while posting them."""
+    with (
+        patch.object(
+            sys, "argv", ["announce", "--from-payload", "-", "--dry-run", "out"]
+        ),
+        pytest.raises(SystemExit),
+    ):
+        announcer.main()
@@ -0,0 +1,170 @@
+# Copyright (c) Alianza, Inc. All rights reserved.
+"""Tests for announcing a range of versions at once."""
+
+import json
+import sys
+from argparse import ArgumentTypeError
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+from mistletoe.block_token import Document
+from pytest_httpserver import HTTPServer
+
+import announcer
+from announcer import TargetTypes
+from announcer.common import split_versions, version_heading
+from announcer.forges import range_diff_url
+from announcer.ranges import merge_sections, select_versions
+
+CHANGELOG = """# Changelog
+
+## [Unreleased]
+### Added
+- Something new
+
+## [2.4.3] - 2024-03-01
+### Fixed
+- Crash on start up
+
+## [2.4.2] - 2024-02-01
+### Added
+- Range announcements
+### Fixed
+- Crash on start up
+- Typo in help
+
+## [2.4.1] - 2024-01-01
+### Fixed
+- Slow parsing
+
+## [2.4.0] - 2023-12-01
+### Added
+- First release
+
+[Unreleased]: https://github.com/owner/project/compare/2.4.3...HEAD
+[2.4.3]: https://github.com/owner/project/compare/2.4.2...2.4.3
+[2.4.2]: https://github.com/owner/project/compare/2.4.1...2.4.2
+[2.4.1]: https://github.com/owner/project/compare/2.4.0...2.4.1
+[2.4.0]: https://github.com/owner/project/tree/2.4.0
+"""
+
+VERSIONS = ["Unreleased", "2.4.3", "2.4.2", "2.4.1", "2.4.0"]
+
+
+@pytest.fixture
+def changelog(tmp_path: Path) -> str:
+    """Return the path of a changelog with several releases."""
+    path = tmp_path / "CHANGELOG.md"
+    path.write_text(CHANGELOG)
+    return str(path)
+
+
+def test_select_versions() -> None:
+    """Test that the versions in a range are selected in changelog order."""
+    assert select_versions(VERSIONS, "2.4.0") == ["2.4.3", "2.4.2", "2.4.1"]
+    assert select_versions(VERSIONS, "2.4.0", "2.4.2") == ["2.4.2", "2.4.1"]
+    assert select_versions(VERSIONS, "2.4.2", "Unreleased") == [
+        "Unreleased",
+        "2.4.3",
+    ]
+
+    with pytest.raises(ValueError, match="not in the changelog"):
+        select_versions(VERSIONS, "1.0.0")
+    with pytest.raises(ValueError, match="No versions after 2.4.3"):
+        select_versions(VERSIONS, "2.4.3")
+    with pytest.raises(ValueError, match="No versions after 2.4.3 up to 2.4.2"):
+        select_versions(VERSIONS, "2.4.3", "2.4.2")
+
+
+def test_parse_range() -> None:
+    """Test that ranges are parsed from SINCE..UNTIL."""
+    assert announcer.parse_range("2.4.0..2.4.5") == ("2.4.0", "2.4.5")
+    for value in ("2.4.0", "..2.4.5", "2.4.0.."):
+        with pytest.raises(ArgumentTypeError):
+            announcer.parse_range(value)
+
+
+def test_range_diff_url() -> None:
+    """Test that the diff URL of a range spans all of its versions."""
+    assert (
+        range_diff_url(
+            "https://github.com/owner/project/compare/2.4.0...2.4.1",
+            "https://github.com/owner/project/compare/2.4.2...2.4.3",
+        )
+        == "https://github.com/owner/project/compare/2.4.0...2.4.3"
+    )
+    assert (
+        range_diff_url(
+            "https://github.com/owner/other/compare/2.4.0...2.4.1",
+            "https://github.com/owner/project/compare/2.4.2...2.4.3",
+        )
+        == "https://github.com/owner/project/compare/2.4.2...2.4.3"
+    )
+    assert range_diff_url(None, "https://example.com/2.4.3") == (
+        "https://example.com/2.4.3"
+    )
+
+
+def test_render_range(changelog: str) -> None:
+    """Test that the changes in a range are grouped by heading."""
+    (label, details) = announcer.render_range_details(
+        changelog, "2.4.0", None, [TargetTypes.SLACK]
+    )
+
+    assert label == "2.4.1 to 2.4.3"
+    (rendered, diff_url, _sections) = details[TargetTypes.SLACK]
+    assert diff_url == "https://github.com/owner/project/compare/2.4.0...2.4.3"
+    # The crash fixed in two versions is only listed once.
+    assert rendered == (
+        "2.4.1 to 2.4.3\n"
+        "*Fixed*\n"
+        "• Crash on start up\n"
+        "• Typo in help\n"
+        "• Slow parsing\n"
+        "*Added*\n"
+        "• Range announcements\n"
+    )
+
+
+def test_merge_sections_diff_url() -> None:
+    """Test that the merged heading links to any diff URL, even one with spaces."""
+    sections = split_versions(Document(CHANGELOG))
+    diff_url = "https://example.com/compare/2.4.1...2.4.3 (fix)) x"
+
+    document = merge_sections(
+        [sections["2.4.3"], sections["2.4.2"]], "2.4.2 to 2.4.3", diff_url
+    )
+
+    heading = version_heading(next(iter(document.children or [])))
+    assert heading is not None
+    assert heading.version == "2.4.2 to 2.4.3"
+    assert heading.diff_url == diff_url
+
+
+def test_announce_range_main(httpserver: HTTPServer, changelog: str) -> None:
+    """Test that a range is announced in one message."""
+    httpserver.expect_request("/slack").respond_with_data("ok")
+
+    testargs = [
+        "announce",
+        "--slackhook",
+        httpserver.url_for("/slack"),
+        "--range",
+        "2.4.1..2.4.3",
+        "--changelogfile",
+        changelog,
+        "--projectname",
+        "proj",
+    ]
+    with patch.object(sys, "argv", testargs):
+        announcer.main()
+
+    assert len(httpserver.log) == 1
+    message = json.loads(httpserver.log[0][0].data)
+    assert message["attachments"][0]["pretext"].startswith("*proj 2.4.2 to 2.4.3*")
+    assert "Typo in help" in message["attachments"][0]["text"]
+    assert "Slow parsing" not in message["attachments"][0]["text"]
+    assert message["attachments"][1]["actions"][0]["url"] == (
+        "https://github.com/owner/project/compare/2.4.1...2.4.3"
+    )
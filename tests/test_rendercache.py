@@ -0,0 +1,142 @@
+# Copyright (c) Alianza, Inc. All rights reserved.
+"""Tests for the cache of rendered changelog versions."""
+
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+from helpers import copy_changelog
+from pytest_httpserver import HTTPServer
+
+import announcer
+from announcer.rendercache import CACHE_SUFFIX, RenderCache, cache_key
+
+TEST_DIR = os.path.dirname(__file__)
+
+
+def test_cache_hit_skips_parsing(tmp_path: Path) -> None:
+    """Test that a cached version is returned without parsing the changelog."""
+    changelog = copy_changelog(tmp_path)
+    cache = RenderCache(str(tmp_path / "cache"))
+    targets = [announcer.TargetTypes.SLACK, announcer.TargetTypes.TEAMS]
+
+    first = announcer.render_version_details(changelog, "1.0.0", targets, cache)
+    assert len(os.listdir(cache.directory)) == 2
+
+    with (
+        patch.object(announcer.Changelog, "parse_lines") as parse_lines,
+        patch.object(announcer.Changelog, "parse_file") as parse_file,
+    ):
+        second = announcer.render_version_details(changelog, "1.0.0", targets, cache)
+    parse_lines.assert_not_called()
+    parse_file.assert_not_called()
+    assert second == first
+
+
+def test_cache_changed_changelog(tmp_path: Path) -> None:
+    """Test that changing the version's section renders it again."""
+    changelog = copy_changelog(tmp_path)
+    cache = RenderCache(str(tmp_path / "cache"))
+    reader = announcer.Changelog(
+        changelog, announcer.renderer_class(announcer.TargetTypes.SLACK), cache
+    )
+
+    (rendered, _diff_url, _sections) = reader.get_version_details("1.0.0")
+    Path(changelog).write_text(
+        Path(changelog).read_text().replace("Test Announce changelog", "Changed entry")
+    )
+    (changed, _diff_url, _sections) = reader.get_version_details("1.0.0")
+
+    assert "Test Announce changelog" in rendered
+    assert "Changed entry" in changed
+    assert len(os.listdir(cache.directory)) == 2
+
+
+def test_cache_key() -> None:
+    """Test that the key depends on the lines, renderer and version."""
+    slack = announcer.renderer_class(announcer.TargetTypes.SLACK)
+    teams = announcer.renderer_class(announcer.TargetTypes.TEAMS)
+    lines = ["## [1.0.0]\n", "- Change\n"]
+
+    key = cache_key(lines, slack, "1.0.0")
+    assert cache_key(list(lines), slack, "1.0.0") == key
+    assert cache_key(lines, teams, "1.0.0") != key
+    assert cache_key(lines, slack, "1.0") != key
+    assert cache_key([*lines, "- Another\n"], slack, "1.0.0") != key
+
+
+def test_cache_eviction(tmp_path: Path) -> None:
+    """Test that the least recently used entries are removed."""
+    cache = RenderCache(str(tmp_path), max_bytes=1200)
+    details: announcer.VersionDetails = ("x" * 300, None, [])
+    for n in range(3):
+        cache.put(f"key{n}", details)
+        # Make each entry look older than the last one used.
+        os.utime(cache.path(f"key{n}"), (n, n))
+    assert cache.get("key0") == details
+
+    cache.put("key3", details)
+
+    assert sorted(os.listdir(tmp_path)) == [f"key{n}{CACHE_SUFFIX}" for n in (0, 2, 3)]
+
+
+def test_cache_unreadable_entry(tmp_path: Path) -> None:
+    """Test that an unreadable entry is ignored and replaced."""
+    changelog = copy_changelog(tmp_path)
+    cache = RenderCache(str(tmp_path / "cache"))
+    reader = announcer.Changelog(
+        changelog, announcer.renderer_class(announcer.TargetTypes.SLACK), cache
+    )
+    details = reader.get_version_details("1.0.0")
+    [entry] = os.listdir(cache.directory)
+    Path(cache.directory, entry).write_text("{not json")
+
+    assert reader.get_version_details("1.0.0") == details
+    assert cache.get(entry.removesuffix(CACHE_SUFFIX)) == details
+
+
+def test_cache_concurrent_puts(
+    tmp_path: Path, caplog: pytest.LogCaptureFixture
+) -> None:
+    """Test that threads writing the same entry at once each write it whole."""
+    cache = RenderCache(str(tmp_path))
+    entries = [
+        (f"text {n} " * 1000, f"https://example.com/{n}", [{"text": str(n)}])
+        for n in range(16)
+    ]
+
+    with ThreadPoolExecutor(max_workers=16) as executor:
+        list(executor.map(lambda details: cache.put("key", details), entries * 16))
+
+    assert "Failed to cache" not in caplog.text
+    assert cache.get("key") in entries
+    assert os.listdir(tmp_path) == [f"key{CACHE_SUFFIX}"]
+
+
+def test_cache_dir_argument(httpserver: HTTPServer, tmp_path: Path) -> None:
+    """Test that the command line caches renders in the given directory."""
+    httpserver.expect_request("/slack").respond_with_data("ok")
+    testargs = [
+        "announce",
+        "--webhook",
+        httpserver.url_for("/slack"),
+        "--changelogversion",
+        "1.0.0",
+        "--changelogfile",
+        os.path.join(TEST_DIR, "testannounce1.md"),
+        "--projectname",
+        "test_announce1",
+        "--cache-dir",
+        str(tmp_path),
+    ]
+
+    for _ in range(2):
+        with patch.object(sys, "argv", testargs):
+            announcer.main()
+
+    assert len(os.listdir(tmp_path)) == 1
+    [(first, _), (second, _)] = httpserver.log
+    assert first.data == second.data
@@ -0,0 +1,122 @@
+# Copyright (c) Alianza, Inc. All rights reserved.
+"""Tests for retrying and rate limiting webhook requests."""
+
+import email.utils
+import time
+
+import pytest
+import requests
+from pytest_httpserver import HTTPServer
+
+from announcer.delivery import deliver, make_session, post_message
+from announcer.retry import HostRateLimiter, RetryPolicy, parse_retry_after
+
+FAST_RETRIES = RetryPolicy(max_attempts=3, base_delay=0.01)
+
+
+def make_response(retry_after: str | None) -> requests.Response:
+    """Make a response with the given Retry-After header."""
+    response = requests.Response()
+    response.status_code = 429
+    if retry_after is not None:
+        response.headers["Retry-After"] = retry_after
+    return response
+
+
+def test_parse_retry_after() -> None:
+    """Test reading delays in seconds or as dates from Retry-After headers."""
+    assert parse_retry_after(None) is None
+    assert parse_retry_after(make_response(None)) is None
+    assert parse_retry_after(make_response("30")) == 30.0
+    assert parse_retry_after(make_response("soon")) is None
+
+    retry_at = email.utils.formatdate(time.time() + 60, usegmt=True)
+    delay = parse_retry_after(make_response(retry_at))
+    assert delay is not None
+    assert 55 < delay <= 60
+
+
+def test_retry_rate_limited(httpserver: HTTPServer) -> None:
+    """Test that a rate limited request is retried after the requested delay."""
+    httpserver.expect_ordered_request("/slack").respond_with_data(
+        "rate_limited", status=429, headers={"Retry-After": "1"}
+    )
+    httpserver.expect_ordered_request("/slack").respond_with_data("ok")
+
+    start = time.monotonic()
+    post_message(httpserver.url_for("/slack"), {}, session=make_session())
+
+    assert time.monotonic() - start >= 1.0
+    assert len(httpserver.log) == 2
+
+
+def test_retry_server_errors(httpserver: HTTPServer) -> None:
+    """Test that server errors are retried with backoff."""
+    httpserver.expect_ordered_request("/teams").respond_with_data("", status=503)
+    httpserver.expect_ordered_request("/teams").respond_with_data("", status=502)
+    httpserver.expect_ordered_request("/teams").respond_with_data("1")
+
+    [result] = deliver(
+        [(httpserver.url_for("/teams"), {})],
+        session=make_session(),
+        retry_policy=FAST_RETRIES,
+    )
+
+    assert result.ok
+    assert len(httpserver.log) == 3
+
+
+def test_retry_gives_up(httpserver: HTTPServer) -> None:
+    """Test that retries stop after the maximum number of attempts."""
+    httpserver.expect_request("/slack").respond_with_data("", status=500)
+
+    with pytest.raises(requests.HTTPError):
+        post_message(
+            httpserver.url_for("/slack"),
+            {},
+            session=make_session(),
+            retry_policy=FAST_RETRIES,
+        )
+
+    assert len(httpserver.log) == 3
+
+
+def test_no_retry_on_client_error_or_long_delay(httpserver: HTTPServer) -> None:
+    """Test that requests aren't retried if retrying can't help in time."""
+    httpserver.expect_request("/gone").respond_with_data("", status=404)
+    httpserver.expect_request("/busy").respond_with_data(
+        "", status=429, headers={"Retry-After": "3600"}
+    )
+
+    start = time.monotonic()
+    results = deliver(
+        [(httpserver.url_for("/gone"), {}), (httpserver.url_for("/busy"), {})],
+        session=make_session(),
+    )
+
+    assert not any(result.ok for result in results)
+    assert time.monotonic() - start < 1.0
+    assert len(httpserver.log) == 2
+
+
+def test_host_rate_limiter() -> None:
+    """Test that requests to each host are limited to the given rate."""
+    limiter = HostRateLimiter(rate=20, burst=2)
+
+    start = time.monotonic()
+    for _ in range(6):
+        limiter.acquire("https://hooks.example.com/a")
+    limited = time.monotonic() - start
+
+    start = time.monotonic()
+    limiter.acquire("https://other.example.com/b")
+    unlimited = time.monotonic() - start
+
+    # The first two requests are a burst, and the other four wait their turn.
+    assert limited >= 0.18
+    assert unlimited < 0.05
+
+    limiter.pause("https://other.example.com/b", 0.2)
+    start = time.monotonic()
+    limiter.acquire("https://other.example.com/c")
+    assert time.monotonic() - start >= 0.18
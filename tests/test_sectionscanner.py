@@ -0,0 +1,103 @@
+# Copyright (c) Alianza, Inc. All rights reserved.
+"""Tests for the changelog section pre-scan."""
+
+import os
+from pathlib import Path
+
+from mistletoe.block_token import Document
+
+import announcer
+from announcer.sectionscanner import extract_version_lines
+
+TEST_DIR = os.path.dirname(__file__)
+
+TRICKY_CHANGELOG = """# Changelog
+
+## [2.0.0]
+### Added
+- Code with a heading in it:
+
+```
+## [1.0.0] not a heading
+```
+
+## 1&#46;5.0
+### Added
+- A version that needs an entity decoding
+
+## [1.0.0] - 2018-09-26
+### Fixed
+- See the [docs] for details
+
+Not a version heading
+---
+
+[docs]: https://example.com/docs
+[2.0.0]: https://github.com/Metaswitch/announcer/compare/1.0.0...2.0.0
+[1.0.0]: https://github.com/Metaswitch/announcer/tree/1.0.0
+"""
+
+AMBIGUOUS_CHANGELOG = """# Changelog
+
+## [1.0.0]
+- A list item with code:
+  ```
+## [0.1.0] is part of the list item's code, or closes the list item
+  ```
+"""
+
+
+def render_full(lines: list[str], version: str) -> tuple[str, str | None]:
+    """Render a version from a fully parsed document."""
+    with announcer.ChangeLogRenderer(version) as renderer:
+        return renderer.render(Document(lines)), renderer.diff_url
+
+
+def test_extract_only_version_section() -> None:
+    """Test that only the requested section and its definitions are kept."""
+    with open(os.path.join(TEST_DIR, "testannounce1.md")) as f:
+        lines = extract_version_lines(f, "1.0.0")
+
+    assert lines == [
+        "## [1.0.0] - 2018-09-26\n",
+        "### Added\n",
+        "- Test Announce changelog: [Announcer](https://github.com/Metaswitch/announcer)\n",
+        "\n",
+        "[1.0.0]: https://github.com/Metaswitch/announcer/compare/0.1.0...1.0.0\n",
+    ]
+
+
+def test_extract_missing_version() -> None:
+    """Test that a version with no heading is not found by the pre-scan."""
+    with open(os.path.join(TEST_DIR, "testannounce1.md")) as f:
+        assert extract_version_lines(f, "9.9.9") is None
+
+
+def test_extract_ambiguous_fence() -> None:
+    """Test that the pre-scan gives up when it can't track the block structure."""
+    lines = AMBIGUOUS_CHANGELOG.splitlines(keepends=True)
+    assert extract_version_lines(lines, "1.0.0") is None
+
+
+def test_extract_matches_full_parse() -> None:
+    """Test that rendering the extracted lines matches rendering the whole file."""
+    lines = TRICKY_CHANGELOG.splitlines(keepends=True)
+
+    for version in ["1.0.0", "2.0.0"]:
+        extracted = extract_version_lines(lines, version)
+        assert extracted is not None
+        assert len(extracted) < len(lines)
+        assert render_full(extracted, version) == render_full(lines, version)
+
+
+def test_changelog_falls_back_to_full_parse(tmp_path: Path) -> None:
+    """Test that versions the pre-scan can't find still render the same."""
+    changelog = tmp_path / "CHANGELOG.md"
+    changelog.write_text(TRICKY_CHANGELOG)
+    lines = TRICKY_CHANGELOG.splitlines(keepends=True)
+    assert extract_version_lines(lines, "1.5.0") is None
+
+    cl = announcer.Changelog(str(changelog), announcer.ChangeLogRenderer)
+    (details, diff_url, _sections) = cl.get_version_details("1.5.0")
+    assert details == "1.5.0\n*Added*\n\u2022 A version that needs an entity decoding\n"
+    assert diff_url is None
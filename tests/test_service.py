@@ -0,0 +1,229 @@
+# Copyright (c) Alianza, Inc. All rights reserved.
+"""Tests for the long-running announcer service."""
+
+import json
+import os
+import socket
+import threading
+import time
+from collections.abc import Iterator
+from pathlib import Path
+
+import pytest
+import requests
+from pytest_httpserver import HTTPServer
+
+from announcer import DeliveryOptions, batch_entry_from_dict, main_serve, metrics
+from announcer.rendercache import RenderCache
+from announcer.retry import NO_RETRY
+from announcer.service import (
+    DELIVERED,
+    FAILED,
+    AnnouncementService,
+    DocumentCache,
+    ServiceServer,
+    UnixServiceServer,
+    serve,
+)
+
+TEST_DIR = os.path.dirname(__file__)
+
+
+def announcement(httpserver: HTTPServer, path: str = "/slack") -> dict[str, object]:
+    """Return an announcement of testannounce1.md to the server."""
+    return {
+        "projectname": "test_announce1",
+        "changelogfile": os.path.join(TEST_DIR, "testannounce1.md"),
+        "changelogversion": "1.0.0",
+        "destinations": [{"target": "slack", "webhook": httpserver.url_for(path)}],
+    }
+
+
+@pytest.fixture
+def service() -> AnnouncementService:
+    """Return a service that doesn't retry failed requests."""
+    return AnnouncementService(DeliveryOptions(retry_policy=NO_RETRY), workers=2)
+
+
+@pytest.fixture
+def service_url(service: AnnouncementService) -> Iterator[str]:
+    """Run the service on a local port, returning its URL."""
+    server = ServiceServer(("127.0.0.1", 0), service)
+    service.start()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+    service.stop()
+
+
+def wait_for(url: str) -> dict[str, object]:
+    """Wait for an announcement to finish, returning its status."""
+    for _ in range(100):
+        status: dict[str, object] = requests.get(url, timeout=5).json()
+        if status["status"] in (DELIVERED, FAILED):
+            return status
+        time.sleep(0.05)
+    raise AssertionError(f"Announcement at {url} didn't finish")
+
+
+def test_service_announces(httpserver: HTTPServer, service_url: str) -> None:
+    """Test that posted announcements are made, and their status returned."""
+    httpserver.expect_request("/slack").respond_with_data("ok")
+
+    responses = [
+        requests.post(
+            f"{service_url}/announcements", json=announcement(httpserver), timeout=5
+        )
+        for _ in range(3)
+    ]
+
+    assert [response.status_code for response in responses] == [202] * 3
+    ids = [response.json()["id"] for response in responses]
+    for announcement_id in ids:
+        status = wait_for(f"{service_url}/announcements/{announcement_id}")
+        assert status["status"] == DELIVERED
+        assert status["errors"] == []
+    assert len(httpserver.log) == 3
+    message = json.loads(httpserver.log[0][0].data)
+    assert message["attachments"][0]["pretext"].startswith("*test_announce1 1.0.0*")
+
+
+def test_service_failure(httpserver: HTTPServer, service_url: str) -> None:
+    """Test that an announcement that isn't delivered is reported as failed."""
+    httpserver.expect_request("/slack").respond_with_data("error", status=400)
+
+    response = requests.post(
+        f"{service_url}/announcements", json=announcement(httpserver), timeout=5
+    )
+
+    status = wait_for(f"{service_url}/announcements/{response.json()['id']}")
+    assert status["status"] == FAILED
+    assert status["errors"] == ["1 of 1 messages failed to send"]
+
+
+def test_service_bad_requests(httpserver: HTTPServer, service_url: str) -> None:
+    """Test that invalid requests are rejected."""
+    invalid = {**announcement(httpserver), "unknown": 1}
+
+    assert requests.get(f"{service_url}/health", timeout=5).status_code == 200
+    assert (
+        requests.post(f"{service_url}/announcements", json=invalid, timeout=5)
+    ).status_code == 400
+    assert (
+        requests.post(f"{service_url}/announcements", data="{", timeout=5)
+    ).status_code == 400
+    # requests sets the Content-Length itself, so send these by hand.
+    (host, port) = service_url.removeprefix("http://").split(":")
+    for length in (b"ten", b"-1"):
+        with socket.create_connection((host, int(port)), timeout=5) as client:
+            client.sendall(
+                b"POST /announcements HTTP/1.0\r\nContent-Length: "
+                + length
+                + b"\r\n\r\n{}"
+            )
+            response = b"".join(iter(lambda: client.recv(4096), b""))
+        assert response.startswith(b"HTTP/1.0 400")
+        assert b"Invalid Content-Length" in response
+    assert requests.get(f"{service_url}/announcements/99", timeout=5).status_code == 404
+    assert requests.get(f"{service_url}/other", timeout=5).status_code == 404
+
+
+def test_service_queue_full(httpserver: HTTPServer) -> None:
+    """Test that announcements are rejected once the queue is full."""
+    # Without starting the service, nothing is taken from the queue.
+    service = AnnouncementService(queue_size=1)
+    server = ServiceServer(("127.0.0.1", 0), service)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/announcements"
+    try:
+        statuses = [
+            requests.post(url, json=announcement(httpserver), timeout=5).status_code
+            for _ in range(2)
+        ]
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert statuses == [202, 503]
+
+
+def test_service_unix_socket(tmp_path: Path, service: AnnouncementService) -> None:
+    """Test that the service can listen on a Unix socket."""
+    path = str(tmp_path / "announcer.sock")
+    server = UnixServiceServer(path, service)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+            client.connect(path)
+            client.sendall(b"GET /health HTTP/1.0\r\n\r\n")
+            response = b"".join(iter(lambda: client.recv(4096), b""))
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert response.startswith(b"HTTP/1.0 200")
+    assert response.endswith(b'{"status": "ok"}')
+
+
+def test_service_socket_not_replaced(
+    tmp_path: Path,
+    service: AnnouncementService,
+    capsys: pytest.CaptureFixture[str],
+) -> None:
+    """Test that a file that isn't a socket is never removed to listen there."""
+    path = tmp_path / "CHANGELOG.md"
+    path.write_text("# Changelog\n")
+
+    with pytest.raises(SystemExit):
+        main_serve(["--socket", str(path)])
+    assert "exists and is not a socket" in capsys.readouterr().err
+
+    with pytest.raises(FileExistsError):
+        serve(service, socket_path=str(path))
+
+    assert path.read_text() == "# Changelog\n"
+
+
+def test_document_cache(tmp_path: Path) -> None:
+    """Test that parsed documents are kept until their changelog changes."""
+    changelog = tmp_path / "CHANGELOG.md"
+    changelog.write_text("## [1.0.0]\n- Change\n\n## [0.9.0]\n- Earlier\n")
+    documents = DocumentCache(max_entries=1)
+
+    first = documents.get_document(str(changelog), "1.0.0")
+    assert documents.get_document(str(changelog), "1.0.0") is first
+
+    changelog.write_text("## [1.0.0]\n- Changed\n\n## [0.9.0]\n- Earlier\n")
+    second = documents.get_document(str(changelog), "1.0.0")
+    assert second is not first
+
+    # Only one document is kept.
+    documents.get_document(str(changelog), "0.9.0")
+    assert documents.get_document(str(changelog), "1.0.0") is not second
+
+
+def test_service_render_cache(httpserver: HTTPServer, tmp_path: Path) -> None:
+    """Test that announcing a version again reads its render from the cache."""
+    httpserver.expect_request("/slack").respond_with_data("ok")
+    cache_dir = tmp_path / "cache"
+    service = AnnouncementService(
+        DeliveryOptions(retry_policy=NO_RETRY), cache=RenderCache(str(cache_dir))
+    )
+    entry = batch_entry_from_dict(announcement(httpserver), "", "test")
+
+    service.announce(entry)
+    assert os.listdir(cache_dir)
+
+    metrics.start()
+    try:
+        service.announce(entry)
+    finally:
+        records = metrics.stop()
+
+    assert [r["hit"] for r in records if r["stage"] == "cache"] == [True]
+    assert not [r for r in records if r["stage"] == "render"]
+    assert len(httpserver.log) == 2
@@ -0,0 +1,324 @@
+# Copyright (c) Alianza, Inc. All rights reserved.
+"""Tests for splitting rendered text into chunks that fit a size limit."""
+
+import json
+import os
+import re
+import sys
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+from pytest_httpserver import HTTPServer
+
+import announcer
+from announcer.splitting import (
+    json_size,
+    pack_sizes,
+    split_blocks,
+    split_element,
+    split_html,
+    split_rich_text,
+    utf8_len,
+)
+
+TEST_DIR = os.path.dirname(__file__)
+
+
+def test_split_between_blocks() -> None:
+    """Test that whole blocks are packed together while they fit."""
+    blocks = ["1.0.0\n", "*Added*\n", "• One\n• Two\n", "*Fixed*\n"]
+
+    assert split_blocks(blocks, 1000) == ["".join(blocks)]
+    assert split_blocks(blocks, 24) == ["1.0.0\n*Added*\n", "• One\n• Two\n*Fixed*\n"]
+
+
+def test_split_between_list_entries() -> None:
+    """Test that a long list is split between entries, keeping each whole."""
+    entries = [f"• Entry {n}\nmore of entry {n}\n    ‣ Sub {n}\n" for n in range(10)]
+
+    chunks = split_blocks(["".join(entries)], 100)
+
+    assert "".join(chunks) == "".join(entries)
+    assert all(utf8_len(chunk) <= 100 for chunk in chunks)
+    for chunk in chunks:
+        assert chunk.startswith("• Entry")
+
+
+def test_split_code_block() -> None:
+    """Test that a long code block is closed and reopened where it is split."""
+    code = "```\n" + "".join(f"line {n}\n" for n in range(50)) + "```\n"
+
+    chunks = split_blocks(["Intro\n", code], 64)
+
+    assert len(chunks) > 2
+    assert all(utf8_len(chunk) <= 64 for chunk in chunks)
+    assert chunks[0] == "Intro\n"
+    for chunk in chunks[1:]:
+        assert chunk.startswith("```\n")
+        assert chunk.endswith("```\n")
+    lines = "".join(chunks).splitlines()
+    assert [line for line in lines if line != "```"] == ["Intro"] + [
+        f"line {n}" for n in range(50)
+    ]
+
+
+def test_split_long_line() -> None:
+    """Test that a line longer than the limit is split without breaking characters."""
+    line = "é" * 100 + "\n"
+
+    chunks = split_blocks([line], 33)
+
+    assert "".join(chunks) == line
+    assert all(utf8_len(chunk) <= 33 for chunk in chunks)
+
+
+def test_split_limit_too_small() -> None:
+    """Test that a limit too small to split code blocks is rejected."""
+    with pytest.raises(ValueError):
+        split_blocks(["text\n"], 8)
+
+
+def test_announce_split_messages(httpserver: HTTPServer, tmp_path: Path) -> None:
+    """Test that a long announcement is sent as messages in order."""
+    changelog = tmp_path / "CHANGELOG.md"
+    changelog.write_text(
+        "## [1.0.0] - 2025-01-01\n"
+        "### Added\n"
+        + "".join(f"- Change number {n}\n" for n in range(40))
+        + "\n[1.0.0]: https://github.com/example/project/compare/0.9.0...1.0.0\n"
+    )
+    httpserver.expect_request("/slack").respond_with_data("ok")
+    destination = announcer.Destination(
+        announcer.TargetTypes.SLACK,
+        httpserver.url_for("/slack"),
+        username="announcer",
+        max_text_bytes=200,
+    )
+
+    announcer.announce_destinations([destination], "1.0.0", str(changelog), "project")
+
+    messages = [json.loads(request.data) for (request, _response) in httpserver.log]
+    assert len(messages) > 1
+    assert all(message["username"] == "announcer" for message in messages)
+    # The first message has the title and buttons; the rest continue its text.
+    assert messages[0]["attachments"][0]["pretext"].startswith("*project 1.0.0*")
+    assert len(messages[0]["attachments"]) == 2
+    texts = [message["attachments"][0]["text"] for message in messages]
+    assert all(utf8_len(text) <= 200 for text in texts)
+    assert texts[0].startswith("1.0.0 - 2025-01-01\n*Added*\n")
+    assert "".join(texts).endswith("• Change number 39\n")
+    assert [
+        line for text in texts for line in text.splitlines() if line.startswith("•")
+    ] == [f"• Change number {n}" for n in range(40)]
+
+
+def test_max_text_bytes_validated(
+    tmp_path: Path, capsys: pytest.CaptureFixture[str]
+) -> None:
+    """Test that too small a text limit is rejected before announcing."""
+    with (
+        patch.object(sys, "argv", ["announce", "--max-text-bytes", "10"]),
+        pytest.raises(SystemExit),
+    ):
+        announcer.main()
+    assert "--max-text-bytes: must be at least" in capsys.readouterr().err
+
+    destinations = tmp_path / "destinations.json"
+    destinations.write_text(
+        json.dumps(
+            [
+                {
+                    "target": "slack",
+                    "webhook": "https://example.com",
+                    "max_text_bytes": 10,
+                }
+            ]
+        )
+    )
+    with pytest.raises(ValueError, match="max_text_bytes must be at least"):
+        announcer.load_destinations(str(destinations), {})
+
+
+def test_pack_sizes() -> None:
+    """Test that items are packed greedily, in order."""
+    assert pack_sizes([], 10) == []
+    assert pack_sizes([4, 4, 4, 12, 1], 10) == [
+        range(2),
+        range(2, 3),
+        range(3, 4),
+        range(4, 5),
+    ]
+
+
+@pytest.mark.parametrize("compatibility_teams_sections", [False, True])
+def test_announce_teams_cards(
+    httpserver: HTTPServer, tmp_path: Path, compatibility_teams_sections: bool
+) -> None:
+    """Test that a long Teams announcement is packed into cards within the limit."""
+    changelog = tmp_path / "CHANGELOG.md"
+    changelog.write_text(
+        "## [1.0.0] - 2025-01-01\n"
+        + "".join(f"### Section {n}\n- Change {n}\n" for n in range(20))
+        + "\n[1.0.0]: https://github.com/example/project/compare/0.9.0...1.0.0\n"
+    )
+    httpserver.expect_request("/teams").respond_with_data("ok")
+    destination = announcer.Destination(
+        announcer.TargetTypes.TEAMS,
+        httpserver.url_for("/teams"),
+        compatibility_teams_sections=compatibility_teams_sections,
+        max_card_bytes=1500,
+    )
+
+    announcer.announce_destinations([destination], "1.0.0", str(changelog), "project")
+
+    cards = [json.loads(request.data) for (request, _response) in httpserver.log]
+    assert len(cards) > 1
+    assert all(len(request.data) <= 1500 for (request, _response) in httpserver.log)
+    assert cards[0]["title"] == "project 1.0.0"
+    assert "potentialAction" in cards[0]
+    for card in cards[1:]:
+        assert card["title"] == "project 1.0.0 (continued)"
+        assert "potentialAction" not in card
+    html = "".join(section["text"] for card in cards for section in card["sections"])
+    assert re.findall("<h3>(.*?)</h3>", html) == [f"Section {n}" for n in range(20)]
+
+
+@pytest.mark.parametrize("compatibility_teams_sections", [False, True])
+def test_teams_cards_split_long_list(
+    tmp_path: Path, compatibility_teams_sections: bool
+) -> None:
+    """Test that a list too long for one Teams card is split between its items."""
+    changelog = tmp_path / "CHANGELOG.md"
+    changelog.write_text(
+        "## [1.0.0] - 2025-01-01\n### Added\n"
+        + "".join(
+            f"- Change {n} with [a link](https://example.com/{n})\n"
+            for n in range(1500)
+        )
+        + "\n[1.0.0]: https://github.com/example/project/compare/0.9.0...1.0.0\n"
+    )
+    (rendered, diff_url, sections) = announcer.Changelog(
+        str(changelog), announcer.renderer_class(announcer.TargetTypes.TEAMS)
+    ).get_version_details("1.0.0")
+
+    messages = announcer.teams_messages(
+        "1.0.0", "project", rendered, diff_url, sections, compatibility_teams_sections
+    )
+
+    assert len(messages) > 1
+    assert all(
+        len(json.dumps(message)) <= announcer.TEAMS_MAX_CARD_BYTES
+        for message in messages
+    )
+    html = [
+        "".join(section["text"] for section in message["sections"])
+        for message in messages
+    ]
+    # The list starts in the first card, after the heading.
+    assert "<h3>Added</h3><ul>\n<li>Change 0 " in html[0]
+    assert all(card.startswith("<ul>\n") for card in html[1:])
+    assert all(card.endswith("\n</ul>") for card in html)
+    assert re.findall("<li>Change ([0-9]+) ", "".join(html)) == [
+        str(n) for n in range(1500)
+    ]
+
+
+def test_split_html() -> None:
+    """Test that HTML sections are split between their items to fit a limit."""
+    items = [
+        f"<li>Entry {n}\n<ul>\n<li>Detail {n}</li>\n</ul>\n</li>" for n in range(20)
+    ]
+    html = '<ol start="3">\n' + "\n".join(items) + "\n</ol>"
+
+    pieces = split_html(html, 100, 300)
+
+    assert len(json.dumps(pieces[0])) <= 100
+    assert all(len(json.dumps(piece)) <= 300 for piece in pieces)
+    # Nested lists stay with their items, and the numbering continues.
+    numbers = [re.findall("<li>Entry ([0-9]+)", piece) for piece in pieces]
+    assert [n for entries in numbers for n in entries] == [str(n) for n in range(20)]
+    for piece, entries in zip(pieces, numbers, strict=True):
+        start = int(entries[0]) + 3
+        opening = f'<ol start="{start}">\n'
+        assert piece == opening + "\n".join(items[int(n)] for n in entries) + "\n</ol>"
+
+    quote = "<blockquote>\n<p>Quoted</p>\n" + html + "\n</blockquote>"
+    quotes = split_html(quote, 300, 300)
+    assert len(quotes) > 1
+    assert all(len(json.dumps(piece)) <= 300 for piece in quotes)
+    assert quotes[0].startswith('<blockquote>\n<p>Quoted</p>\n<ol start="3">')
+
+    assert split_html("<p>" + "x" * 1000 + "</p>", 10, 10) == [
+        "<p>" + "x" * 1000 + "</p>"
+    ]
+
+
+def test_split_element() -> None:
+    """Test that Adaptive Card elements are split to fit a limit."""
+    text = "\n".join(
+        f"\u2022 Entry {n}\n\u00a0\u00a0\u2023 Detail {n}" for n in range(20)
+    )
+    block = {"type": "TextBlock", "text": text, "wrap": True}
+
+    pieces = split_element(block, 100, 300)
+
+    assert json_size(pieces[0]) <= 100
+    assert all(json_size(piece) <= 300 for piece in pieces)
+    assert "\n".join(piece["text"] for piece in pieces) == text
+    # Nested entries stay with the entry they belong to.
+    assert all(piece["text"].startswith("\u2022 Entry") for piece in pieces)
+
+    container = {"type": "Container", "style": "emphasis", "items": [block]}
+    containers = split_element(container, 300, 300)
+    assert len(containers) > 1
+    assert all(json_size(piece) <= 300 for piece in containers)
+
+    line = {"type": "TextBlock", "text": "x" * 1000}
+    assert "".join(piece["text"] for piece in split_element(line, 200, 200)) == (
+        "x" * 1000
+    )
+    assert split_element({"type": "Image", "url": "x" * 1000}, 10, 10) == [
+        {"type": "Image", "url": "x" * 1000}
+    ]
+
+
+def test_split_rich_text() -> None:
+    """Test that Block Kit rich text is split between list entries to fit a limit."""
+    entries = [
+        {"type": "rich_text_section", "elements": [{"type": "text", "text": f"{n}"}]}
+        for n in range(40)
+    ]
+    block = {
+        "type": "rich_text",
+        "elements": [
+            {"type": "rich_text_preformatted", "elements": []},
+            {
+                "type": "rich_text_list",
+                "style": "ordered",
+                "indent": 0,
+                "offset": 2,
+                "elements": entries,
+            },
+        ],
+    }
+
+    pieces = split_rich_text(block, 200, 600)
+
+    assert json_size(pieces[0]) <= 200
+    assert all(json_size(piece) <= 600 for piece in pieces)
+    assert pieces[0]["elements"][0]["type"] == "rich_text_preformatted"
+    lists = [
+        element
+        for piece in pieces
+        for element in piece["elements"]
+        if element["type"] == "rich_text_list"
+    ]
+    assert [entry for element in lists for entry in element["elements"]] == entries
+    # The numbering of the list continues in each piece.
+    offset = 2
+    for element in lists:
+        assert element["offset"] == offset
+        offset += len(element["elements"])
+
+    assert split_rich_text({"type": "divider"}, 1, 1) == [{"type": "divider"}]